@@ -0,0 +1,167 @@
+"""
+Micro-benchmark of OpenAPI response decoding for one poll cycle (real time + report + daily generation).
+
+Compares the original decode path (every payload parsed twice, an if/elif rename for every variable
+and debug strings formatted whether or not debug logging is on) with custom_components.foxess.decode.
+
+    python benchmarks/decode_benchmark.py [--inverters N] [--rounds N] [--json]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_components.foxess import decode # noqa: E402
+
+_LOGGER = logging.getLogger("foxess.benchmark")
+_LOGGER.setLevel(logging.WARNING) # the normal case, debug logging off
+
+REPORT_VARIABLES = ["feedin", "generation", "gridConsumption", "chargeEnergyToTal", "dischargeEnergyToTal", "loads"]
+
+
+def real_time_variables():
+    """Roughly what a large three phase hybrid inverter returns."""
+    names = ["pvPower", "generationPower", "feedinPower", "gridConsumptionPower", "loadsPower",
+             "batChargePower", "batDischargePower", "invBatPower", "invBatPower_1", "SoC", "SoC_1",
+             "batTemperature", "batTemperature_1", "ambientTemperation", "boostTemperation",
+             "invTemperation", "ResidualEnergy", "energyThroughput", "runningState", "ReactivePower",
+             "PowerFactor", "meterPower", "meterPower2", "currentFaultCount"]
+    for pv in range(1, 19):
+        names += [f"pv{pv}Volt", f"pv{pv}Current", f"pv{pv}Power"]
+    for phase in "RST":
+        names += [f"{phase}Volt", f"{phase}Current", f"{phase}Power", f"{phase}Freq",
+                  f"epsVolt{phase}", f"epsCurrent{phase}", f"epsPower{phase}",
+                  f"meterPower{phase}", f"loadsPower{phase}"]
+    datas = []
+    for i, name in enumerate(names):
+        value = None if i % 17 == 0 else round(i * 0.137, 3)
+        datas.append({"variable": name, "unit": "kW", "name": name, "value": value})
+    return datas
+
+
+def payloads(inverters):
+    raw = json.dumps({"errno": 0, "msg": "success", "result": [
+        {"deviceSN": f"SN{n:04d}", "time": "2024-06-01 12:00:00 BST+0100", "datas": real_time_variables()}
+        for n in range(inverters)
+    ]})
+    report = json.dumps({"errno": 0, "msg": "success", "result": [
+        {"variable": variable, "unit": "kWh", "values": [round(day * 1.7, 1) for day in range(31)]}
+        for variable in REPORT_VARIABLES
+    ]})
+    generation = json.dumps({"errno": 0, "msg": "success", "result": {"today": 12.3, "month": 301.5, "cumulative": 20155.1}})
+    return raw, report, generation
+
+
+def legacy_cycle(raw, report, generation, today=15):
+    """The decode path as it was before the decode module."""
+    allData = {"raw": {}, "report": {}, "reportDailyGeneration": {}}
+    response = json.loads(raw)
+    if response["errno"] == 0 and response["msg"] == "success":
+        for test in json.loads(raw)["result"]:
+            result = test.get("datas")
+            _LOGGER.debug(f"OA Variables Good Response: {result}")
+            for item in result:
+                variableName = item["variable"]
+                if item.get("value") is not None:
+                    variableValue = item["value"]
+                else:
+                    variableValue = 0
+                    _LOGGER.debug(f"Variable {variableName} no value, set to zero")
+                if variableName == "SoC_1":
+                    variableName = "SoC_1"
+                elif variableName == "batTemperature_1":
+                    variableName = "batTemperature"
+                elif variableName == "invBatPower_1":
+                    variableName = "invBatPower"
+                allData["raw"][variableName] = variableValue
+                _LOGGER.debug(f"Var: {variableName}, SN: x set to {allData['raw'][variableName]}")
+    response = json.loads(report)
+    if response["errno"] == 0 and response["msg"] == "success":
+        _LOGGER.debug(f"OA Report Data fetched OK: {response} " + report[:350])
+        for item in json.loads(report)["result"]:
+            index = 1
+            cumulative_total = 0
+            for dataItem in item["values"]:
+                if today == index:
+                    if dataItem is not None:
+                        cumulative_total = dataItem
+                    break
+                index += 1
+            allData["report"][item["variable"]] = round(cumulative_total, 3)
+    response = json.loads(generation)
+    if response["errno"] == 0 and response["msg"] == "success":
+        _LOGGER.debug("OA Daily Generation Report Data fetched OK Response:" + generation[:500])
+        parsed = json.loads(generation)["result"]
+        for key, name in (("today", "value"), ("month", "month"), ("cumulative", "cumulative")):
+            allData["reportDailyGeneration"][name] = parsed[key] if key in parsed else 0
+    _LOGGER.debug(allData)
+    return allData
+
+
+def current_cycle(raw, report, generation, today=15):
+    """The decode path through custom_components.foxess.decode."""
+    allData = {"raw": {}, "report": {}, "reportDailyGeneration": {}}
+    result, response = decode.decode_response(raw)
+    for test in result:
+        allData["raw"].update(decode.decode_variables(test.get("datas") or ()))
+    result, response = decode.decode_response(report)
+    for item in result:
+        values = item["values"]
+        value = values[today - 1] if today - 1 < len(values) else 0
+        allData["report"][item["variable"]] = round(value or 0, 3)
+    parsed, response = decode.decode_response(generation)
+    allData["reportDailyGeneration"]["value"] = parsed.get("today", 0)
+    allData["reportDailyGeneration"]["month"] = parsed.get("month", 0)
+    allData["reportDailyGeneration"]["cumulative"] = parsed.get("cumulative", 0)
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        _LOGGER.debug(allData)
+    return allData
+
+
+def time_cycle(func, args, rounds):
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func(*args)
+        best = min(best, (time.perf_counter() - start) / rounds)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--inverters", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=500)
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    args = parser.parse_args()
+
+    data = payloads(args.inverters)
+    if legacy_cycle(*data) != current_cycle(*data):
+        raise SystemExit("decode paths disagree, benchmark is not comparing like with like")
+
+    before = time_cycle(legacy_cycle, data, args.rounds)
+    after = time_cycle(current_cycle, data, args.rounds)
+    results = {
+        "benchmark": "decode_cycle",
+        "inverters": args.inverters,
+        "payload_bytes": sum(len(payload) for payload in data),
+        "orjson": decode.orjson is not None,
+        "before_us": round(before * 1e6, 1),
+        "after_us": round(after * 1e6, 1),
+        "speedup": round(before / after, 2),
+    }
+    if args.json:
+        print(json.dumps(results))
+    else:
+        for key, value in results.items():
+            print(f"{key:>14}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+End to end benchmark of the cloud poll cycle against the local fake OpenAPI (benchmarks/fake_openapi.py).
+
+For each fleet size it measures, with the integration's own client, scheduler, rate limiter and
+snapshot state:
+  - refresh_ms: wall time of a first refresh, when every endpoint of every inverter is due
+  - calls_per_day: calls the fake server saw over a simulated day of minute ticks, against the budget
+  - loop_block_max_ms / loop_lag_p99_ms: how late a 1 ms ticker ran while the day was simulated
+  - cpu_ms_per_cycle: process CPU per inverter update (the server runs in its own process)
+  - raw_kb_per_day: real time response bytes the client received, with the variable list the
+    integration works out (or everything with --all-variables)
+
+Each inverter is polled by the integration's own account hub and poller (hub.py), through its
+coordinator with the real cache and report store on a bare Home Assistant core, so Home Assistant
+has to be installed. The clock that hub.py and api.py read is set to the simulated minute.
+
+    python benchmarks/e2e_benchmark.py [--inverters 1,10,100] [--days 1] [--json] [fake server options]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import aiohttp
+from homeassistant.core import HomeAssistant
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from custom_components.foxess import api, hub # noqa: E402
+from custom_components.foxess.cache import FoxESSCache # noqa: E402
+from custom_components.foxess.capture import CaptureWriter # noqa: E402
+from custom_components.foxess.reports import FoxESSReportStore # noqa: E402
+from custom_components.foxess.scheduler import DAILY_CALL_LIMIT # noqa: E402
+from custom_components.foxess.variables import SLOW_VARIABLES # noqa: E402
+from decode_benchmark import real_time_variables # noqa: E402
+from fake_openapi import PATH_REAL, PATH_REAL_BATCH, add_arguments # noqa: E402
+
+START = datetime(2024, 6, 1, 0, 0)
+SUNRISE, SUNSET = 6, 20
+
+
+class SimulatedClock(datetime):
+    """Put in place of the datetime hub.py and api.py read the time from, now() is the simulated minute."""
+
+    current = START
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+def simulate_clock() -> None:
+    hub.datetime = api.datetime = SimulatedClock
+    # daylight paces the real time query, it follows the simulated clock rather than the real sun
+    hub.sun = SimpleNamespace(is_up=lambda hass: SUNRISE <= SimulatedClock.current.hour < SUNSET)
+
+
+class Fleet:
+    """Every inverter of one api key, on the integration's own account hub, each with its poller."""
+
+    def __init__(self, hass, session, domain, serials, apiRate, planned=True) -> None:
+        self.account = hub.FoxESSAccount(hass, "benchmark-key", apiRate)
+        # the same client on the fake server instead of the cloud
+        self.account.client = self.client = api.FoxESSOpenAPIClient(session, "benchmark-key", self.account.limiter, domain)
+        cache, reports = FoxESSCache(hass), FoxESSReportStore(hass)
+        SimulatedClock.current = START
+        for deviceSN in serials:
+            inverter = self.account.add_inverter(deviceSN, deviceSN, cache, reports)
+            if planned:
+                # the entities a default set up has enabled, every variable bar the extended PV strings
+                for item in real_time_variables():
+                    if not SLOW_VARIABLES.search(item["variable"]) or "emperat" in item["variable"]:
+                        inverter.variables.want(item["variable"], (item["variable"],))
+        self.coordinators = [inverter.coordinator for inverter in self.account.inverters.values()]
+        self.cycles = 0
+        self.failed = 0
+
+    async def tick(self, now):
+        # every inverter's coordinator fires on the same minute
+        SimulatedClock.current = now
+        await asyncio.gather(*(coordinator.async_refresh() for coordinator in self.coordinators))
+        self.cycles += len(self.coordinators)
+        self.failed += sum(not coordinator.last_update_success for coordinator in self.coordinators)
+
+
+class LoopMonitor:
+    """A 1 ms ticker, how late it wakes up is how long something held the event loop."""
+
+    def __init__(self) -> None:
+        self.lags = []
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + 0.001
+            await asyncio.sleep(0.001)
+            self.lags.append(max(0.0, loop.time() - expected))
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_server(args, port):
+    command = [sys.executable, os.path.join(os.path.dirname(__file__), "fake_openapi.py"), "--port", str(port)]
+    for option in ("latency", "jitter", "error_rate", "error_code", "timeout_rate", "hang", "variables", "pad", "seed"):
+        command += ["--" + option.replace("_", "-"), str(getattr(args, option))]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    async with aiohttp.ClientSession() as session:
+        for _ in range(100):
+            try:
+                async with session.get(f"http://127.0.0.1:{port}/_stats"):
+                    return server
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.1)
+    server.kill()
+    raise SystemExit("fake OpenAPI server did not start")
+
+
+async def server_stats(session, domain, reset=False):
+    async with session.request("POST" if reset else "GET", domain + "/_stats") as response:
+        return await response.json()
+
+
+async def run(args, session, domain, inverters) -> dict:
+    serials = [f"SN{number:05d}" for number in range(inverters)]
+    with tempfile.TemporaryDirectory() as config_dir:
+        # a Home Assistant core with nothing else set up, for the coordinators and the stores
+        hass = HomeAssistant(config_dir)
+        try:
+            return await run_fleet(args, hass, session, domain, serials)
+        finally:
+            await hass.async_stop(force=True)
+
+
+async def run_fleet(args, hass, session, domain, serials) -> dict:
+    # first refresh, everything is due, repeated with a fresh fleet each time
+    timings = []
+    for _ in range(args.repeats):
+        fleet = Fleet(hass, session, domain, serials, args.api_rate, planned=not args.all_variables)
+        start = time.perf_counter()
+        await fleet.tick(START)
+        timings.append(time.perf_counter() - start)
+
+    # a simulated day of minute ticks, the scheduler decides what is called
+    await server_stats(session, domain, reset=True)
+    fleet = Fleet(hass, session, domain, serials, args.api_rate, planned=not args.all_variables)
+    client = fleet.client
+    if args.capture:
+        client.capture = CaptureWriter(hass, f"{args.capture}.{len(serials)}.jsonl.gz")
+    minutes = 1440 * args.days
+    cpu = time.process_time()
+    with LoopMonitor() as monitor:
+        for minute in range(minutes):
+            await fleet.tick(START + timedelta(minutes=minute))
+    cpu = time.process_time() - cpu
+    if client.capture is not None:
+        await client.capture.async_flush()
+    served = await server_stats(session, domain)
+    calls = sum(served["calls"].values())
+    lags = sorted(monitor.lags) or [0.0]
+    return {
+        "benchmark": "e2e_cycle",
+        "inverters": len(serials),
+        "refresh_ms": round(1000 * statistics.median(timings), 2),
+        "calls_per_day": round(calls / args.days),
+        "budget_per_day": DAILY_CALL_LIMIT * len(serials),
+        "calls_by_endpoint": {path: round(count / args.days) for path, count in sorted(served["calls"].items())},
+        "server_errors": served["errors"],
+        "failed_cycles": fleet.failed,
+        "loop_block_max_ms": round(1000 * lags[-1], 2),
+        "loop_lag_p99_ms": round(1000 * lags[int(0.99 * (len(lags) - 1))], 2),
+        "cpu_ms_per_cycle": round(1000 * cpu / fleet.cycles, 3),
+        "raw_kb_per_day": round(sum(served["sent"].get(path, 0) for path in (PATH_REAL, PATH_REAL_BATCH)) / 1024 / args.days),
+        "client_endpoints": {
+            endpoint: {key: metrics[key] for key in ("calls", "errors", "timeouts", "slow", "timeout", "latencyP95")}
+            for endpoint, metrics in client.metrics.summary().items()
+        },
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--inverters", default="1,10,100", help="comma separated fleet sizes")
+    parser.add_argument("--days", type=int, default=1, help="simulated days for the call count")
+    parser.add_argument("--repeats", type=int, default=5, help="first refreshes timed per fleet size")
+    parser.add_argument("--api-rate", type=float, default=1000.0, help="client calls per second, the real limit is 1")
+    parser.add_argument("--client-timeout", type=float, default=2.0, help="seconds, replaces the per endpoint timeout ceilings")
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    parser.add_argument("--all-variables", action="store_true", help="ask for every real time variable, as before the variable list was worked out")
+    parser.add_argument("--capture", help="capture the simulated day's traffic to CAPTURE.<inverters>.jsonl.gz, for replay_capture.py")
+    parser.add_argument("--verbose", action="store_true", help="show the integration's log, eg. the injected errors")
+    add_arguments(parser)
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.getLogger("custom_components.foxess").setLevel(logging.CRITICAL)
+
+    simulate_clock()
+    # the real timeouts are up to 75 s, a hang would make the simulated day take hours
+    for path in api.ENDPOINT_TIMEOUTS:
+        api.ENDPOINT_TIMEOUTS[path] = args.client_timeout
+
+    port = free_port()
+    domain = f"http://127.0.0.1:{port}"
+    server = await start_server(args, port)
+    try:
+        async with aiohttp.ClientSession() as session:
+            results = [await run(args, session, domain, int(size)) for size in args.inverters.split(",")]
+    finally:
+        server.terminate()
+        server.wait()
+    if args.json:
+        print(json.dumps(results))
+    else:
+        for result in results:
+            for key, value in result.items():
+                print(f"{key:>18}: {value}")
+            print()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
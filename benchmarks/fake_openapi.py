@@ -0,0 +1,156 @@
+"""
+Local fake of the FoxESS OpenAPI, for the end to end benchmark and for trying the integration offline.
+
+Serves the endpoint paths the integration calls with plausible payloads, and can add latency,
+answer with OpenAPI error codes (40400 rate limited, 40256 bad headers) or hang past the client's
+timeout. GET /_stats returns the calls served per path, POST /_stats clears them.
+
+    python benchmarks/fake_openapi.py [--port 8765] [--latency MS] [--error-rate F] [--error-code 40400]
+                                      [--timeout-rate F] [--hang S] [--variables N] [--pad BYTES]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import Counter
+import json
+import os
+import random
+import sys
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from decode_benchmark import REPORT_VARIABLES, real_time_variables # noqa: E402
+
+PATH_REAL = "/op/v0/device/real/query"
+PATH_REAL_BATCH = "/op/v1/device/real/query"
+PATH_REPORT = "/op/v0/device/report/query"
+PATH_DETAIL = "/op/v0/device/detail"
+PATH_BATTERY = "/op/v0/device/battery/soc/get"
+PATH_GENERATION = "/op/v0/device/generation"
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """The server options, shared with the benchmark that starts it."""
+    parser.add_argument("--latency", type=float, default=0.0, help="ms added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="ms of random extra latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with --error-code")
+    parser.add_argument("--error-code", type=int, default=40400, choices=(40400, 40256, 40257, 41809))
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="fraction of calls that hang for --hang seconds")
+    parser.add_argument("--hang", type=float, default=5.0)
+    parser.add_argument("--variables", type=int, default=0, help="real time variables per inverter, 0 for all")
+    parser.add_argument("--pad", type=int, default=0, help="bytes of filler added to every payload")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+class FakeOpenAPI:
+
+    def __init__(self, options) -> None:
+        self.options = options
+        self.calls = Counter()
+        self.errors = Counter()
+        self.sent = Counter() # response bytes by path
+        self._random = random.Random(options.seed)
+        datas = real_time_variables()
+        self._datas = datas[:options.variables] if options.variables else datas
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(PATH_REAL, self.real)
+        app.router.add_post(PATH_REAL_BATCH, self.real_batch)
+        app.router.add_post(PATH_REPORT, self.report)
+        app.router.add_get(PATH_DETAIL, self.detail)
+        app.router.add_get(PATH_BATTERY, self.battery)
+        app.router.add_get(PATH_GENERATION, self.generation)
+        app.router.add_get("/_stats", self.stats)
+        app.router.add_post("/_stats", self.reset)
+        return app
+
+    async def _reply(self, request: web.Request, result) -> web.Response:
+        """Count the call, apply the configured latency and failures, then answer like the OpenAPI does."""
+        options = self.options
+        self.calls[request.path] += 1
+        if "signature" not in request.headers or "token" not in request.headers:
+            return web.json_response({"errno": 40256, "msg": "header parameters are missing", "result": None})
+        if self._random.random() < options.timeout_rate:
+            self.errors["timeout"] += 1
+            await asyncio.sleep(options.hang)
+        delay = options.latency + self._random.random() * options.jitter
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if self._random.random() < options.error_rate:
+            self.errors[str(options.error_code)] += 1
+            return web.json_response({"errno": options.error_code, "msg": "fake error", "result": None})
+        body = {"errno": 0, "msg": "success", "result": result}
+        if options.pad:
+            body["padding"] = "x" * options.pad
+        text = json.dumps(body)
+        self.sent[request.path] += len(text)
+        return web.Response(text=text, content_type="application/json")
+
+    def _inverter(self, deviceSN: str, variables=None) -> dict:
+        datas = []
+        for item in self._datas:
+            if variables is not None and item["variable"] not in variables:
+                continue
+            value = item["value"]
+            if isinstance(value, float):
+                value = round(value * (0.8 + 0.4 * self._random.random()), 3)
+            datas.append({**item, "value": value})
+        return {"deviceSN": deviceSN, "time": "2024-06-01 12:00:00 BST+0100", "datas": datas}
+
+    async def real(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        return await self._reply(request, [self._inverter(body["sn"], body.get("variables"))])
+
+    async def real_batch(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        variables = body.get("variables")
+        return await self._reply(request, [self._inverter(deviceSN, variables) for deviceSN in body["sns"]])
+
+    async def report(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        count = {"year": 12, "month": 31, "day": 24}[body["dimension"]]
+        result = [
+            {"variable": variable, "unit": "kWh", "values": [round(0.1 + index * 0.37 % 5, 2) for index in range(count)]}
+            for variable in body.get("variables", REPORT_VARIABLES)
+        ]
+        return await self._reply(request, result)
+
+    async def detail(self, request: web.Request) -> web.Response:
+        deviceSN = request.query["sn"]
+        return await self._reply(request, {
+            "deviceSN": deviceSN, "moduleSN": f"M{deviceSN}", "stationName": f"Station {deviceSN}",
+            "deviceType": "H1-5.0-E", "status": 1, "hasBattery": True, "hasPV": True,
+        })
+
+    async def battery(self, request: web.Request) -> web.Response:
+        return await self._reply(request, {"minSoc": 10, "minSocOnGrid": 15})
+
+    async def generation(self, request: web.Request) -> web.Response:
+        return await self._reply(request, {"today": 12.3, "month": 301.5, "cumulative": 20155.1})
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"calls": dict(self.calls), "errors": dict(self.errors), "sent": dict(self.sent)})
+
+    async def reset(self, request: web.Request) -> web.Response:
+        self.calls.clear()
+        self.errors.clear()
+        self.sent.clear()
+        return web.json_response({"ok": True})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    options = parser.parse_args()
+    print(f"fake FoxESS OpenAPI on http://{options.host}:{options.port}", flush=True)
+    web.run_app(FakeOpenAPI(options).app(), host=options.host, port=options.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Modbus TCP simulator of a FoxESS inverter, for trying the local transport without hardware.
+
+Serves the registers of a custom_components.foxess.modbus register map with values that drift
+like a small PV + battery system. Point the integration's modbusHost at it, or run it with
+--check to poll it with the integration's own client and print what was decoded.
+
+    python benchmarks/modbus_simulator.py [--host 127.0.0.1] [--port 5020] [--model H1] [--check N] [--json]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_components.foxess import modbus # noqa: E402
+from custom_components.foxess.snapshot import GROUP_RAW, InverterState # noqa: E402
+
+
+def simulated_values(now: float) -> dict:
+    """Engineering values (as the OpenAPI would report them) for a moment in time."""
+    sun = max(0.0, math.sin(now / 600))
+    pv1 = round(2.4 * sun, 3)
+    pv2 = round(1.9 * sun, 3)
+    loads = round(0.6 + 0.3 * math.sin(now / 97) ** 2, 3)
+    battery = round(min(2.5, max(-2.5, loads - pv1 - pv2)), 3) # positive is discharging
+    meter = round(pv1 + pv2 + battery - loads, 3) # positive is feeding in
+    return {
+        "pv1Volt": 320.5, "pv1Current": round(pv1 / 0.3205, 1), "pv1Power": pv1,
+        "pv2Volt": 298.1, "pv2Current": round(pv2 / 0.2981, 1), "pv2Power": pv2,
+        "RVolt": 241.3, "RCurrent": round((pv1 + pv2 + battery) / 0.2413, 1), "generationPower": round(pv1 + pv2 + battery, 3),
+        "RFreq": 50.01, "epsVoltR": 0, "epsCurrentR": 0, "epsPowerR": 0,
+        "meterPower": meter, "meterPower2": 0, "loadsPower": loads,
+        "invTemperation": 38.2, "ambientTemperation": 24.9,
+        "batVolt": 204.8, "batCurrent": round(battery / 0.2048, 1), "invBatPower": battery,
+        "batTemperature": 21.5, "SoC": 57, "runningState": 3,
+    }
+
+
+def encode(registerMap: modbus.RegisterMap, values: dict) -> dict[int, int]:
+    """{address: 16 bit word} for the map's registers."""
+    words = {}
+    for register in registerMap.registers:
+        raw = round(values.get(register.name, 0) / register.scale)
+        raw &= (1 << (16 * register.count)) - 1
+        for index in range(register.count):
+            words[register.address + index] = (raw >> (16 * (register.count - 1 - index))) & 0xFFFF
+    return words
+
+
+class Simulator:
+
+    def __init__(self, registerMap: modbus.RegisterMap, unit: int) -> None:
+        self.registerMap = registerMap
+        self.unit = unit
+        self.requests = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                transaction, protocol, length, unit = struct.unpack(">HHHB", await reader.readexactly(7))
+                pdu = await reader.readexactly(length - 1)
+                self.requests += 1
+                function = pdu[0]
+                if unit != self.unit:
+                    continue # a real gateway just times out
+                if function not in (modbus.FUNCTION_READ_HOLDING, modbus.FUNCTION_READ_INPUT) or len(pdu) != 5:
+                    reply = bytes([function | 0x80, 1]) # illegal function
+                elif function != self.registerMap.function:
+                    reply = bytes([function | 0x80, 2]) # illegal data address
+                else:
+                    start, count = struct.unpack(">HH", pdu[1:])
+                    words = encode(self.registerMap, simulated_values(time.time()))
+                    data = [words.get(address, 0) for address in range(start, start + count)]
+                    reply = struct.pack(f">BB{count}H", function, 2 * count, *data)
+                writer.write(struct.pack(">HHHB", transaction, 0, len(reply) + 1, unit) + reply)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def check(args, simulator: Simulator) -> dict:
+    client = modbus.ModbusTcpClient(args.host, args.port, args.unit)
+    inverter = modbus.FoxESSModbusInverter(client, simulator.registerMap)
+    state = InverterState()
+    timings = []
+    for _ in range(args.check):
+        start = time.perf_counter()
+        if await inverter.async_read(state):
+            raise SystemExit("read from the simulator failed")
+        timings.append(time.perf_counter() - start)
+    await client.close()
+    return {
+        "benchmark": "modbus_local_read",
+        "model": args.model,
+        "polls": args.check,
+        "requests_per_poll": inverter.reads / args.check,
+        "registers_per_poll": sum(count for start, count, registers in inverter._blocks),
+        "mean_poll_ms": round(1000 * sum(timings) / len(timings), 2),
+        "variables": state.section(GROUP_RAW),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020)
+    parser.add_argument("--unit", type=int, default=modbus.DEFAULT_UNIT)
+    parser.add_argument("--model", default="H1", choices=sorted(modbus.REGISTER_MAPS))
+    parser.add_argument("--check", type=int, default=0, help="poll the simulator N times then exit")
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    args = parser.parse_args()
+
+    simulator = Simulator(modbus.REGISTER_MAPS[args.model], args.unit)
+    server = await asyncio.start_server(simulator.handle, args.host, args.port)
+    async with server:
+        if not args.check:
+            print(f"simulating a FoxESS {args.model} on {args.host}:{args.port} unit {args.unit}")
+            await server.serve_forever()
+        results = await check(args, simulator)
+    if args.json:
+        print(json.dumps(results))
+    else:
+        for key, value in results.items():
+            print(f"{key:>18}: {value}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,144 @@
+"""
+Replay captured OpenAPI traffic (the integration's capture option) through the client at full speed.
+
+Every captured call is fed back through the client method that made it (getRaw, getOADeviceDetail,
+getReport, ...), so parsing problems and slow decoding seen on a real inverter can be reproduced
+offline. Prints the time spent per endpoint and the values each inverter ended up with, with --json
+the output can be kept next to the capture as a regression baseline.
+
+    python benchmarks/replay_capture.py foxess_capture.jsonl.gz [more captures ...] [--rounds N] [--json]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import defaultdict
+from datetime import date
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from homeassistant.core import HomeAssistant
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from custom_components.foxess import api # noqa: E402
+from custom_components.foxess.capture import FoxESSReplayClient, read_captures # noqa: E402
+from custom_components.foxess.reports import FoxESSReportStore # noqa: E402
+from custom_components.foxess.snapshot import GROUP_BATTERY, GROUP_GENERATION, GROUP_RAW, GROUP_REPORT, InverterState # noqa: E402
+
+
+def call_for(client, states, reports, entry):
+    """The client call that made a captured request, None for anything the client doesn't call."""
+    path = entry["path"]
+    request = json.loads(entry["body"]) if entry.get("body") else {}
+    params = entry.get("params") or {}
+
+    def state(deviceSN):
+        if deviceSN not in states:
+            states[deviceSN] = InverterState()
+            states[deviceSN].addressbook = {"hasBattery": True}
+        return states[deviceSN]
+
+    if path == api._ENDPOINT_OA_DEVICE_VARIABLES:
+        return client.getRaw({request["sn"]: state(request["sn"])}, request.get("variables"))
+    if path == api._ENDPOINT_OA_BATCH_DEVICE_VARIABLES:
+        return client.getRaw({deviceSN: state(deviceSN) for deviceSN in request["sns"]}, request.get("variables"))
+    if path == api._ENDPOINT_OA_DEVICE_DETAIL:
+        return client.getOADeviceDetail(state(params["sn"]), params["sn"])
+    if path == api._ENDPOINT_OA_BATTERY_SETTINGS:
+        return client.getOABatterySettings(state(params["sn"]), params["sn"])
+    if path == api._ENDPOINT_OA_DAILY_GENERATION:
+        return client.getReportDailyGeneration(state(params["sn"]), params["sn"])
+    if path == api._ENDPOINT_OA_REPORT:
+        deviceSN = request["sn"]
+        if request.get("dimension") == "year":
+            return client.getReportYear(state(deviceSN), deviceSN, reports)
+        if request.get("dimension") == "day":
+            return client.getReportHours(deviceSN, date(request["year"], request["month"], request["day"]))
+        return client.getReport(state(deviceSN), deviceSN, reports)
+    return None
+
+
+async def replay(hass, entries):
+    """One pass over the capture, returns (client, states, seconds spent per path, failed calls per path)."""
+    client = FoxESSReplayClient(entries)
+    states = {}
+    reports = FoxESSReportStore(hass)
+    spent = defaultdict(float)
+    failed = defaultdict(int)
+    for entry in entries:
+        call = call_for(client, states, reports, entry)
+        if call is None:
+            continue
+        start = time.perf_counter()
+        result = await call
+        spent[entry["path"]] += time.perf_counter() - start
+        if result is True or (isinstance(result, set) and result):
+            failed[entry["path"]] += 1
+    return client, states, spent, failed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("captures", nargs="+")
+    parser.add_argument("--rounds", type=int, default=10, help="replays timed, the fastest is reported")
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    parser.add_argument("--verbose", action="store_true", help="show the integration's log")
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.getLogger("custom_components.foxess").setLevel(logging.CRITICAL)
+
+    entries = read_captures(*args.captures)
+    best = None
+    with tempfile.TemporaryDirectory() as config_dir:
+        # the report store keeps its months in a HA Store, a bare core is all it needs
+        hass = HomeAssistant(config_dir)
+        try:
+            for _ in range(args.rounds):
+                client, states, spent, failed = await replay(hass, entries)
+                if best is None or sum(spent.values()) < sum(best[2].values()):
+                    best = client, states, spent, failed
+        finally:
+            await hass.async_stop(force=True)
+    client, states, spent, failed = best
+    calls = defaultdict(int)
+    captured_ms = defaultdict(int)
+    for entry in entries:
+        calls[entry["path"]] += 1
+        captured_ms[entry["path"]] += entry.get("elapsed_ms") or 0
+    results = {
+        "benchmark": "replay",
+        "entries": len(entries),
+        "replayed": client.replayed,
+        "missing": client.missing,
+        "endpoints": {
+            path: {
+                "calls": calls[path],
+                "failed": failed[path],
+                "decode_us_per_call": round(1e6 * spent[path] / calls[path], 1),
+                "captured_ms_per_call": round(captured_ms[path] / calls[path], 1),
+            }
+            for path in sorted(calls)
+        },
+        "states": {
+            deviceSN: {
+                "addressbook": state.addressbook,
+                **{group: state.section(group) for group in (GROUP_RAW, GROUP_REPORT, GROUP_GENERATION, GROUP_BATTERY) if state.section(group)},
+            }
+            for deviceSN, state in sorted(states.items())
+        },
+    }
+    if args.json:
+        print(json.dumps(results, default=str))
+    else:
+        for key, value in results.items():
+            print(f"{key:>10}: {value}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
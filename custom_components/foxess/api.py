@@ -0,0 +1,375 @@
+"""FoxESS OpenAPI client, one per api key."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+import hashlib
+import json
+import logging
+import time
+
+import aiohttp
+
+from .breaker import BreakerSet
+from .decode import decode_response, decode_variables
+from .metrics import ApiMetrics
+from .scheduler import ENDPOINT_BATTERY, ENDPOINT_DETAIL, ENDPOINT_GENERATION, ENDPOINT_RAW, ENDPOINT_REPORT
+from .snapshot import GROUP_BATTERY, GROUP_GENERATION, GROUP_RAW, GROUP_REPORT
+
+_LOGGER = logging.getLogger(__name__)
+_ENDPOINT_OA_DOMAIN = "https://www.foxesscloud.com"
+_ENDPOINT_OA_BATTERY_SETTINGS = "/op/v0/device/battery/soc/get"
+_ENDPOINT_OA_REPORT = "/op/v0/device/report/query"
+_ENDPOINT_OA_DEVICE_DETAIL = "/op/v0/device/detail"
+_ENDPOINT_OA_DEVICE_VARIABLES = "/op/v0/device/real/query"
+_ENDPOINT_OA_BATCH_DEVICE_VARIABLES = "/op/v1/device/real/query"
+_ENDPOINT_OA_DAILY_GENERATION = "/op/v0/device/generation"
+
+METHOD_POST = "POST"
+METHOD_GET = "GET"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+DEFAULT_TIMEOUT = 75 # longest any call may take, the API is a bit slow
+
+# most seconds allowed for each endpoint, the small queries shouldn't hold the coordinator up for as long as
+# the reports. Once an endpoint has answered a few times its timeout is learned from its latencies, up to these
+ENDPOINT_TIMEOUTS = {
+    _ENDPOINT_OA_DEVICE_DETAIL: 30,
+    _ENDPOINT_OA_BATTERY_SETTINGS: 30,
+    _ENDPOINT_OA_DEVICE_VARIABLES: 30,
+    _ENDPOINT_OA_BATCH_DEVICE_VARIABLES: 45,
+    _ENDPOINT_OA_REPORT: 60,
+    _ENDPOINT_OA_DAILY_GENERATION: 45,
+}
+
+# path -> the scheduler's name for the endpoint, what the metrics are kept under
+PATH_ENDPOINTS = {
+    _ENDPOINT_OA_DEVICE_DETAIL: ENDPOINT_DETAIL,
+    _ENDPOINT_OA_BATTERY_SETTINGS: ENDPOINT_BATTERY,
+    _ENDPOINT_OA_DEVICE_VARIABLES: ENDPOINT_RAW,
+    _ENDPOINT_OA_BATCH_DEVICE_VARIABLES: ENDPOINT_RAW,
+    _ENDPOINT_OA_REPORT: ENDPOINT_REPORT,
+    _ENDPOINT_OA_DAILY_GENERATION: ENDPOINT_GENERATION,
+}
+
+RAW_BATCH_MAX_DEVICES = 50 # most serial numbers the OpenAPI accepts in one real time query
+REPORT_VARIABLES = ["feedin","generation","gridConsumption","chargeEnergyToTal","dischargeEnergyToTal","loads"]
+
+
+class GetAuth:
+
+    def get_signature(self, token, path, lang='en'):
+        """
+        This function is used to generate a signature consisting of URL, token, and timestamp, and return a dictionary containing the signature and other information.
+            :param token: your key
+            :param path:  your request path
+            :param lang: language, default is English.
+            :return: with authentication header
+        """
+        timestamp = round(time.time() * 1000)
+        signature = fr'{path}\r\n{token}\r\n{timestamp}'
+        result = {
+            'token': token,
+            'lang': lang,
+            'timestamp': str(timestamp),
+            'Content-Type': 'application/json',
+            'signature': self.md5c(text=signature),
+            'User-Agent': USER_AGENT,
+            'Accept-Encoding': 'gzip, deflate',
+        }
+
+        return result
+
+    @staticmethod
+    def md5c(text="", _type="lower"):
+        res = hashlib.md5(text.encode(encoding='UTF-8')).hexdigest()
+        if _type.__eq__("lower"):
+            return res
+        else:
+            return res.upper()
+
+
+class FoxESSOpenAPIClient:
+    """
+    Talks to the FoxESS OpenAPI for one api key.
+    The aiohttp session is kept for the life of the account so calls reuse kept-alive connections
+    (and their TLS sessions) instead of paying for a new handshake every time. Every call waits
+    for the account's rate limiter first.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, apiKey, limiter, domain=_ENDPOINT_OA_DOMAIN):
+        self._session = session
+        self._apiKey = apiKey
+        self._limiter = limiter
+        self._domain = domain
+        self.capture = None # a capture.CaptureWriter while traffic is being captured
+        self.metrics = ApiMetrics()
+        self.breakers = BreakerSet() # callers ask breakers.allow() before starting a call
+
+    async def _request(self, method, path, params=None, body=None):
+        """
+        Make one signed call to the OpenAPI.
+            :return: (response text or None if the call failed, response time in mS)
+        """
+        await self._limiter.acquire() # check for api delay
+
+        headerData = GetAuth().get_signature(token=self._apiKey, path=path)
+        endpoint = PATH_ENDPOINTS.get(path, path)
+        timeout = aiohttp.ClientTimeout(total=self.metrics.deadline(endpoint, ENDPOINT_TIMEOUTS.get(path, DEFAULT_TIMEOUT)))
+        timestamp = time.monotonic()
+        status = None
+        try:
+            async with self._session.request(
+                method, self._domain + path, params=params, data=body, headers=headerData, timeout=timeout
+            ) as response:
+                status = response.status
+                response.raise_for_status()
+                text = await response.text()
+        except asyncio.TimeoutError:
+            _LOGGER.debug("Timeout fetching %s from FoxESS Cloud after %.1fs", path, timeout.total)
+            self.metrics.record_timeout(endpoint)
+            self.breakers.failure(endpoint, "timeout", datetime.now())
+            if self.capture is not None:
+                self.capture.record_call(method, path, params, body, headerData, status, None, timestamp, "timeout")
+            return None, 0
+        except aiohttp.ClientError as err:
+            _LOGGER.debug("Error fetching %s from FoxESS Cloud: %s", path, err)
+            error = f"http {status}" if status else "connection"
+            self.metrics.record_call(endpoint, None, error)
+            self.breakers.failure(endpoint, error, datetime.now())
+            if self.capture is not None:
+                self.capture.record_call(method, path, params, body, headerData, status, None, timestamp, repr(err))
+            return None, 0
+        responseTime = round((time.monotonic() - timestamp) * 1000)
+        self.metrics.record_call(endpoint, responseTime)
+        if self.capture is not None:
+            self.capture.record_call(method, path, params, body, headerData, status, text, timestamp)
+        return text, responseTime
+
+    def _decode(self, path, data):
+        """decode_response, counting any OpenAPI error code against the endpoint and its breaker."""
+        result, response = decode_response(data)
+        endpoint = PATH_ENDPOINTS.get(path, path)
+        if result is not None:
+            self.breakers.success(endpoint)
+        elif isinstance(response, dict):
+            self.metrics.record_errno(endpoint, response.get("errno"))
+            self.breakers.failure(endpoint, response.get("errno"), datetime.now())
+        else:
+            self.breakers.failure(endpoint, "malformed", datetime.now())
+        return result, response
+
+    async def getOADeviceDetail(self, state, deviceSN):
+
+        _LOGGER.debug("OADevice Detail fetch %s %s", _ENDPOINT_OA_DEVICE_DETAIL, deviceSN)
+
+        data, ResponseTime = await self._request(METHOD_GET, _ENDPOINT_OA_DEVICE_DETAIL, params={"sn": deviceSN})
+
+        if not data:
+            _LOGGER.debug("Unable to get OA Device Detail from FoxESS Cloud")
+            return True
+        result, response = self._decode(_ENDPOINT_OA_DEVICE_DETAIL, data)
+        if result is None:
+            _LOGGER.error("OA Device Detail Bad Response: %s", response)
+            return True
+        _LOGGER.debug("OA Device Detail Good Response: %s", result)
+        # manually poke this in as on the old cloud it was called plantname, need to keep in line with old entity name
+        result['plantName'] = result['stationName']
+        state.addressbook = result
+        _LOGGER.debug("OA Device Detail System has Battery: %s", result['hasBattery'])
+        return False
+
+    async def getOABatterySettings(self, state, deviceSN):
+
+        if not state.addressbook.get("hasBattery", False):
+            # device detail reports no battery fitted so reset these variables to show unknown
+            state.set(GROUP_BATTERY, "minSoc", None)
+            state.set(GROUP_BATTERY, "minSocOnGrid", None)
+            return False
+
+        # only make this call if device detail reports battery fitted
+        _LOGGER.debug("OABattery Settings fetch %s %s", _ENDPOINT_OA_BATTERY_SETTINGS, deviceSN)
+        data, ResponseTime = await self._request(METHOD_GET, _ENDPOINT_OA_BATTERY_SETTINGS, params={"sn": deviceSN})
+
+        if data is None:
+            _LOGGER.debug("Unable to get OA Battery Settings from FoxESS Cloud")
+            return True
+        result, response = self._decode(_ENDPOINT_OA_BATTERY_SETTINGS, data)
+        if result is None:
+            _LOGGER.error("OA Battery Settings Bad Response: %s", response)
+            return True
+        state.set(GROUP_BATTERY, "minSoc", result['minSoc'])
+        state.set(GROUP_BATTERY, "minSocOnGrid", result['minSocOnGrid'])
+        _LOGGER.debug("OA Battery Settings read MinSoc: %s, MinSocOnGrid: %s", result['minSoc'], result['minSocOnGrid'])
+        return False
+
+    async def getReport(self, state, deviceSN, reports):
+
+        now = datetime.now()
+
+        # only the days that may still change are fetched, the whole month while yesterday (or any
+        # earlier day) is open, otherwise just today's hours
+        monthly = reports.open_days(deviceSN, now) > 1
+        request = {"sn": deviceSN, "year": now.year, "month": now.month, "dimension": "month"}
+        if not monthly:
+            request.update(day=now.day, dimension="day")
+        request["variables"] = REPORT_VARIABLES
+        reportData = json.dumps(request)
+
+        _LOGGER.debug("getReport OA request: %s", reportData)
+
+        data, ResponseTime = await self._request(METHOD_POST, _ENDPOINT_OA_REPORT, body=reportData)
+
+        if not data:
+            _LOGGER.debug("Unable to get OA Report from FoxESS Cloud")
+            return True
+        result, response = self._decode(_ENDPOINT_OA_REPORT, data)
+        if result is None:
+            _LOGGER.debug("OA Report Bad Response: %s", response)
+            return True
+        _LOGGER.debug("OA Report Data fetched OK: %.350s", data)
+        # the report store keeps the whole month and works out today's, month to date and year to
+        # date values from it
+        if monthly:
+            if any(item['values'][now.day - 1] is None for item in result if now.day <= len(item['values'])):
+                _LOGGER.warning("Report month fetch, None received")
+            reports.put_month(deviceSN, now, result)
+        else:
+            reports.put_day(deviceSN, now, result)
+        reports.apply(state, deviceSN, now)
+        _LOGGER.debug("OA Report Totals: %s", state.section(GROUP_REPORT))
+        return False
+
+    async def getReportYear(self, state, deviceSN, reports):
+
+        now = datetime.now()
+
+        reportData = json.dumps({
+            "sn": deviceSN,
+            "year": now.year,
+            "dimension": "year",
+            "variables": REPORT_VARIABLES,
+        })
+
+        _LOGGER.debug("getReportYear OA request: %s", reportData)
+
+        data, ResponseTime = await self._request(METHOD_POST, _ENDPOINT_OA_REPORT, body=reportData)
+
+        if not data:
+            _LOGGER.debug("Unable to get OA Year Report from FoxESS Cloud")
+            return True
+        result, response = self._decode(_ENDPOINT_OA_REPORT, data)
+        if result is None:
+            _LOGGER.debug("OA Year Report Bad Response: %s", response)
+            return True
+        _LOGGER.debug("OA Year Report Data fetched OK: %.350s", data)
+        reports.put_year(deviceSN, now, result)
+        reports.apply(state, deviceSN, now)
+        return False
+
+    async def getReportHours(self, deviceSN, day):
+        """
+        Fetch the hourly report of one past day, for the statistics backfill.
+            :return: the undecoded response text or None, it is decoded off the event loop by the caller
+        """
+        reportData = json.dumps({
+            "sn": deviceSN,
+            "year": day.year,
+            "month": day.month,
+            "day": day.day,
+            "dimension": "day",
+            "variables": REPORT_VARIABLES,
+        })
+
+        _LOGGER.debug("getReportHours OA request: %s", reportData)
+
+        data, ResponseTime = await self._request(METHOD_POST, _ENDPOINT_OA_REPORT, body=reportData)
+
+        if not data:
+            _LOGGER.debug("Unable to get OA Hourly Report from FoxESS Cloud")
+        return data
+
+    async def getReportDailyGeneration(self, state, deviceSN):
+
+        generationData = '{"sn":"'+deviceSN+'","dimension":"day"}'
+
+        _LOGGER.debug("getReportDailyGeneration OA request: %s", generationData)
+
+        data, ResponseTime = await self._request(
+            METHOD_GET, _ENDPOINT_OA_DAILY_GENERATION, params={"sn": deviceSN}, body=generationData
+        )
+
+        if not data:
+            _LOGGER.debug("Unable to get OA Daily Generation Report from FoxESS Cloud")
+            return True
+        parsed, response = self._decode(_ENDPOINT_OA_DAILY_GENERATION, data)
+        if parsed is None:
+            _LOGGER.debug("OA Daily Generation Report Bad Response: %s", response)
+            return True
+        # a missing value reads as 0
+        state.set(GROUP_GENERATION, "value", parsed.get('today', 0))
+        state.set(GROUP_GENERATION, "month", parsed.get('month', 0))
+        state.set(GROUP_GENERATION, "cumulative", parsed.get('cumulative', 0))
+        _LOGGER.debug("OA Daily Generation Report data: %s", parsed)
+        return False
+
+    async def getRaw(self, devices, variables=None, nulls=None):
+        """
+        Fetch the real time variables for every inverter in devices with as few OpenAPI calls as possible.
+            :param devices: dict of deviceSN to that inverter's InverterState
+            :param variables: list of variable names to ask for, None asks for everything
+            :param nulls: dict the variables returned without a value are added to, by deviceSN
+            :return: set of the deviceSN that failed to update
+        """
+        failed = set()
+        serials = list(devices)
+        for first in range(0, len(serials), RAW_BATCH_MAX_DEVICES):
+            batch = serials[first:first + RAW_BATCH_MAX_DEVICES]
+            failed.update(await self._getRawBatch(devices, batch, variables, nulls))
+        return failed
+
+    async def _getRawBatch(self, devices, batch, variables, nulls=None):
+
+        # "deviceSN" used for OpenAPI and it only fetches the real time data
+        # a single inverter keeps using the v0 query, several share one v1 query with a list of serial numbers
+        if len(batch) == 1:
+            path = _ENDPOINT_OA_DEVICE_VARIABLES
+            request = {"sn": batch[0]}
+        else:
+            path = _ENDPOINT_OA_BATCH_DEVICE_VARIABLES
+            request = {"sns": batch}
+
+        if variables is not None:
+            _LOGGER.debug("Getting %s Device Variables", len(variables))
+            request["variables"] = variables
+
+        rawData = json.dumps(request)
+        _LOGGER.debug("getRaw OA request: %s", rawData)
+
+        data, ResponseTime = await self._request(METHOD_POST, path, body=rawData)
+
+        if not data:
+            _LOGGER.debug("Unable to get OA Variables from FoxESS Cloud")
+            return set(batch)
+        result, response = self._decode(path, data)
+        if result is None:
+            _LOGGER.debug("OA Device Variables Bad Response: %s", response)
+            return set(batch)
+
+        failed = set(batch)
+        for test in result:
+            # the v0 query doesn't echo the serial number back, it can only be the one we asked for
+            deviceSN = test.get('deviceSN') if len(batch) > 1 else batch[0]
+            if deviceSN not in failed:
+                _LOGGER.debug("OA Variables unexpected device in response: %s", deviceSN)
+                continue
+            state = devices[deviceSN]
+            state.update(GROUP_RAW, decode_variables(
+                test.get('datas') or (), nulls=None if nulls is None else nulls.setdefault(deviceSN, set())
+            ))
+            state.set(GROUP_RAW, 'ResponseTime', ResponseTime)
+            _LOGGER.debug("OA Variables Good Response: %s %s", deviceSN, test.get('datas'))
+            failed.discard(deviceSN)
+
+        if failed:
+            _LOGGER.debug("OA Variables missing from response for SN: %s", failed)
+        return failed
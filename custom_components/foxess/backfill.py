@@ -0,0 +1,221 @@
+"""Backfill of the energy sensors' long-term statistics from the FoxESS hourly reports."""
+from __future__ import annotations
+
+import asyncio
+from datetime import date, datetime, timedelta
+import logging
+
+from homeassistant.const import UnitOfEnergy
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .decode import decode_response
+from .scheduler import ENDPOINT_REPORT
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+STORAGE_KEY = "foxess.backfill"
+SAVE_DELAY = 5 # seconds, progress is saved after every day fetched
+
+MAX_BACKFILL_DAYS = 366
+SPARE_CALLS_NEEDED = 20 # calls the poll plan must leave over today before a backfill day is fetched
+DAY_PAUSE = 10 # seconds between days, live polling gets the rate limiter in between
+BUDGET_WAIT = 30 * 60 # seconds before looking again when today's budget has no room
+FAILURE_WAIT = 5 * 60 # seconds before retrying a day that failed
+MAX_FAILURES = 5 # failures in a row before the job is left for the next restart or service call
+LOOKBACK_DAYS = 7 # how far before the range the last existing statistics row is looked for
+
+# report variable -> key of the energy sensor whose statistics its hours fill
+BACKFILL_SENSORS = {
+    "gridConsumption": "grid-consumption",
+    "feedin": "feedIn",
+    "chargeEnergyToTal": "bat-charge",
+    "dischargeEnergyToTal": "bat-discharge",
+    "loads": "load",
+    "generation": "energy-generated",
+}
+SOLAR_KEY = "solar" # worked out from the others the same way the Solar sensor is
+
+
+def decode_hours(data: str | None) -> dict[str, list[float]] | None:
+    """{variable: 24 hourly kWh} from an hourly report response, None if it failed. Runs in the executor."""
+    result, response = decode_response(data)
+    if result is None:
+        if response is not None:
+            _LOGGER.debug("OA Hourly Report Bad Response: %s", response)
+        return None
+    hours = {}
+    for item in result:
+        if item.get("variable") in BACKFILL_SENSORS:
+            hours[item["variable"]] = [max(0.0, float(value or 0)) for value in item.get("values", ())]
+    hours[SOLAR_KEY] = [
+        max(0.0, loads + charge + feedin - grid - discharge)
+        for loads, charge, feedin, grid, discharge in zip(
+            *(hours.get(variable, ()) for variable in ("loads", "chargeEnergyToTal", "feedin", "gridConsumption", "dischargeEnergyToTal"))
+        )
+    ]
+    return hours
+
+
+def _timestamp(value) -> float:
+    # the recorder has returned row starts as datetimes and, more recently, as timestamps
+    return value.timestamp() if isinstance(value, datetime) else float(value)
+
+
+class FoxESSBackfill:
+    """
+    Fills the long-term statistics of the energy sensors for a range of past days, one hourly report
+    query per day. A day is only fetched when the poll plan leaves calls over today, so live polling
+    never runs short, and progress is kept in a HA Store so an interrupted job carries on where it
+    stopped after a restart. Once every day is in, the hours are imported in one go and the sums
+    recorded after the range are shifted by the energy that was added.
+    """
+
+    def __init__(self, hass) -> None:
+        self._hass = hass
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._data: dict[str, dict] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self._inverters: dict[str, tuple] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    async def async_load(self) -> None:
+        async with self._lock:
+            if not self._loaded:
+                self._data = await self._store.async_load() or {}
+                self._loaded = True
+
+    def _save(self) -> None:
+        self._store.async_delay_save(lambda: self._data, SAVE_DELAY)
+
+    @property
+    def inverters(self) -> list[str]:
+        return list(self._inverters)
+
+    def add_inverter(self, deviceSN: str, deviceID: str, account) -> None:
+        """Make an inverter available to the service, and carry on with its job if one was interrupted."""
+        self._inverters[deviceSN] = (deviceID, account)
+        if deviceSN in self._data:
+            _LOGGER.info(f"Resuming statistics backfill for SN:{deviceSN} from {self._data[deviceSN]['next']}")
+            self._launch(deviceSN)
+
+    def start(self, deviceSN: str, start: date, end: date) -> None:
+        """Start (or restart) backfilling start to end inclusive, end is capped at yesterday."""
+        end = min(end, dt_util.now().date() - timedelta(days=1))
+        if start > end:
+            raise ValueError(f"nothing to backfill between {start} and {end}, the range must end before today")
+        if (end - start).days >= MAX_BACKFILL_DAYS:
+            raise ValueError(f"at most {MAX_BACKFILL_DAYS} days can be backfilled at once")
+        task = self._tasks.pop(deviceSN, None)
+        if task is not None:
+            task.cancel()
+        self._data[deviceSN] = {"start": start.isoformat(), "end": end.isoformat(), "next": start.isoformat(), "days": {}}
+        self._save()
+        _LOGGER.info(f"Statistics backfill for SN:{deviceSN} from {start} to {end}")
+        self._launch(deviceSN)
+
+    def _launch(self, deviceSN: str) -> None:
+        self._tasks[deviceSN] = self._hass.async_create_background_task(
+            self._async_run(deviceSN), f"foxess {deviceSN} statistics backfill"
+        )
+
+    async def _async_run(self, deviceSN: str) -> None:
+        deviceID, account = self._inverters[deviceSN]
+        job = self._data[deviceSN]
+        end = date.fromisoformat(job["end"])
+        failures = 0
+        while (day := date.fromisoformat(job["next"])) <= end:
+            spare = account.scheduler.spare_calls(datetime.now())
+            if spare < SPARE_CALLS_NEEDED:
+                _LOGGER.debug("Backfill for SN:%s waiting, %s spare calls today", deviceSN, spare)
+                await asyncio.sleep(BUDGET_WAIT)
+                continue
+            if not account.client.breakers.allow(ENDPOINT_REPORT, datetime.now()):
+                await asyncio.sleep(FAILURE_WAIT)
+                continue
+            account.count()
+            data = await account.client.getReportHours(deviceSN, day)
+            hours = await self._hass.async_add_executor_job(decode_hours, data)
+            if hours is None:
+                failures += 1
+                if failures >= MAX_FAILURES:
+                    _LOGGER.warning(f"Statistics backfill for SN:{deviceSN} stopped at {day}, it carries on after the next restart")
+                    return
+                await asyncio.sleep(FAILURE_WAIT)
+                continue
+            failures = 0
+            job["days"][day.isoformat()] = hours
+            job["next"] = (day + timedelta(days=1)).isoformat()
+            self._save()
+            await asyncio.sleep(DAY_PAUSE)
+        await self._async_import(deviceSN, deviceID, job)
+        del self._data[deviceSN]
+        self._save()
+        self._tasks.pop(deviceSN, None)
+
+    async def _async_import(self, deviceSN: str, deviceID: str, job: dict) -> None:
+        """Write the fetched hours into the statistics of every energy sensor the registry knows about."""
+        # only loaded when a backfill runs, so platform setup doesn't pull in the recorder
+        from homeassistant.components.recorder import get_instance
+        from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+        from homeassistant.components.recorder.statistics import async_import_statistics, statistics_during_period
+
+        registry = er.async_get(self._hass)
+        keys = dict(BACKFILL_SENSORS)
+        keys[SOLAR_KEY] = SOLAR_KEY
+        entities = {}
+        for variable, key in keys.items():
+            entity_id = registry.async_get_entity_id("sensor", "foxess", f"{deviceID}{key}")
+            if entity_id is not None:
+                entities[variable] = entity_id
+        if not entities:
+            _LOGGER.warning(f"Statistics backfill for SN:{deviceSN} has no energy sensors to fill")
+            return
+
+        # (hour start in UTC, {variable: kWh}) in order, from local midnight of each day
+        hours = []
+        for day, values in sorted(job["days"].items()):
+            midnight = dt_util.start_of_local_day(date.fromisoformat(day))
+            for hour in range(max((len(series) for series in values.values()), default=0)):
+                start = dt_util.as_utc(midnight + timedelta(hours=hour))
+                hours.append((start, {variable: series[hour] for variable, series in values.items() if hour < len(series)}))
+        if not hours:
+            return
+        first, last = hours[0][0], hours[-1][0]
+        existing = await get_instance(self._hass).async_add_executor_job(
+            statistics_during_period, self._hass, first - timedelta(days=LOOKBACK_DAYS), last + timedelta(hours=1),
+            set(entities.values()), "hour", None, {"sum"},
+        )
+
+        for variable, entity_id in entities.items():
+            rows = existing.get(entity_id, [])
+            # the sum carried into the range, and what the recorder had at its end before the backfill
+            base = next((row["sum"] for row in reversed(rows) if _timestamp(row["start"]) < first.timestamp() and row.get("sum") is not None), 0.0)
+            oldEnd = next((row["sum"] for row in reversed(rows) if row.get("sum") is not None), base)
+            total = base
+            today = None
+            statistics = []
+            for start, values in hours:
+                day = dt_util.as_local(start).date()
+                if day != today:
+                    today, daily = day, 0.0 # the sensors are daily totals, their state starts again at midnight
+                energy = values.get(variable, 0.0)
+                daily += energy
+                total += energy
+                statistics.append(StatisticData(start=start, state=round(daily, 3), sum=round(total, 3)))
+            metadata = StatisticMetaData(
+                has_mean=False, has_sum=True, name=None, source="recorder",
+                statistic_id=entity_id, unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            )
+            async_import_statistics(self._hass, metadata, statistics)
+            adjustment = round(total - oldEnd, 3)
+            if adjustment:
+                # rows after the range were summed without the backfilled energy
+                get_instance(self._hass).async_adjust_statistics(
+                    entity_id, last + timedelta(hours=1), adjustment, UnitOfEnergy.KILO_WATT_HOUR
+                )
+            _LOGGER.debug("Backfilled %s hours of %s, sum adjusted by %s kWh after %s", len(statistics), entity_id, adjustment, last)
+        _LOGGER.info(f"Statistics backfill for SN:{deviceSN} finished, {len(job['days'])} days imported")
@@ -0,0 +1,166 @@
+"""Circuit breakers for the OpenAPI endpoints of one api key, so a failing cloud isn't hammered."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import logging
+import random
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half-open"
+
+KIND_TRANSIENT = "transient" # timeouts, connection and server errors, anything not recognised
+KIND_QUOTA = "quota" # 40400, too many calls
+KIND_AUTH = "auth" # the api key was refused, nothing gets better until it is changed
+KIND_REQUEST = "request" # the request itself was refused, eg. a wrong serial number
+
+ERRNO_KINDS = {
+    40400: KIND_QUOTA,
+    41807: KIND_AUTH,
+    41808: KIND_AUTH,
+    41809: KIND_AUTH,
+    40256: KIND_REQUEST,
+    40257: KIND_REQUEST,
+    40261: KIND_REQUEST,
+    41930: KIND_REQUEST,
+}
+
+FAILURE_THRESHOLD = 2 # transient failures in a row before a breaker opens, one timeout is normal
+BACKOFF_BASE = 60 # seconds open after the first trip, doubled for each failure after
+BACKOFF_MAX = 60 * 60
+BACKOFF_JITTER = 0.25 # +/- fraction, so the endpoints and inverters don't all retry on the same tick
+TRIAL_TIMEOUT = 120 # seconds a half-open trial call may take before another is let through
+QUOTA_STRIKES = 2 # 40400s in a row, without a success between, that mean the daily allowance is gone
+QUOTA_RESET_JITTER = 10 * 60 # seconds after midnight the calls start again, spread out
+
+
+def classify(error) -> str:
+    """Kind of failure for an errno from a response, or 'timeout' / 'connection' / 'http NNN' from the transport."""
+    try:
+        return ERRNO_KINDS.get(int(error), KIND_TRANSIENT)
+    except (TypeError, ValueError):
+        return KIND_TRANSIENT
+
+
+class CircuitBreaker:
+    """
+    Closed lets every call through. Open lets nothing through until open_until, then half-open
+    lets a single trial call through, its success closes the breaker and its failure opens it again
+    for twice as long.
+    """
+
+    __slots__ = ("state", "failures", "open_until", "lastError", "_trial")
+
+    def __init__(self) -> None:
+        self.state = STATE_CLOSED
+        self.failures = 0 # in a row
+        self.open_until: datetime | None = None
+        self.lastError = None
+        self._trial: datetime | None = None
+
+    def allow(self, now: datetime) -> bool:
+        if self.state == STATE_CLOSED:
+            return True
+        if self.state == STATE_OPEN:
+            if now < self.open_until:
+                return False
+            self.state = STATE_HALF_OPEN
+        elif now - self._trial < timedelta(seconds=TRIAL_TIMEOUT):
+            return False # the trial is still out
+        self._trial = now
+        return True
+
+    def blocked(self, now: datetime) -> bool:
+        """True while calls wouldn't be let through, without taking a trial."""
+        return self.state == STATE_OPEN and now < self.open_until
+
+    def success(self) -> None:
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.open_until = None
+
+    def failure(self, kind: str, now: datetime, rng=random) -> None:
+        self.failures += 1
+        if kind == KIND_TRANSIENT and self.state == STATE_CLOSED and self.failures < FAILURE_THRESHOLD:
+            return
+        if kind == KIND_AUTH:
+            seconds = BACKOFF_MAX
+        else:
+            trips = self.failures - (FAILURE_THRESHOLD - 1 if kind == KIND_TRANSIENT else 0)
+            seconds = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** max(0, trips - 1))
+        seconds *= rng.uniform(1 - BACKOFF_JITTER, 1 + BACKOFF_JITTER)
+        self.state = STATE_OPEN
+        self.open_until = now + timedelta(seconds=seconds)
+
+
+class BreakerSet:
+    """
+    A breaker for each endpoint of one api key. Running out of the daily allowance stops every
+    endpoint until shortly after midnight, when the allowance is reset.
+    """
+
+    def __init__(self, rng=None) -> None:
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._rng = rng or random.Random()
+        self.quota_until: datetime | None = None
+        self._quotaStrikes = 0
+
+    def _breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker()
+        return breaker
+
+    def allow(self, endpoint: str, now: datetime) -> bool:
+        """True if a call to endpoint may be made now, a half-open breaker counts this as its trial."""
+        if self.quota_until is not None:
+            if now < self.quota_until:
+                return False
+            self.quota_until = None
+            self._quotaStrikes = 0
+            _LOGGER.info("FoxESS daily allowance reset, calls resume")
+        return self._breaker(endpoint).allow(now)
+
+    def blocked(self, endpoint: str, now: datetime) -> bool:
+        if self.quota_until is not None and now < self.quota_until:
+            return True
+        return self._breaker(endpoint).blocked(now)
+
+    def success(self, endpoint: str) -> None:
+        self._quotaStrikes = 0
+        breaker = self._breaker(endpoint)
+        if breaker.state != STATE_CLOSED:
+            _LOGGER.info(f"FoxESS {endpoint} calls succeeding again, breaker closed")
+        breaker.success()
+
+    def failure(self, endpoint: str, error, now: datetime) -> None:
+        kind = classify(error)
+        breaker = self._breaker(endpoint)
+        breaker.lastError = error
+        if kind == KIND_QUOTA:
+            self._quotaStrikes += 1
+            if self._quotaStrikes >= QUOTA_STRIKES and self.quota_until is None:
+                midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=now.tzinfo)
+                self.quota_until = midnight + timedelta(seconds=self._rng.uniform(60, QUOTA_RESET_JITTER))
+                _LOGGER.warning(f"FoxESS OpenAPI allowance used up (errno {error}), no calls until {self.quota_until:%Y-%m-%d %H:%M}")
+                return
+        wasOpen = breaker.state != STATE_CLOSED
+        breaker.failure(kind, now, self._rng)
+        if breaker.state == STATE_OPEN and not wasOpen:
+            _LOGGER.warning(f"FoxESS {endpoint} calls failing ({error}), backing off until {breaker.open_until:%H:%M:%S}")
+
+    def summary(self, now: datetime) -> dict:
+        return {
+            "quotaUntil": self.quota_until and self.quota_until.isoformat(),
+            "endpoints": {
+                endpoint: {
+                    "state": STATE_OPEN if breaker.blocked(now) else breaker.state,
+                    "failures": breaker.failures,
+                    "openUntil": breaker.open_until and breaker.open_until.isoformat(),
+                    "lastError": breaker.lastError,
+                }
+                for endpoint, breaker in sorted(self._breakers.items())
+            },
+        }
@@ -0,0 +1,75 @@
+"""Persistent cache of the slow changing OpenAPI endpoints, so restarts don't spend quota refetching them."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+import logging
+
+from homeassistant.helpers.storage import Store
+
+from .scheduler import (
+    ENDPOINT_BATTERY,
+    ENDPOINT_DETAIL,
+    ENDPOINT_GENERATION,
+    ENDPOINT_POLICIES,
+    ENDPOINT_REPORT,
+)
+from .snapshot import GROUP_ADDRESSBOOK, GROUP_BATTERY, GROUP_GENERATION, GROUP_REPORT
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+STORAGE_KEY = "foxess.cache"
+SAVE_DELAY = 30 # seconds, batches up the writes from a poll cycle
+
+# endpoint -> the snapshot group its response is parsed into
+CACHED_ENDPOINTS = {
+    ENDPOINT_DETAIL: GROUP_ADDRESSBOOK,
+    ENDPOINT_BATTERY: GROUP_BATTERY,
+    ENDPOINT_REPORT: GROUP_REPORT,
+    ENDPOINT_GENERATION: GROUP_GENERATION,
+}
+# these hold today's totals, an entry from yesterday is never fresh
+DAILY_ENDPOINTS = {ENDPOINT_REPORT, ENDPOINT_GENERATION}
+
+
+class FoxESSCache:
+    """
+    TTL cache of endpoint results keyed by serial number and endpoint, backed by a HA Store.
+    An entry is fresh while it is younger than the longest interval the scheduler would leave
+    between calls to that endpoint.
+    """
+
+    def __init__(self, hass) -> None:
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._data: dict[str, dict] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    async def async_load(self) -> None:
+        async with self._lock:
+            if not self._loaded:
+                self._data = await self._store.async_load() or {}
+                self._loaded = True
+                _LOGGER.debug(f"Cache loaded with {len(self._data)} entries")
+
+    @staticmethod
+    def _key(deviceSN: str, endpoint: str) -> str:
+        return f"{deviceSN}/{endpoint}"
+
+    def get(self, deviceSN: str, endpoint: str, now: datetime) -> tuple[datetime, dict] | None:
+        """Return (time it was fetched, data) if there is a fresh entry, otherwise None."""
+        entry = self._data.get(self._key(deviceSN, endpoint))
+        if entry is None:
+            return None
+        fetched = datetime.fromtimestamp(entry["time"])
+        age = (now - fetched).total_seconds() / 60
+        if age < 0 or age > ENDPOINT_POLICIES[endpoint].max_interval:
+            return None
+        if endpoint in DAILY_ENDPOINTS and fetched.date() != now.date():
+            return None
+        return fetched, entry["data"]
+
+    def put(self, deviceSN: str, endpoint: str, now: datetime, data: dict) -> None:
+        self._data[self._key(deviceSN, endpoint)] = {"time": now.timestamp(), "data": data}
+        self._store.async_delay_save(lambda: self._data, SAVE_DELAY)
@@ -0,0 +1,147 @@
+"""Capture of OpenAPI traffic to rotating compressed JSONL files, and a client that replays it."""
+from __future__ import annotations
+
+from collections import defaultdict, deque
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+
+from .api import FoxESSOpenAPIClient
+
+_LOGGER = logging.getLogger(__name__)
+
+CAPTURE_FILE = "foxess_capture.jsonl.gz"
+CAPTURE_MAX_BYTES = 5 * 1024 * 1024 # compressed size a capture file grows to before it is rotated
+CAPTURE_BACKUPS = 3 # rotated files kept, foxess_capture.jsonl.gz.1 is the newest
+REDACTED_HEADERS = ("token", "signature")
+
+
+def redact_headers(headers: dict) -> dict:
+    return {key: "REDACTED" if key in REDACTED_HEADERS else value for key, value in headers.items()}
+
+
+class CaptureWriter:
+    """
+    Appends one JSON line per OpenAPI call, request and complete response with timings, to a gzip file.
+    Lines are queued on the event loop and written by a thread from the executor, each flush adds a
+    gzip member so the file stays readable as one stream however it was cut. Whatever is still queued
+    is written by async_flush, on unload and when HA stops.
+    """
+
+    def __init__(self, hass, path: str, max_bytes: int = CAPTURE_MAX_BYTES, backups: int = CAPTURE_BACKUPS) -> None:
+        self._hass = hass
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.records = 0
+        self._pending: list[str] = []
+        self._flushing = False
+        self._lock = threading.Lock() # guards _pending and _flushing
+        self._writeLock = threading.Lock() # one flush writes at a time, in the order lines were queued
+
+    def record_call(self, method, path, params, body, headers, status, text, started: float, error: str | None = None) -> None:
+        """Queue one call, started is the time.monotonic() it was sent at."""
+        self.record({
+            "time": round(time.time(), 3),
+            "method": method,
+            "path": path,
+            "params": params,
+            "body": body,
+            "headers": redact_headers(headers),
+            "status": status,
+            "elapsed_ms": round((time.monotonic() - started) * 1000),
+            "error": error,
+            "response": text,
+        })
+
+    def record(self, entry: dict) -> None:
+        line = json.dumps(entry, separators=(",", ":"))
+        self.records += 1
+        with self._lock:
+            self._pending.append(line)
+            if self._flushing:
+                return # the running flush picks it up before it stops
+            self._flushing = True
+        self._hass.async_add_executor_job(self._flush)
+
+    async def async_flush(self) -> None:
+        """Write whatever is queued, for unload and HA stop."""
+        await self._hass.async_add_executor_job(self._flush)
+
+    def _flush(self) -> None:
+        with self._writeLock:
+            while True:
+                with self._lock:
+                    # swapped rather than copied so lines queued meanwhile go in the next round, the flag
+                    # is only cleared with nothing left so no line is queued without a flush to write it
+                    lines, self._pending = self._pending, []
+                    if not lines:
+                        self._flushing = False
+                        return
+                try:
+                    self._rotate()
+                    with gzip.open(self.path, "at", encoding="utf-8") as capture:
+                        capture.write("\n".join(lines) + "\n")
+                except OSError as err:
+                    _LOGGER.warning(f"Unable to write OpenAPI capture {self.path}: {err}")
+
+    def _rotate(self) -> None:
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < self.max_bytes:
+            return
+        for number in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{number}"):
+                os.replace(f"{self.path}.{number}", f"{self.path}.{number + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+def read_captures(*paths: str) -> list[dict]:
+    """Every entry of the given capture files, oldest file first, in the order they were written."""
+    entries = []
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") or ".gz." in path else open
+        with opener(path, "rt", encoding="utf-8") as capture:
+            entries.extend(json.loads(line) for line in capture if line.strip())
+    return entries
+
+
+def _serials(params, body) -> str | None:
+    """The serial number(s) a request is for, what a replayed call is matched on."""
+    if params and "sn" in params:
+        return params["sn"]
+    if body:
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return None
+        if "sns" in request:
+            return ",".join(request["sns"])
+        return request.get("sn")
+    return None
+
+
+class FoxESSReplayClient(FoxESSOpenAPIClient):
+    """
+    Answers the client calls from captured responses instead of the cloud, at full speed with no
+    rate limiting. Each call takes the next unused capture for the same path and serial number(s),
+    a call with nothing left to replay fails like a timeout.
+    """
+
+    def __init__(self, entries: list[dict]) -> None:
+        super().__init__(None, "replay", None)
+        self._queues: dict[tuple, deque] = defaultdict(deque)
+        for entry in entries:
+            self._queues[(entry["path"], _serials(entry.get("params"), entry.get("body")))].append(entry)
+        self.replayed = 0
+        self.missing = 0
+
+    async def _request(self, method, path, params=None, body=None):
+        queue = self._queues.get((path, _serials(params, body)))
+        if not queue:
+            self.missing += 1
+            return None, 0
+        entry = queue.popleft()
+        self.replayed += 1
+        return entry.get("response"), entry.get("elapsed_ms", 0)
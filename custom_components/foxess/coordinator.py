@@ -0,0 +1,47 @@
+"""Coordinator that only wakes the entities whose data changed."""
+from __future__ import annotations
+
+import logging
+
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+from .snapshot import Snapshot
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class FoxESSCoordinator(DataUpdateCoordinator[Snapshot]):
+    """
+    DataUpdateCoordinator for one inverter's Snapshot.
+    A listener's context is the set of snapshot slots it shows, after an update only the listeners
+    with a changed slot are called. Listeners without a context (eg. the entity manager) always are.
+    A tick that fetched nothing hands back the same Snapshot object and, with always_update off,
+    doesn't call anyone.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        kwargs.setdefault("always_update", False)
+        super().__init__(*args, **kwargs)
+        self._notified: Snapshot | None = None
+        self._notifiedSuccess = True
+
+    @callback
+    def async_update_listeners(self) -> None:
+        data = self.data
+        if self.last_update_success != self._notifiedSuccess or data is None:
+            # availability changed, every entity has to write
+            changed = None
+        else:
+            changed = data.changed(self._notified)
+        self._notified = data
+        self._notifiedSuccess = self.last_update_success
+
+        notified = 0
+        for update_callback, context in list(self._listeners.values()):
+            if changed is None or context is None or not changed.isdisjoint(context):
+                update_callback()
+                notified += 1
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("%s: %s of %s listeners updated, %s slots changed",
+                          self.name, notified, len(self._listeners), "all" if changed is None else len(changed))
@@ -0,0 +1,66 @@
+"""Single pass decoding of FoxESS OpenAPI responses."""
+from __future__ import annotations
+
+import json
+import logging
+
+try:
+    import orjson
+except ImportError: # pragma: no cover - HA ships orjson, plain json is only the fallback
+    orjson = None
+
+_LOGGER = logging.getLogger(__name__)
+
+# real time variable name -> name it is stored under, built once rather than tested variable by variable
+VARIABLE_ALIASES = {
+    "batTemperature_1": "batTemperature", # use same entity as for single battery systems
+    "invBatPower_1": "invBatPower", # use same entity as for single battery systems
+}
+
+
+def loads(data: str | bytes):
+    """Parse a JSON payload, with orjson when it is available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def decode_response(data: str | bytes | None):
+    """
+    Parse an OpenAPI response exactly once.
+        :return: (result, response) - result is None unless errno is 0 and msg is success,
+                 response is the whole parsed body for error reporting (None if it wasn't JSON)
+    """
+    if not data:
+        return None, None
+    try:
+        response = loads(data)
+    except ValueError:
+        _LOGGER.debug("OA response is not JSON: %.200s", data)
+        return None, None
+    if not isinstance(response, dict):
+        return None, response
+    if response.get("errno") == 0 and response.get("msg") == "success":
+        return response.get("result"), response
+    return None, response
+
+
+def decode_variables(datas, aliases=VARIABLE_ALIASES, nulls: set | None = None) -> dict:
+    """
+    Turn a real time 'datas' list into {variable: value}, missing values read as 0.
+    The names that had no value are added to nulls, when it is given.
+    """
+    values = {}
+    for item in datas:
+        name = item["variable"]
+        value = item.get("value")
+        if value is None:
+            value = 0
+            if nulls is not None:
+                nulls.add(name)
+        values[aliases.get(name, name)] = value
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        missing = [item["variable"] for item in datas if item.get("value") is None]
+        if missing:
+            _LOGGER.debug("Variables with no value, set to zero: %s", missing)
+    return values
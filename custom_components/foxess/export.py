@@ -0,0 +1,130 @@
+"""Local export of each inverter's snapshot to MQTT and an OpenMetrics endpoint, no extra cloud calls."""
+from __future__ import annotations
+
+from datetime import datetime
+import json
+import logging
+import re
+
+from aiohttp import web
+
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.exceptions import HomeAssistantError
+
+from .snapshot import GROUP_ADDRESSBOOK, Snapshot
+
+_LOGGER = logging.getLogger(__name__)
+
+METRICS_URL = "/api/foxess/metrics"
+METRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+METRIC_PREFIX = "foxess"
+MQTT_QOS = 0
+
+_METRIC_NAME = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def snapshot_payload(deviceSN: str, snapshot: Snapshot, now: datetime) -> str:
+    """The whole snapshot as one JSON document, what a single MQTT message carries."""
+    return json.dumps({
+        "deviceSN": deviceSN,
+        "time": now.isoformat(),
+        "online": snapshot.online,
+        "stale": snapshot.stale,
+        GROUP_ADDRESSBOOK: snapshot.addressbook,
+        **snapshot.as_dict(),
+    }, default=str)
+
+
+def render_metrics(snapshots: dict[str, Snapshot]) -> str:
+    """
+    Every numeric value of every inverter as an OpenMetrics gauge, foxess_<group>_<variable> with
+    the serial number as a label. The samples of a metric are kept together, as the format requires.
+    """
+    samples: dict[str, list[str]] = {}
+    for deviceSN, snapshot in sorted(snapshots.items()):
+        label = f'{{device_sn="{deviceSN}"}}'
+        samples.setdefault(f"{METRIC_PREFIX}_online", []).append(f"{label} {int(snapshot.online)}")
+        samples.setdefault(f"{METRIC_PREFIX}_stale", []).append(f"{label} {int(snapshot.stale)}")
+        for group, section in snapshot.as_dict().items():
+            for name, value in section.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue # text, times and the like have no place in a gauge
+                metric = _METRIC_NAME.sub("_", f"{METRIC_PREFIX}_{group}_{name}")
+                samples.setdefault(metric, []).append(f"{label} {value}")
+    lines = []
+    for metric, values in samples.items():
+        lines.append(f"# TYPE {metric} gauge")
+        lines.extend(metric + value for value in values)
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class FoxESSExporter:
+    """
+    Hands every inverter's snapshot on after a real time or report fetch brought new data: one
+    retained JSON message per inverter on its MQTT topic, and the latest of all of them on the
+    metrics endpoint. Readers outside HA get the data without spending any of the cloud quota.
+    """
+
+    def __init__(self, hass) -> None:
+        self._hass = hass
+        self._topics: dict[str, str | None] = {} # deviceSN -> MQTT topic prefix, None for no MQTT
+        self._metrics: set[str] = set() # the inverters on the metrics endpoint
+        self._snapshots: dict[str, Snapshot] = {}
+        self._rendered: str | None = None
+        self._viewRegistered = False
+        self._mqttFailed = False
+        self.published = 0
+
+    def add_inverter(self, deviceSN: str, topic: str | None = None, metrics: bool = False) -> None:
+        self._topics[deviceSN] = topic
+        if metrics:
+            self._metrics.add(deviceSN)
+            if not self._viewRegistered:
+                self._viewRegistered = True
+                self._hass.http.register_view(FoxESSMetricsView(self))
+
+    def publish(self, deviceSN: str, snapshot: Snapshot, now: datetime) -> None:
+        """Called from the poll cycle, nothing here waits on the broker."""
+        if deviceSN in self._metrics:
+            self._snapshots[deviceSN] = snapshot
+            self._rendered = None
+        topic = self._topics.get(deviceSN)
+        if topic:
+            self._hass.async_create_task(
+                self._async_publish(f"{topic}/{deviceSN}/state", snapshot_payload(deviceSN, snapshot, now))
+            )
+
+    async def _async_publish(self, topic: str, payload: str) -> None:
+        # only needed when MQTT export is used, so the integration doesn't depend on it
+        from homeassistant.components import mqtt
+
+        try:
+            await mqtt.async_publish(self._hass, topic, payload, qos=MQTT_QOS, retain=True)
+        except HomeAssistantError as err:
+            if not self._mqttFailed:
+                # the broker may come back, but saying so every minute helps nobody
+                self._mqttFailed = True
+                _LOGGER.warning(f"Unable to publish FoxESS snapshot to MQTT topic {topic}: {err}")
+            return
+        self._mqttFailed = False
+        self.published += 1
+
+    def metrics(self) -> str:
+        # rendered at most once per poll cycle however often it is scraped
+        if self._rendered is None:
+            self._rendered = render_metrics(self._snapshots)
+        return self._rendered
+
+
+class FoxESSMetricsView(HomeAssistantView):
+    """The latest snapshot of every exported inverter, for Prometheus and the like."""
+
+    url = METRICS_URL
+    name = "api:foxess:metrics"
+
+    def __init__(self, exporter: FoxESSExporter) -> None:
+        self._exporter = exporter
+
+    async def get(self, request: web.Request) -> web.Response:
+        return web.Response(body=self._exporter.metrics().encode(), headers={"Content-Type": METRICS_CONTENT_TYPE})
@@ -0,0 +1,141 @@
+"""In memory history of real time samples with rolling statistics, no API calls and no recorder queries."""
+from __future__ import annotations
+
+from array import array
+from collections import deque
+from datetime import datetime
+import logging
+
+from .snapshot import GROUP_RAW, GROUP_STATS
+
+_LOGGER = logging.getLogger(__name__)
+
+HISTORY_SECONDS = 24 * 3600
+MIN_SAMPLE_SECONDS = 60 # closer samples (local polling) are skipped, the cloud is polled every 5 minutes at most
+HISTORY_SAMPLES = HISTORY_SECONDS // MIN_SAMPLE_SECONDS
+
+# statistic name -> (real time variable, aggregate, window in seconds or None for since midnight)
+STATISTICS = {
+    "pvPowerMaxToday": ("pvPower", "max", None),
+    "loadsPowerMean1h": ("loadsPower", "mean", 3600),
+    "SoCMin24h": ("SoC", "min", HISTORY_SECONDS),
+}
+
+
+class SampleBuffer:
+    """
+    Fixed size ring buffer of (timestamp, value) samples in two float arrays.
+    Samples are addressed by a sequence number that keeps counting up, the buffer holds the
+    last capacity of them.
+    """
+
+    __slots__ = ("capacity", "count", "_times", "_values")
+
+    def __init__(self, capacity: int = HISTORY_SAMPLES) -> None:
+        self.capacity = capacity
+        self.count = 0 # samples ever appended, the next sequence number
+        self._times = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+
+    @property
+    def first(self) -> int:
+        """Sequence number of the oldest sample still held."""
+        return max(0, self.count - self.capacity)
+
+    def append(self, timestamp: float, value: float) -> None:
+        index = self.count % self.capacity
+        self._times[index] = timestamp
+        self._values[index] = value
+        self.count += 1
+
+    def time(self, seq: int) -> float:
+        return self._times[seq % self.capacity]
+
+    def value(self, seq: int) -> float:
+        return self._values[seq % self.capacity]
+
+
+class RollingWindow:
+    """
+    Sum, min and max of the samples in a SampleBuffer newer than a cutoff.
+    Each sample is added and evicted once, min and max use monotonic queues of sequence numbers,
+    so an update costs amortised O(1) per sample.
+    """
+
+    __slots__ = ("_buffer", "_next", "_oldest", "_sum", "_mins", "_maxs")
+
+    def __init__(self, buffer: SampleBuffer) -> None:
+        self._buffer = buffer
+        self._next = buffer.count # next sequence number to take in
+        self._oldest = buffer.count # oldest sequence number inside the window
+        self._sum = 0.0
+        self._mins: deque[int] = deque()
+        self._maxs: deque[int] = deque()
+
+    def update(self, cutoff: float) -> None:
+        buffer = self._buffer
+        for seq in range(max(self._next, buffer.first), buffer.count):
+            value = buffer.value(seq)
+            self._sum += value
+            while self._mins and buffer.value(self._mins[-1]) >= value:
+                self._mins.pop()
+            self._mins.append(seq)
+            while self._maxs and buffer.value(self._maxs[-1]) <= value:
+                self._maxs.pop()
+            self._maxs.append(seq)
+        self._next = buffer.count
+        if self._oldest < buffer.first:
+            # samples were overwritten while still inside the window, start again from what the buffer holds
+            self._oldest = buffer.first
+            self._sum = sum(buffer.value(seq) for seq in range(buffer.first, buffer.count))
+        while self._oldest < buffer.count and buffer.time(self._oldest) < cutoff:
+            self._sum -= buffer.value(self._oldest)
+            self._oldest += 1
+        while self._mins and self._mins[0] < self._oldest:
+            self._mins.popleft()
+        while self._maxs and self._maxs[0] < self._oldest:
+            self._maxs.popleft()
+
+    @property
+    def samples(self) -> int:
+        return self._buffer.count - self._oldest
+
+    def aggregate(self, kind: str) -> float | None:
+        if not self.samples:
+            return None
+        if kind == "mean":
+            return self._sum / self.samples
+        if kind == "min":
+            return self._buffer.value(self._mins[0])
+        return self._buffer.value(self._maxs[0])
+
+
+class InverterHistory:
+    """The sample buffers and rolling statistics of one inverter."""
+
+    def __init__(self, statistics: dict = STATISTICS, capacity: int = HISTORY_SAMPLES) -> None:
+        self._statistics = statistics
+        self._last: float | None = None
+        self._buffers = {
+            variable: SampleBuffer(capacity) for variable, kind, window in statistics.values()
+        }
+        self._windows = {
+            name: RollingWindow(self._buffers[variable]) for name, (variable, kind, window) in statistics.items()
+        }
+
+    def add_samples(self, state, now: datetime) -> None:
+        """Take the latest real time values from the inverter's state and write the statistics back into it."""
+        timestamp = now.timestamp()
+        if self._last is not None and timestamp - self._last < MIN_SAMPLE_SECONDS:
+            return
+        self._last = timestamp
+        for variable, buffer in self._buffers.items():
+            value = state.get(GROUP_RAW, variable)
+            if isinstance(value, (int, float)):
+                buffer.append(timestamp, float(value))
+        midnight = datetime.combine(now.date(), datetime.min.time(), tzinfo=now.tzinfo).timestamp()
+        for name, (variable, kind, window) in self._statistics.items():
+            rolling = self._windows[name]
+            rolling.update(midnight if window is None else timestamp - window)
+            value = rolling.aggregate(kind)
+            state.set(GROUP_STATS, name, None if value is None else round(value, 3))
@@ -0,0 +1,411 @@
+"""The account hub shared by every inverter on one api key, and the update cycle of each inverter."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+import logging
+
+from homeassistant.helpers import sun
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+
+from .api import FoxESSOpenAPIClient, GetAuth, RAW_BATCH_MAX_DEVICES
+from .cache import CACHED_ENDPOINTS
+from .coordinator import FoxESSCoordinator
+from .history import InverterHistory
+from .integration import EnergyIntegrator
+from .ratelimit import TokenBucket
+from .snapshot import (
+    GROUP_BATTERY,
+    GROUP_GENERATION,
+    GROUP_RAW,
+    GROUP_REPORT,
+    GROUP_SCHEDULER,
+    InverterState,
+)
+from .scheduler import (
+    DAILY_CALL_LIMIT,
+    ENDPOINT_BATTERY,
+    ENDPOINT_DETAIL,
+    ENDPOINT_GENERATION,
+    ENDPOINT_RAW,
+    ENDPOINT_REPORT,
+    PollScheduler,
+)
+from .variables import VariablePlanner
+
+_LOGGER = logging.getLogger(__name__)
+
+REPORT_YEAR = "reportYear" # the year report query, made alongside the month one when the store needs it
+OFFLINE_RETRY_MINUTES = 5 # how often device detail is retried while an inverter is off-line or failing
+DEFAULT_VERIFY_SSL = False # True
+DEFAULT_API_RATE = 1.0 # OpenAPI calls per second allowed for each api key
+
+SCAN_MINUTES = 1 # number of minutes betwen API requests
+SCAN_INTERVAL = timedelta(minutes=SCAN_MINUTES)
+MODBUS_SCAN_INTERVAL = timedelta(seconds=5) # local polling has no quota
+
+
+class FoxESSAccount:
+    """
+    Hub for every inverter configured against the same apiKey. It owns the client (and with it the
+    session, limiter, metrics and breakers), the call scheduler and one coordinator per inverter,
+    nothing about an inverter is kept anywhere else.
+    """
+
+    def __init__(self, hass, apiKey, apiRate=DEFAULT_API_RATE):
+        self.hass = hass
+        self.limiter = TokenBucket(rate=apiRate)
+        # one long lived session per account so calls reuse kept-alive connections
+        self.client = FoxESSOpenAPIClient(
+            async_create_clientsession(hass, verify_ssl=DEFAULT_VERIFY_SSL), apiKey, self.limiter
+        )
+        self.scheduler = PollScheduler(daily_budget=DAILY_CALL_LIMIT)
+        self.scheduler.add_job(None, ENDPOINT_RAW)
+        self.key = GetAuth.md5c(apiKey)[:12] # identifies the account in entity ids and diagnostics without giving the key away
+        self.entitiesAdded = False
+        self.inverters: dict[str, FoxESSInverterPoller] = {}
+        self.devices = {} # real time data from the cloud, SN -> state
+        self._lock = asyncio.Lock()
+        self._failed = set()
+        self._pending = set()
+        self._listeners = [] # the account's own entities, told when calls are counted
+        self._notifyPending = False
+
+    def add_inverter(self, name, deviceSN, cache, reports, modbus=None, restricted=False):
+        """
+        Set up deviceSN on the account from what the cache and report store kept over the restart,
+        returns its poller, whose coordinator is created but not yet refreshed.
+        """
+        inverter = FoxESSInverterPoller(self, name, deviceSN, cache, reports, modbus, restricted)
+        self.inverters[deviceSN] = inverter
+        if modbus is None:
+            self.devices[deviceSN] = inverter.state
+        self.scheduler.set_enabled(None, ENDPOINT_RAW, bool(self.devices))
+        # the daily allowance is per inverter, so each one added grows the account's budget
+        self.scheduler.daily_budget = DAILY_CALL_LIMIT * len(self.inverters)
+        for endpoint in (ENDPOINT_DETAIL, ENDPOINT_REPORT, ENDPOINT_GENERATION):
+            self.scheduler.add_job(deviceSN, endpoint)
+        self.scheduler.add_job(deviceSN, ENDPOINT_BATTERY, enabled=False) # enabled once device detail reports a battery
+        inverter.restore(datetime.now())
+        self.scheduler.delay(None, ENDPOINT_RAW, datetime.now(), 0) # make sure the next batch includes the new inverter
+        return inverter
+
+    def async_add_listener(self, update_callback):
+        """Call update_callback after calls on the account are counted, returns the function that stops it."""
+        self._listeners.append(update_callback)
+        return lambda: self._listeners.remove(update_callback)
+
+    def record(self, key, endpoint, now, ok=True, calls=1):
+        """Count a planned call on the scheduler, see PollScheduler.record."""
+        self.scheduler.record(key, endpoint, now, ok=ok, calls=calls)
+        self._calls_counted()
+
+    def count(self, calls=1):
+        """Count calls made outside the plan, eg. the year report or a backfill."""
+        self.scheduler.count(calls)
+        self._calls_counted()
+
+    def _calls_counted(self):
+        # the results of a cycle are counted one after another, the entities are written once for all of them
+        if self._listeners and not self._notifyPending:
+            self._notifyPending = True
+            self.hass.loop.call_soon(self._notify_listeners)
+
+    def _notify_listeners(self):
+        self._notifyPending = False
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    def diagnostics(self):
+        """Calls, errors and latencies by endpoint, and the quota used, for the diagnostics service."""
+        return {
+            "account": self.key,
+            "inverters": sorted(self.inverters),
+            "callsToday": self.scheduler.calls_today,
+            "dailyLimit": self.scheduler.daily_budget,
+            "projectedCalls": self.scheduler.projected_calls_per_day(),
+            "limiterCalls": self.limiter.calls,
+            "limiterWait": round(self.limiter.wait_time, 1),
+            "endpoints": self.client.metrics.summary(),
+            "breakers": self.client.breakers.summary(datetime.now()),
+            "variables": {deviceSN: self.inverters[deviceSN].variables.summary() for deviceSN in sorted(self.devices)},
+        }
+
+    def _batches(self, now):
+        """
+        The cloud inverters grouped by whether they are restricted, each group is one batched query
+        for every variable any of them wants, None when one of them is due a discovery query.
+        """
+        batches = {}
+        for deviceSN, state in self.devices.items():
+            planner = self.inverters[deviceSN].variables
+            devices, variables = batches.get(planner.everything, ({}, set()))
+            devices[deviceSN] = state
+            request = planner.request(now)
+            batches[planner.everything] = devices, None if variables is None or request is None else variables | request
+        return batches
+
+    async def async_get_raw(self, deviceSN, now):
+        """
+        Return True if the real time fetch failed for deviceSN, False if it has new data, same as getRaw,
+        or None if there is nothing new since this inverter last asked.
+        When the scheduler says the real time query is due the first inverter to ask fetches every
+        inverter on the account in one batch, the others then pick up their result on their next tick.
+        """
+        async with self._lock:
+            if self.scheduler.due(None, ENDPOINT_RAW, now) and self.client.breakers.allow(ENDPOINT_RAW, now):
+                _LOGGER.debug(f"Batched real time fetch for {len(self.devices)} inverter(s)")
+                self._failed = set()
+                calls = 0
+                for everything, (devices, variables) in self._batches(now).items():
+                    nulls = {}
+                    asked = everything if variables is None else sorted(variables)
+                    self._failed |= await self.client.getRaw(devices, asked and list(asked), nulls)
+                    calls += -(-len(devices) // RAW_BATCH_MAX_DEVICES)
+                    for sn, state in devices.items():
+                        if sn not in self._failed:
+                            self.inverters[sn].variables.observe(variables, nulls.get(sn, ()), state, now)
+                self.record(None, ENDPOINT_RAW, now, ok=len(self._failed) < len(self.devices), calls=calls)
+                self._pending = set(self.devices)
+                power = sum(
+                    float(state.get(GROUP_RAW, 'pvPower', 0)) + float(state.get(GROUP_RAW, 'loadsPower', 0))
+                    for sn, state in self.devices.items() if sn not in self._failed
+                )
+                self.scheduler.observe_power(power)
+            if deviceSN not in self._pending:
+                return None
+            self._pending.discard(deviceSN)
+            return deviceSN in self._failed
+
+
+class FoxESSInverterPoller:
+    """
+    One inverter on an account, its state, rolling statistics and live energy, and the update cycle
+    its coordinator runs. Real time data comes from the account's batch, or over modbus when a
+    local transport is configured, the slower endpoints come from the cloud on their schedule.
+    """
+
+    def __init__(self, account, name, deviceSN, cache, reports, modbus=None, restricted=False):
+        self.account = account
+        self.name = name
+        self.deviceSN = deviceSN
+        self.modbus = modbus
+        self.variables = VariablePlanner(restricted) # what the real time query asks the cloud for
+        self.cache = cache
+        self.reports = reports
+        self.state = InverterState()
+        self.state.addressbook = {
+            'hasBattery': False, # assume no battery is fitted for now
+            'status': '3', # assume inverter is off-line for now
+        }
+        self.history = InverterHistory() # rolling statistics of the real time samples, in memory only
+        self.integrator = EnergyIntegrator() # live daily energy between reports
+        self.exporter = None # hands the snapshot on to MQTT / the metrics endpoint when set
+        self._exportDue = False
+        self.coordinator = FoxESSCoordinator(
+            account.hass,
+            _LOGGER,
+            # Name of the data. For logging purposes.
+            name=f"{name} {deviceSN}",
+            update_method=self.async_update_data if modbus is None else self.async_update_local,
+            # Polling interval. Will only be polled if there are subscribers.
+            update_interval=SCAN_INTERVAL if modbus is None else MODBUS_SCAN_INTERVAL,
+        )
+
+    def restore(self, now):
+        """Serve still fresh slow changing data from before a restart, it is refreshed on its normal schedule."""
+        for endpoint, group in CACHED_ENDPOINTS.items():
+            cached = self.cache.get(self.deviceSN, endpoint, now)
+            if cached is not None:
+                fetched, data = cached
+                self.state.restore_section(group, data)
+                self.account.scheduler.restore(self.deviceSN, endpoint, fetched)
+                _LOGGER.debug(f"Restored {endpoint} for SN:{self.deviceSN} from cache, fetched {fetched}")
+        self.reports.apply(self.state, self.deviceSN, now)
+        self.integrator.re_anchor(self.state, now)
+        # the entities start from the cached / default state, the cloud is only contacted once they are registered
+        self.coordinator.data = self.state.freeze()
+
+    def restore_sync(self, lastSync):
+        """
+        Carry the real time schedule on from the last query before a restart, rather than asking again
+        straight away. The values from then are what the entities restored.
+        """
+        self.state.set(GROUP_SCHEDULER, "lastCloudSync", lastSync)
+        if self.modbus is None:
+            self.account.scheduler.restore(None, ENDPOINT_RAW, lastSync)
+        self.coordinator.data = self.state.freeze()
+
+    async def async_shutdown(self):
+        """
+        When the inverter entity is removed and when HA stops, close the modbus connection, many
+        inverter LAN ports take only one client and it shouldn't be left holding one, and write out
+        what is still queued for the account's capture.
+        """
+        if self.modbus is not None:
+            await self.modbus.client.close()
+        capture = self.account.client.capture
+        if capture is not None:
+            await capture.async_flush()
+
+    def _record_call(self, endpoint, now, getError):
+        self.account.record(self.deviceSN, endpoint, now, ok=not getError)
+        if not getError:
+            self.cache.put(self.deviceSN, endpoint, now, self.state.section(CACHED_ENDPOINTS[endpoint]))
+
+    async def async_update_data(self):
+        _LOGGER.debug("Updating data from https://www.foxesscloud.com/")
+        state, deviceSN = self.state, self.deviceSN
+        scheduler, breakers = self.account.scheduler, self.account.client.breakers
+        now = datetime.now()
+        scheduler.update_conditions(now, daylight=sun.is_up(self.account.hass))
+        # try the openapi see if we get a response
+        getError=False
+        detailDue = scheduler.due(deviceSN, ENDPOINT_DETAIL, now)
+        if detailDue and not state.online:
+            detailDue = False
+            if breakers.allow(ENDPOINT_DETAIL, now):
+                # status unknown or off-line, everything else depends on what device detail says so it goes first
+                getError = await self.account.client.getOADeviceDetail(state, deviceSN)
+                self._record_call(ENDPOINT_DETAIL, now, getError)
+        if getError==False:
+            if state.addressbook.get("status") is not None:
+                statetest = int(state.addressbook["status"])
+            else:
+                statetest = 0
+            _LOGGER.debug(f" Statetest {statetest}")
+            if statetest in [1,2]:
+                state.online = True
+                scheduler.set_enabled(deviceSN, ENDPOINT_BATTERY, bool(state.addressbook.get("hasBattery")))
+                # main real time data fetch is shared by every inverter on the account, it queues first
+                jobs = {ENDPOINT_RAW: self.account.async_get_raw(deviceSN, now)}
+                jobs.update(self._cloud_jobs(now, detailDue))
+                getError, reportArrived = await self._run_jobs(now, jobs)
+                if getError==False:
+                    self._raw_arrived(now)
+                elif getError==True:
+                    _LOGGER.debug("getRaw False")
+                    if statetest==2:
+                        # The inverter is in alarm, don't check every minute
+                        _LOGGER.debug(f" Inverter in alarm, slowing retry response for SN:{deviceSN}")
+                        state.online = False
+                    else:
+                        # The cloud failed rather than the inverter, keep showing the last values, the
+                        # breaker decides when the real time query is tried again
+                        _LOGGER.debug(f" Failed to get device variables, serving stale values for SN:{deviceSN}")
+                        state.stale = True
+                    scheduler.delay(deviceSN, ENDPOINT_DETAIL, now, OFFLINE_RETRY_MINUTES) # recheck device detail in 5 minutes
+                elif breakers.blocked(ENDPOINT_RAW, now):
+                    state.stale = True
+                # None is no new real time data for this inverter yet, nothing else stops the cycle
+                getError = False
+                if reportArrived:
+                    # the report is the authoritative total, the live counters start again from it
+                    self.integrator.re_anchor(state, now)
+            else:
+                if statetest==3:
+                    # The inverter is off-line, no raw data polling, don't update entities
+                    # retry device detail call every 5 minutes until it comes back on-line
+                    state.online = False
+                    scheduler.delay(deviceSN, ENDPOINT_DETAIL, now, OFFLINE_RETRY_MINUTES)
+                    _LOGGER.debug(f" Inverter off-line set online flag false for SN:{deviceSN}")
+
+            if state.online == False:
+                _LOGGER.warning(f"{self.name} has Cloud timeout or the Inverter is off-line, connection will be retried in {OFFLINE_RETRY_MINUTES} minutes")
+        else:
+            state.online = False
+            _LOGGER.warning(f"{self.name} has Cloud timeout fetching Device Detail, will retry in 1 minute.")
+
+        return self._finish_cycle()
+
+    async def async_update_local(self):
+        state, deviceSN, scheduler = self.state, self.deviceSN, self.account.scheduler
+        now = datetime.now()
+        scheduler.update_conditions(now, daylight=sun.is_up(self.account.hass))
+        # real time data comes from the inverter itself, whether it answers is what on-line means here.
+        # the slow changing endpoints still come from the cloud on their schedule alongside it
+        jobs = {ENDPOINT_RAW: self.modbus.async_read(state)}
+        scheduler.set_enabled(deviceSN, ENDPOINT_BATTERY, bool(state.addressbook.get("hasBattery")))
+        jobs.update(self._cloud_jobs(now, scheduler.due(deviceSN, ENDPOINT_DETAIL, now)))
+        getError, reportArrived = await self._run_jobs(now, jobs)
+        state.online = not getError
+        if getError==False:
+            self._raw_arrived(now)
+        if reportArrived:
+            self.integrator.re_anchor(state, now)
+        return self._finish_cycle()
+
+    def _cloud_jobs(self, now, detailDue):
+        """The cloud fetches other than real time that are due, they don't depend on each other."""
+        state, deviceSN, reports = self.state, self.deviceSN, self.reports
+        scheduler, client = self.account.scheduler, self.account.client
+        breakers = client.breakers
+        jobs = {}
+        # an endpoint whose breaker is open stays due, it is called once the breaker lets it through
+        detailDue = detailDue and breakers.allow(ENDPOINT_DETAIL, now)
+        if detailDue:
+            # an on-line inverter keeps its status until this refreshes it
+            jobs[ENDPOINT_DETAIL] = client.getOADeviceDetail(state, deviceSN)
+        if scheduler.due(deviceSN, ENDPOINT_BATTERY, now) and breakers.allow(ENDPOINT_BATTERY, now):
+            # read in battery settings if fitted
+            jobs[ENDPOINT_BATTERY] = client.getOABatterySettings(state, deviceSN)
+        if scheduler.due(deviceSN, ENDPOINT_REPORT, now) and breakers.allow(ENDPOINT_REPORT, now):
+            jobs[ENDPOINT_REPORT] = client.getReport(state, deviceSN, reports)
+            if reports.needs_year(deviceSN, now):
+                # earlier months for the year to date totals, a couple of times a month
+                jobs[REPORT_YEAR] = client.getReportYear(state, deviceSN, reports)
+        if scheduler.due(deviceSN, ENDPOINT_GENERATION, now) and breakers.allow(ENDPOINT_GENERATION, now):
+            jobs[ENDPOINT_GENERATION] = client.getReportDailyGeneration(state, deviceSN)
+        return jobs
+
+    async def _run_jobs(self, now, jobs):
+        """
+        Start every job together, they go out back to back as the rate limiter allows and each one is
+        parsed as its response arrives.
+            :return: (the real time job's result, True if a report arrived)
+        """
+        results = await asyncio.gather(*jobs.values(), return_exceptions=True)
+        getError = None
+        reportArrived = False
+        for endpoint, result in zip(jobs, results):
+            if isinstance(result, Exception):
+                # one endpoint failing doesn't lose what the others fetched
+                _LOGGER.warning(f"{self.name} {endpoint} fetch failed: {result!r}")
+                result = True
+            if endpoint == ENDPOINT_RAW:
+                getError = result
+            elif endpoint == REPORT_YEAR:
+                # not a planned job, retried with the next report until it succeeds
+                self.account.count()
+            else:
+                # a failed detail or report is retried on its own schedule
+                self._record_call(endpoint, now, result)
+                if result==True:
+                    _LOGGER.debug(f"{endpoint} fetch failed for SN:{self.deviceSN}")
+                elif endpoint == ENDPOINT_REPORT:
+                    reportArrived = True
+                    self._exportDue = True
+        return getError, reportArrived
+
+    def _raw_arrived(self, now):
+        self._exportDue = True
+        self.state.stale = False
+        self.state.set(GROUP_SCHEDULER, "lastCloudSync", now)
+        self.history.add_samples(self.state, now)
+        self.integrator.add_samples(self.state, now)
+
+    def _finish_cycle(self):
+        state, scheduler = self.state, self.account.scheduler
+        state.set(GROUP_SCHEDULER, "projectedCalls", scheduler.projected_calls_per_day())
+        state.set(GROUP_SCHEDULER, "callsToday", scheduler.calls_today)
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            # formatting all the data every minute is only worth it when someone is reading the log
+            _LOGGER.debug(f"Poll plan {self.deviceSN}: raw every {scheduler.interval(ENDPOINT_RAW):.1f} min, {state.section(GROUP_SCHEDULER)}")
+            _LOGGER.debug({group: state.section(group) for group in (GROUP_RAW, GROUP_REPORT, GROUP_GENERATION, GROUP_BATTERY)})
+
+        snapshot = state.freeze()
+        if self._exportDue and self.exporter is not None:
+            # only when the cloud brought something new, a tick that fetched nothing isn't exported again
+            self.exporter.publish(self.deviceSN, snapshot, datetime.now())
+        self._exportDue = False
+        return snapshot
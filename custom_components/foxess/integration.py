@@ -0,0 +1,109 @@
+"""Live daily energy totals, integrated from the real time power samples between report polls."""
+from __future__ import annotations
+
+from datetime import datetime
+import logging
+
+from .snapshot import GROUP_LIVE, GROUP_RAW, GROUP_REPORT
+
+_LOGGER = logging.getLogger(__name__)
+
+# real time power (kW) -> the report variable (kWh today) it adds up to
+POWER_ENERGY = {
+    "feedinPower": "feedin",
+    "gridConsumptionPower": "gridConsumption",
+    "loadsPower": "loads",
+    "batChargePower": "chargeEnergyToTal",
+    "batDischargePower": "dischargeEnergyToTal",
+}
+MAX_GAP_SECONDS = 30 * 60 # longer between samples than this and the power in between isn't guessed
+
+
+class EnergyCounter:
+    """
+    One daily energy total: the last report value (the anchor) plus the trapezoidal integral of
+    the power samples since. Never goes down during the day, if the estimate ran ahead of the
+    report it holds until the report catches up.
+    """
+
+    __slots__ = ("anchor", "estimate", "published", "drift", "_lastTime", "_lastPower")
+
+    def __init__(self) -> None:
+        self.anchor: float | None = None
+        self.estimate = 0.0
+        self.published: float | None = None
+        self.drift: float | None = None # estimate - report when the last report arrived, in kWh
+        self._lastTime: float | None = None
+        self._lastPower: float | None = None
+
+    def new_day(self) -> None:
+        self.anchor = 0.0
+        self.estimate = 0.0
+        self.published = 0.0
+
+    def add_sample(self, timestamp: float, power: float, midnight: float) -> None:
+        lastTime, lastPower = self._lastTime, self._lastPower
+        self._lastTime, self._lastPower = timestamp, power
+        if lastTime is None or timestamp <= lastTime or timestamp - lastTime > MAX_GAP_SECONDS:
+            return
+        if lastTime < midnight:
+            # the interval spans midnight, only the part of the trapezoid after it belongs to today
+            lastPower += (power - lastPower) * (midnight - lastTime) / (timestamp - lastTime)
+            lastTime = midnight
+        self.estimate += max(0.0, (lastPower + power) / 2 * (timestamp - lastTime) / 3600)
+
+    def re_anchor(self, value: float) -> None:
+        if self.anchor is not None:
+            self.drift = round(self.anchor + self.estimate - value, 3)
+        self.anchor = value
+        self.estimate = 0.0
+
+    def value(self) -> float | None:
+        if self.anchor is None:
+            return None
+        live = self.anchor + self.estimate
+        self.published = live if self.published is None else max(self.published, live)
+        return round(self.published, 3)
+
+
+class EnergyIntegrator:
+    """The live counters of one inverter, written into its state as the 'live' group."""
+
+    def __init__(self, pairs: dict = POWER_ENERGY) -> None:
+        self._pairs = pairs
+        self._counters = {energy: EnergyCounter() for energy in pairs.values()}
+        self._day = None
+
+    def _roll_day(self, now: datetime) -> float:
+        midnight = datetime.combine(now.date(), datetime.min.time(), tzinfo=now.tzinfo)
+        if self._day is not None and self._day != now.date():
+            for counter in self._counters.values():
+                counter.new_day()
+        self._day = now.date()
+        return midnight.timestamp()
+
+    def add_samples(self, state, now: datetime) -> None:
+        """Integrate the latest real time power values, call after each successful real time fetch."""
+        midnight = self._roll_day(now)
+        timestamp = now.timestamp()
+        for power, energy in self._pairs.items():
+            value = state.get(GROUP_RAW, power)
+            if isinstance(value, (int, float)):
+                self._counters[energy].add_sample(timestamp, float(value), midnight)
+        self._write(state)
+
+    def re_anchor(self, state, now: datetime) -> None:
+        """Take the report values as the new starting points, call whenever a report arrives (or is restored)."""
+        self._roll_day(now)
+        for energy, counter in self._counters.items():
+            value = state.get(GROUP_REPORT, energy)
+            if isinstance(value, (int, float)):
+                counter.re_anchor(float(value))
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Energy integration drift (kWh): %s", {energy: counter.drift for energy, counter in self._counters.items()})
+        self._write(state)
+
+    def _write(self, state) -> None:
+        for energy, counter in self._counters.items():
+            state.set(GROUP_LIVE, energy, counter.value())
+            state.set(GROUP_LIVE, f"{energy}Drift", counter.drift)
@@ -0,0 +1,115 @@
+"""Per endpoint call, error and latency metrics of one OpenAPI client."""
+from __future__ import annotations
+
+from collections import Counter, deque
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+LATENCY_WINDOW = 100 # most recent calls the latency percentiles are taken over
+ADAPT_MIN_SAMPLES = 20 # successful calls seen before an endpoint's timeout is taken from its latencies
+TIMEOUT_PERCENTILE = 0.99
+TIMEOUT_MARGIN = 2.0 # the deadline is this many times the percentile
+TIMEOUT_FLOOR = 5.0 # seconds, never less than this however quick the endpoint has been
+SLOW_FRACTION = 0.5 # a success that took more than this much of its deadline counts as slow
+
+
+def percentile(ordered: list[float], fraction: float) -> float | None:
+    """Nearest rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class EndpointMetrics:
+    """Counts since start up plus the latencies of the last LATENCY_WINDOW successful calls."""
+
+    __slots__ = ("calls", "errors", "timeouts", "slow", "latencies", "_timeoutsInRow", "_deadline")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors: Counter[str] = Counter() # errno, or http / connection, -> count
+        self.timeouts = 0
+        self.slow = 0
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._timeoutsInRow = 0
+        self._deadline: float | None = None
+
+    def deadline(self, ceiling: float) -> float:
+        """
+        Seconds to allow the next call, a margin over the high percentile of the recent successes
+        between TIMEOUT_FLOOR and ceiling. Each timeout in a row doubles it (up to the ceiling) so a
+        slower cloud isn't cut off by a deadline learned while it was quick.
+        """
+        if len(self.latencies) < ADAPT_MIN_SAMPLES:
+            deadline = ceiling
+        else:
+            deadline = percentile(sorted(self.latencies), TIMEOUT_PERCENTILE) / 1000 * TIMEOUT_MARGIN
+            deadline = min(ceiling, max(TIMEOUT_FLOOR, deadline) * 2 ** self._timeoutsInRow)
+        self._deadline = deadline
+        return deadline
+
+    def success(self, latency: float) -> None:
+        self._timeoutsInRow = 0
+        self.latencies.append(latency)
+        if self._deadline is not None and latency > SLOW_FRACTION * 1000 * self._deadline:
+            self.slow += 1
+
+    def timeout(self) -> None:
+        self.timeouts += 1
+        self._timeoutsInRow += 1
+
+    def summary(self) -> dict:
+        ordered = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "errors": sum(self.errors.values()),
+            "errorsByCode": dict(self.errors),
+            "timeouts": self.timeouts,
+            "slow": self.slow,
+            "timeout": None if self._deadline is None else round(self._deadline, 1),
+            "latencyP50": percentile(ordered, 0.5),
+            "latencyP95": percentile(ordered, 0.95),
+            "latencyMax": ordered[-1] if ordered else None,
+        }
+
+
+class ApiMetrics:
+    """
+    Everything one client has called, by endpoint. The client records each call as it completes and
+    each error code as the response is decoded, reading the figures costs a sort of the window.
+    """
+
+    def __init__(self) -> None:
+        self.endpoints: dict[str, EndpointMetrics] = {}
+
+    def _endpoint(self, endpoint: str) -> EndpointMetrics:
+        metrics = self.endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self.endpoints[endpoint] = EndpointMetrics()
+        return metrics
+
+    def deadline(self, endpoint: str, ceiling: float) -> float:
+        return self._endpoint(endpoint).deadline(ceiling)
+
+    def record_call(self, endpoint: str, latency: float | None, error: str | None = None) -> None:
+        """A call that got a response in latency mS, or failed with error (http, connection) and no response."""
+        metrics = self._endpoint(endpoint)
+        metrics.calls += 1
+        if error is not None:
+            metrics.errors[error] += 1
+        elif latency is not None:
+            metrics.success(latency)
+
+    def record_timeout(self, endpoint: str) -> None:
+        """A call that ran past its deadline, counted apart from the calls that failed outright."""
+        metrics = self._endpoint(endpoint)
+        metrics.calls += 1
+        metrics.timeout()
+
+    def record_errno(self, endpoint: str, errno) -> None:
+        """An answer that decoded to an OpenAPI error code, eg. 40400 when the rate limit was hit."""
+        self._endpoint(endpoint).errors[str(errno)] += 1
+
+    def summary(self) -> dict:
+        return {endpoint: metrics.summary() for endpoint, metrics in sorted(self.endpoints.items())}
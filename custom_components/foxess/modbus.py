@@ -0,0 +1,199 @@
+"""Local Modbus TCP transport, reads the real time variables straight from the inverter with no cloud quota."""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import logging
+import struct
+
+from .snapshot import GROUP_RAW
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PORT = 502
+DEFAULT_UNIT = 247 # FoxESS inverters answer on slave id 247 by default
+DEFAULT_TIMEOUT = 5 # seconds for one request
+
+FUNCTION_READ_HOLDING = 3
+FUNCTION_READ_INPUT = 4
+MAX_REGISTERS_PER_READ = 125 # Modbus limit for one read
+MAX_GAP = 8 # unmapped registers worth reading through rather than starting another request
+
+
+class ModbusError(Exception):
+    """The gateway or inverter answered with an error or something that isn't Modbus."""
+
+
+@dataclass(frozen=True)
+class Register:
+    """One value in a register map, read as count 16 bit registers (big endian) times scale."""
+
+    name: str # the OpenAPI variable name it stands in for
+    address: int
+    scale: float = 1.0
+    signed: bool = False
+    count: int = 1
+
+    def decode(self, words) -> float:
+        raw = 0
+        for word in words:
+            raw = (raw << 16) | word
+        if self.signed and raw >= 1 << (16 * self.count - 1):
+            raw -= 1 << (16 * self.count)
+        return round(raw * self.scale, 3)
+
+
+@dataclass(frozen=True)
+class RegisterMap:
+    function: int
+    registers: tuple[Register, ...]
+
+
+# H1 / AC1 through the LAN port, powers in kW and signs as the OpenAPI reports them
+H1_LAN = RegisterMap(FUNCTION_READ_HOLDING, (
+    Register("pv1Volt", 31000, 0.1),
+    Register("pv1Current", 31001, 0.1),
+    Register("pv1Power", 31002, 0.001, signed=True),
+    Register("pv2Volt", 31003, 0.1),
+    Register("pv2Current", 31004, 0.1),
+    Register("pv2Power", 31005, 0.001, signed=True),
+    Register("RVolt", 31006, 0.1),
+    Register("RCurrent", 31007, 0.1, signed=True),
+    Register("generationPower", 31008, 0.001, signed=True),
+    Register("RFreq", 31009, 0.01),
+    Register("epsVoltR", 31010, 0.1),
+    Register("epsCurrentR", 31011, 0.1, signed=True),
+    Register("epsPowerR", 31012, 0.001, signed=True),
+    Register("meterPower", 31014, 0.001, signed=True), # grid CT, positive is feeding in
+    Register("meterPower2", 31015, 0.001, signed=True),
+    Register("loadsPower", 31016, 0.001, signed=True),
+    Register("invTemperation", 31018, 0.1, signed=True),
+    Register("ambientTemperation", 31019, 0.1, signed=True),
+    Register("batVolt", 31020, 0.1),
+    Register("batCurrent", 31021, 0.1, signed=True),
+    Register("invBatPower", 31022, 0.001, signed=True), # positive is discharging
+    Register("batTemperature", 31023, 0.1, signed=True),
+    Register("SoC", 31024),
+    Register("runningState", 31027),
+))
+
+REGISTER_MAPS = {
+    "H1": H1_LAN,
+}
+
+
+def derive_variables(values: dict) -> dict:
+    """Fill in the variables the OpenAPI reports but the inverter only has the parts of."""
+    meter = values.get("meterPower", 0)
+    battery = values.get("invBatPower", 0)
+    values["pvPower"] = round(sum(value for name, value in values.items() if name.startswith("pv") and name.endswith("Power")), 3)
+    values["feedinPower"] = max(0.0, meter)
+    values["gridConsumptionPower"] = max(0.0, -meter)
+    values["batDischargePower"] = max(0.0, battery)
+    values["batChargePower"] = max(0.0, -battery)
+    values["RPower"] = values.get("generationPower", 0)
+    if "runningState" in values:
+        # the register holds 0-10, the OpenAPI reports the same states as 160-170
+        values["runningState"] = str(160 + int(values["runningState"]))
+    return values
+
+
+def plan_reads(registers, max_gap: int = MAX_GAP, max_count: int = MAX_REGISTERS_PER_READ):
+    """
+    Group a register map into as few contiguous reads as possible.
+        :return: list of (start address, register count, registers in the block)
+    """
+    blocks = []
+    for register in sorted(registers, key=lambda register: register.address):
+        end = register.address + register.count
+        if blocks:
+            start, count, members = blocks[-1]
+            if register.address - (start + count) <= max_gap and end - start <= max_count:
+                blocks[-1] = (start, max(count, end - start), members + [register])
+                continue
+        blocks.append((register.address, register.count, [register]))
+    return blocks
+
+
+class ModbusTcpClient:
+    """
+    Minimal asyncio Modbus TCP client, only the register reads the inverters need.
+    One connection is kept open and requests are sent one at a time, most RS485 to TCP gateways
+    can't cope with more.
+    """
+
+    def __init__(self, host: str, port: int = DEFAULT_PORT, unit: int = DEFAULT_UNIT, timeout: float = DEFAULT_TIMEOUT) -> None:
+        self.host = host
+        self.port = port
+        self.unit = unit
+        self.timeout = timeout
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._transaction = 0
+        self._lock = asyncio.Lock()
+
+    async def _connect(self) -> None:
+        if self._writer is None or self._writer.is_closing():
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout
+            )
+
+    async def close(self) -> None:
+        writer, self._writer, self._reader = self._writer, None, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def read_registers(self, function: int, start: int, count: int) -> list[int]:
+        async with self._lock:
+            try:
+                await self._connect()
+                return await asyncio.wait_for(self._read(function, start, count), self.timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ModbusError):
+                # drop the connection, the next read starts a fresh one
+                await self.close()
+                raise
+
+    async def _read(self, function: int, start: int, count: int) -> list[int]:
+        self._transaction = (self._transaction + 1) & 0xFFFF
+        # MBAP header (transaction, protocol 0, length, unit) then the PDU
+        self._writer.write(struct.pack(">HHHBBHH", self._transaction, 0, 6, self.unit, function, start, count))
+        await self._writer.drain()
+        transaction, protocol, length, unit = struct.unpack(">HHHB", await self._reader.readexactly(7))
+        pdu = await self._reader.readexactly(length - 1)
+        if transaction != self._transaction or protocol != 0:
+            raise ModbusError(f"unexpected response transaction {transaction} protocol {protocol}")
+        if pdu[0] == function | 0x80:
+            raise ModbusError(f"exception code {pdu[1]} reading {count} registers at {start}")
+        if pdu[0] != function or pdu[1] != 2 * count:
+            raise ModbusError(f"malformed response reading {count} registers at {start}")
+        return list(struct.unpack(f">{count}H", pdu[2:2 + 2 * count]))
+
+
+class FoxESSModbusInverter:
+    """Reads one inverter's register map into its InverterState under the OpenAPI variable names."""
+
+    def __init__(self, client: ModbusTcpClient, registerMap: RegisterMap = H1_LAN) -> None:
+        self.client = client
+        self._function = registerMap.function
+        self._blocks = plan_reads(registerMap.registers)
+        self.reads = 0 # requests made, for the debug log
+
+    async def async_read(self, state) -> bool:
+        """Same contract as the cloud fetches, True if the read failed."""
+        values = {}
+        try:
+            for start, count, registers in self._blocks:
+                words = await self.client.read_registers(self._function, start, count)
+                self.reads += 1
+                for register in registers:
+                    offset = register.address - start
+                    values[register.name] = register.decode(words[offset:offset + register.count])
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ModbusError) as err:
+            _LOGGER.debug("Modbus read from %s:%s failed: %r", self.client.host, self.client.port, err)
+            return True
+        state.update(GROUP_RAW, derive_variables(values))
+        return False
@@ -0,0 +1,48 @@
+"""Rate limiting for the FoxESS OpenAPI, one token bucket per api key."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket that paces calls to at most rate per second, with bursts of up to capacity calls.
+    Waiting coroutines are served strictly in the order they arrived.
+    """
+
+    def __init__(self, rate: float = 1.0, capacity: float = 1.0) -> None:
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        # asyncio.Lock hands itself to waiters first come first served, which gives the FIFO fairness
+        self._lock = asyncio.Lock()
+        self.calls = 0
+        self.wait_time = 0.0 # total seconds callers have spent waiting for a token
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """Wait for a token, returns the number of seconds spent waiting."""
+        start = time.monotonic()
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                delay = (1 - self._tokens) / self.rate
+                _LOGGER.debug(f"API enforced delay, wait: {delay:.2f}")
+                await asyncio.sleep(delay)
+                self._refill()
+            self._tokens -= 1
+            self.calls += 1
+        waited = time.monotonic() - start
+        self.wait_time += waited
+        return waited
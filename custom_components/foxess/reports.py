@@ -0,0 +1,126 @@
+"""Local store of the daily and monthly report values, month and year totals are worked out from it."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+import logging
+
+from homeassistant.helpers.storage import Store
+
+from .snapshot import GROUP_REPORT, GROUP_REPORT_MONTH, GROUP_REPORT_YEAR
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+STORAGE_KEY = "foxess.reports"
+SAVE_DELAY = 60 # seconds
+
+
+class FoxESSReportStore:
+    """
+    Keeps, per inverter, each report variable's values for every day of the current month and every
+    month of the current year.
+    Days before yesterday are final once they have been seen on a later day and are never overwritten
+    after that. Just after midnight the cloud is often still adding to yesterday, so yesterday is only
+    final once two fetches made today agree on it. While more than today is open the month query
+    fills them all in one call, after that only today's hourly report is asked for. The months
+    before this one come from a year query made at most twice a month (on the 1st, then again from
+    the 2nd once the last day of the previous month has settled in the cloud), so month to date and
+    year to date totals cost no extra calls per poll.
+    """
+
+    def __init__(self, hass) -> None:
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._data: dict[str, dict] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    async def async_load(self) -> None:
+        async with self._lock:
+            if not self._loaded:
+                self._data = await self._store.async_load() or {}
+                self._loaded = True
+
+    def _save(self) -> None:
+        self._store.async_delay_save(lambda: self._data, SAVE_DELAY)
+
+    def _device(self, deviceSN: str, now: datetime) -> dict:
+        """The inverter's entry, emptied of anything from a previous month or year."""
+        device = self._data.setdefault(deviceSN, {})
+        month = f"{now:%Y-%m}"
+        if device.get("month") != month:
+            device["month"] = month
+            device["days"] = {}
+            device["final"] = 0 # days of the month that won't change any more
+        if device.get("year") != now.year:
+            device["year"] = now.year
+            device["months"] = {}
+            device["yearFetched"] = None
+        return device
+
+    def open_days(self, deviceSN: str, now: datetime) -> int:
+        """Days of this month up to today whose values may still change, 1 when only today's can."""
+        return now.day - self._device(deviceSN, now)["final"]
+
+    def put_month(self, deviceSN: str, now: datetime, result: list) -> None:
+        """Store a month query response, only the days not yet final are taken from it."""
+        device = self._device(deviceSN, now)
+        final = device["final"]
+        for item in result:
+            values = [0 if value is None else value for value in item["values"]]
+            # keep the frozen days, take the rest from the response
+            kept = device["days"].get(item["variable"], [])[:final]
+            device["days"][item["variable"]] = kept + values[len(kept):]
+        yesterday = now.day - 1
+        if final < yesterday:
+            seen = {variable: days[yesterday - 1] for variable, days in device["days"].items() if len(days) >= yesterday}
+            if device.get("settling") == [f"{now:%Y-%m-%d}", seen]:
+                final = yesterday
+            else:
+                # compared with the next fetch, the days before it have been seen today so they are settled
+                device["settling"] = [f"{now:%Y-%m-%d}", seen]
+                final = max(final, yesterday - 1)
+        device["final"] = final
+        self._save()
+
+    def put_day(self, deviceSN: str, now: datetime, result: list) -> None:
+        """Store today's hourly report response, today's value is the sum of its hours."""
+        device = self._device(deviceSN, now)
+        for item in result:
+            days = device["days"].setdefault(item["variable"], [])
+            if len(days) < now.day:
+                days.extend([0] * (now.day - len(days)))
+            days[now.day - 1] = round(sum(0 if value is None else value for value in item["values"]), 3)
+        self._save()
+
+    def put_year(self, deviceSN: str, now: datetime, result: list) -> None:
+        """Store a year query response, the months before this one are taken as final."""
+        device = self._device(deviceSN, now)
+        for item in result:
+            device["months"][item["variable"]] = [0 if value is None else value for value in item["values"][:now.month - 1]]
+        device["yearFetched"] = f"{now:%Y-%m-%d}"
+        self._save()
+
+    def needs_year(self, deviceSN: str, now: datetime) -> bool:
+        """True if the previous months of this year aren't known yet, or were read on the 1st."""
+        if now.month == 1:
+            return False # no earlier months, year to date is month to date
+        fetched = self._device(deviceSN, now)["yearFetched"]
+        if fetched is None or fetched[:7] != f"{now:%Y-%m}":
+            return True
+        return fetched[8:] == "01" and now.day > 1
+
+    def apply(self, state, deviceSN: str, now: datetime) -> bool:
+        """Write today's, month to date and year to date values into the inverter's state, False if there's nothing for this month."""
+        device = self._data.get(deviceSN)
+        if device is None or device.get("month") != f"{now:%Y-%m}":
+            return False
+        today = now.day
+        months = device.get("months", {}) if device.get("year") == now.year else {}
+        for variable, days in device["days"].items():
+            monthToDate = round(sum(days[:today]), 3)
+            state.set(GROUP_REPORT, variable, round(days[today - 1], 3) if today <= len(days) else 0)
+            state.set(GROUP_REPORT_MONTH, variable, monthToDate)
+            if now.month == 1 or variable in months:
+                state.set(GROUP_REPORT_YEAR, variable, round(sum(months.get(variable, ())) + monthToDate, 3))
+        return True
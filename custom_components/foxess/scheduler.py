@@ -0,0 +1,163 @@
+"""Quota aware polling scheduler for the FoxESS OpenAPI."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+ENDPOINT_RAW = "raw"
+ENDPOINT_DETAIL = "detail"
+ENDPOINT_REPORT = "report"
+ENDPOINT_GENERATION = "generation"
+ENDPOINT_BATTERY = "battery"
+
+DAILY_CALL_LIMIT = 1440 # OpenAPI calls allowed per inverter per day
+BUDGET_RESERVE = 0.1 # fraction of the daily budget held back for retries and restarts
+ACTIVITY_POWER_STEP = 1.0 # kW change between real time samples that counts as fully active
+MINUTES_PER_DAY = 1440
+
+
+@dataclass(frozen=True)
+class EndpointPolicy:
+    """How often an endpoint may be polled, all intervals are in minutes."""
+
+    priority: int # 1 is the most important, higher numbers are stretched first when the budget is tight
+    min_interval: float # used in daylight when power is changing quickly
+    max_interval: float # used at night when the system is idle
+    retry_interval: float # wait after a failed call
+
+
+ENDPOINT_POLICIES = {
+    ENDPOINT_RAW: EndpointPolicy(1, 5, 15, 5),
+    ENDPOINT_DETAIL: EndpointPolicy(2, 15, 60, 1),
+    ENDPOINT_REPORT: EndpointPolicy(3, 15, 60, 1),
+    ENDPOINT_GENERATION: EndpointPolicy(4, 60, 180, 1),
+    ENDPOINT_BATTERY: EndpointPolicy(5, 60, 240, 1),
+}
+
+
+class PollScheduler:
+    """
+    Plans when each endpoint is next called for every inverter of one api key.
+    Jobs are keyed by (deviceSN, endpoint), account wide jobs such as the batched real time
+    query use None as the key. Intervals move between each endpoint's min and max with the
+    time of day and how quickly power is changing, then are stretched, lowest priority first,
+    until the projected calls fit the remaining daily budget.
+    """
+
+    def __init__(self, daily_budget: int = DAILY_CALL_LIMIT, policies: dict[str, EndpointPolicy] = ENDPOINT_POLICIES) -> None:
+        self.daily_budget = daily_budget
+        self._policies = policies
+        self._next_due: dict[tuple, datetime | None] = {}
+        self._enabled: dict[tuple, bool] = {}
+        self._intervals = {endpoint: policy.min_interval for endpoint, policy in policies.items()}
+        self._day = None
+        self._daylight = True
+        self._activity = 0.0
+        self._last_power = None
+        self.calls_today = 0
+
+    def add_job(self, key, endpoint: str, enabled: bool = True) -> None:
+        """Register a job, a new job is due straight away."""
+        self._next_due.setdefault((key, endpoint), None)
+        self._enabled[(key, endpoint)] = enabled
+
+    def set_enabled(self, key, endpoint: str, enabled: bool) -> None:
+        self._enabled[(key, endpoint)] = enabled
+
+    def update_conditions(self, now: datetime, daylight: bool) -> None:
+        """Called once per tick with the local time and whether the sun is up, then replans."""
+        if self._day != now.date():
+            self._day = now.date()
+            self.calls_today = 0
+        self._daylight = daylight
+        self._plan(now)
+
+    def observe_power(self, power: float) -> None:
+        """Feed the latest total real time power (kW), fast changes shorten the intervals."""
+        if self._last_power is not None:
+            change = min(1.0, abs(power - self._last_power) / ACTIVITY_POWER_STEP)
+            # smooth it so a single spike doesn't flip the schedule
+            self._activity = 0.5 * self._activity + 0.5 * change
+        self._last_power = power
+
+    def _level(self) -> float:
+        # 1 polls at min_interval, 0 polls at max_interval
+        return (0.75 + 0.25 * self._activity) if self._daylight else 0.5 * self._activity
+
+    def _demand(self, intervals: dict[str, float], minutes: float) -> float:
+        demand = 0.0
+        for (key, endpoint), enabled in self._enabled.items():
+            if enabled:
+                demand += minutes / intervals[endpoint]
+        return demand
+
+    def _plan(self, now: datetime) -> None:
+        level = self._level()
+        intervals = {
+            endpoint: policy.max_interval - (policy.max_interval - policy.min_interval) * level
+            for endpoint, policy in self._policies.items()
+        }
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=now.tzinfo)
+        minutes_left = max(1.0, (midnight - now).total_seconds() / 60)
+        allowed = self.daily_budget * (1 - BUDGET_RESERVE) - self.calls_today
+        if self._demand(intervals, minutes_left) > allowed:
+            # stretch the least important endpoints to their maximum first
+            for endpoint in sorted(self._policies, key=lambda e: self._policies[e].priority, reverse=True):
+                intervals[endpoint] = self._policies[endpoint].max_interval
+                if self._demand(intervals, minutes_left) <= allowed:
+                    break
+            demand = self._demand(intervals, minutes_left)
+            if demand > allowed:
+                # still over, slow everything down evenly until midnight resets the budget
+                scale = demand / allowed if allowed > 0 else minutes_left
+                intervals = {endpoint: interval * scale for endpoint, interval in intervals.items()}
+            _LOGGER.debug(f"Poll plan stretched to fit budget, {self.calls_today} calls used, {allowed:.0f} left")
+        self._intervals = intervals
+
+    def interval(self, endpoint: str) -> float:
+        """Current planned interval for an endpoint in minutes."""
+        return self._intervals[endpoint]
+
+    def due(self, key, endpoint: str, now: datetime) -> bool:
+        if not self._enabled.get((key, endpoint), False):
+            return False
+        next_due = self._next_due.get((key, endpoint))
+        return next_due is None or now >= next_due
+
+    def record(self, key, endpoint: str, now: datetime, ok: bool = True, calls: int = 1) -> None:
+        """Record the call(s) made for a job and plan its next one."""
+        self.calls_today += calls
+        if ok:
+            minutes = self._intervals[endpoint]
+        else:
+            minutes = self._policies[endpoint].retry_interval
+        # aim a few seconds early so a job lines up with the coordinator's minute tick
+        self._next_due[(key, endpoint)] = now + timedelta(minutes=minutes, seconds=-5)
+
+    def count(self, calls: int = 1) -> None:
+        """Count calls made outside the planned jobs, eg. the occasional year report."""
+        self.calls_today += calls
+
+    def spare_calls(self, now: datetime) -> int:
+        """Calls left today once the reserve and everything the current plan needs before midnight are taken out."""
+        if self._day != now.date():
+            return 0 # not planned since midnight yet, the count hasn't been reset
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=now.tzinfo)
+        minutes_left = max(1.0, (midnight - now).total_seconds() / 60)
+        allowed = self.daily_budget * (1 - BUDGET_RESERVE) - self.calls_today
+        return int(allowed - self._demand(self._intervals, minutes_left))
+
+    def delay(self, key, endpoint: str, now: datetime, minutes: float) -> None:
+        """Push a job's next call out without counting a call, eg. while an inverter is off-line."""
+        self._next_due[(key, endpoint)] = now + timedelta(minutes=minutes, seconds=-5)
+
+    def restore(self, key, endpoint: str, last_call: datetime) -> None:
+        """Plan a job from a call made before a restart, without counting it again."""
+        self._next_due[(key, endpoint)] = last_call + timedelta(minutes=self._intervals[endpoint], seconds=-5)
+
+    def projected_calls_per_day(self) -> int:
+        """Calls a full day would use at the current plan."""
+        return round(self._demand(self._intervals, MINUTES_PER_DAY))
@@ -1,75 +1,82 @@
 from __future__ import annotations
 
-from collections import namedtuple
+from collections.abc import Callable
+from dataclasses import dataclass
 from datetime import timedelta
 from datetime import datetime
-import time
 import logging
-import json
-import hashlib
-import asyncio
+from typing import Any
 import voluptuous as vol
 
-from homeassistant.components.rest.data import RestData
-from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.components.sensor import (
     SensorDeviceClass,
     SensorStateClass,
     PLATFORM_SCHEMA,
-    SensorEntity,
+    RestoreSensor,
+    SensorEntityDescription,
 )
 
 
 from homeassistant.const import (
-    ATTR_DATE,
-    ATTR_TEMPERATURE,
-    ATTR_TIME,
-    ATTR_VOLTAGE,
     CONF_PASSWORD,
     CONF_USERNAME,
     CONF_NAME,
+    EVENT_HOMEASSISTANT_STOP,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
     UnitOfEnergy,
     UnitOfPower,
     UnitOfTemperature,
-    UnitOfEnergy,
     UnitOfElectricPotential,
     UnitOfElectricCurrent,
     UnitOfFrequency,
     UnitOfReactivePower,
+    UnitOfTime,
     PERCENTAGE,
+    EntityCategory,
 )
-from homeassistant.helpers.update_coordinator import (
-    CoordinatorEntity,
-    DataUpdateCoordinator,
-    UpdateFailed,
-)
-from homeassistant.util.ssl import SSLCipherList
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.helpers.icon import icon_for_battery_level
-from homeassistant.core import callback
+from homeassistant.helpers import entity_registry as er, restore_state
+from homeassistant.core import SupportsResponse, callback
 import homeassistant.helpers.config_validation as cv
 
-from random_user_agent.user_agent import UserAgent
-from random_user_agent.params import SoftwareName, OperatingSystem
-
-software_names = [SoftwareName.CHROME.value]
-operating_systems = [OperatingSystem.WINDOWS.value, OperatingSystem.LINUX.value]
-user_agent_rotator = UserAgent(software_names=software_names, operating_systems=operating_systems, limit=100)
+from .backfill import FoxESSBackfill
+from .cache import FoxESSCache
+from .capture import CAPTURE_FILE, CaptureWriter
+from .export import FoxESSExporter
+from .hub import DEFAULT_API_RATE, MODBUS_SCAN_INTERVAL, SCAN_MINUTES, FoxESSAccount
+from .modbus import (
+    DEFAULT_PORT as MODBUS_DEFAULT_PORT,
+    DEFAULT_UNIT as MODBUS_DEFAULT_UNIT,
+    REGISTER_MAPS,
+    FoxESSModbusInverter,
+    ModbusTcpClient,
+)
+from .reports import FoxESSReportStore
+from .snapshot import (
+    GROUP_BATTERY,
+    GROUP_GENERATION,
+    GROUP_LIVE,
+    GROUP_RAW,
+    GROUP_REPORT,
+    GROUP_REPORT_MONTH,
+    GROUP_REPORT_YEAR,
+    GROUP_SCHEDULER,
+    GROUP_STATS,
+    STATUS_SLOT,
+)
+from .scheduler import (
+    ENDPOINT_BATTERY,
+    ENDPOINT_DETAIL,
+    ENDPOINT_GENERATION,
+    ENDPOINT_RAW,
+    ENDPOINT_REPORT,
+)
 
 
 _LOGGER = logging.getLogger(__name__)
-_ENDPOINT_OA_DOMAIN = "https://www.foxesscloud.com"
-_ENDPOINT_OA_BATTERY_SETTINGS = "/op/v0/device/battery/soc/get?sn="
-_ENDPOINT_OA_REPORT = "/op/v0/device/report/query"
-_ENDPOINT_OA_DEVICE_DETAIL = "/op/v0/device/detail?sn="
-_ENDPOINT_OA_DEVICE_VARIABLES = "/op/v0/device/real/query"
-_ENDPOINT_OA_DAILY_GENERATION = "/op/v0/device/generation?sn="
-
-METHOD_POST = "POST"
-METHOD_GET = "GET"
-DEFAULT_ENCODING = "UTF-8"
-USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-DEFAULT_TIMEOUT = 75 # increase the size of inherited timeout, the API is a bit slow
-
 ATTR_DEVICE_SN = "deviceSN"
 ATTR_PLANTNAME = "plantName"
 ATTR_MODULESN = "moduleSN"
@@ -81,6 +88,8 @@ ATTR_CITY = "city"
 ATTR_ADDRESS = "address"
 ATTR_FEEDINDATE = "feedinDate"
 ATTR_LASTCLOUDSYNC = "lastCloudSync"
+ATTR_STALE = "stale"
+ATTR_RESTORED = "restored"
 
 BATTERY_LEVELS = {"High": 80, "Medium": 50, "Low": 25, "Empty": 10}
 
@@ -90,13 +99,22 @@ CONF_DEVICEID = "deviceID"
 CONF_SYSTEM_ID = "system_id"
 CONF_EXTPV = "extendPV"
 CONF_GET_VARIABLES = "Restrict"
-RETRY_NEXT_SLOT = -1
-
+CONF_API_RATE = "apiRate"
+CONF_MODBUS_HOST = "modbusHost"
+CONF_MODBUS_PORT = "modbusPort"
+CONF_MODBUS_UNIT = "modbusUnit"
+CONF_MODBUS_MODEL = "modbusModel"
+CONF_CAPTURE = "capture"
+CONF_MQTT_TOPIC = "mqttTopic"
+CONF_METRICS = "metrics"
+SERVICE_BACKFILL = "backfill"
+SERVICE_DIAGNOSTICS = "diagnostics"
+ATTR_START = "start"
+ATTR_END = "end"
+
+DOMAIN = "foxess"
 DEFAULT_NAME = "FoxESS"
-DEFAULT_VERIFY_SSL = False # True
 
-SCAN_MINUTES = 1 # number of minutes betwen API requests
-SCAN_INTERVAL = timedelta(minutes=SCAN_MINUTES)
 
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
     {
@@ -108,20 +126,34 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
         vol.Optional(CONF_NAME, default=DEFAULT_NAME): cv.string,
         vol.Optional(CONF_EXTPV): cv.boolean,
         vol.Optional(CONF_GET_VARIABLES): cv.boolean,
+        vol.Optional(CONF_API_RATE, default=DEFAULT_API_RATE): vol.All(vol.Coerce(float), vol.Range(min=0.05, max=1)),
+        vol.Optional(CONF_MODBUS_HOST): cv.string,
+        vol.Optional(CONF_MODBUS_PORT, default=MODBUS_DEFAULT_PORT): cv.port,
+        vol.Optional(CONF_MODBUS_UNIT, default=MODBUS_DEFAULT_UNIT): vol.All(vol.Coerce(int), vol.Range(min=1, max=247)),
+        vol.Optional(CONF_MODBUS_MODEL, default="H1"): vol.In(list(REGISTER_MAPS)),
+        vol.Optional(CONF_CAPTURE, default=False): cv.boolean,
+        vol.Optional(CONF_MQTT_TOPIC): cv.string,
+        vol.Optional(CONF_METRICS, default=False): cv.boolean,
     }
 )
 
-token = None
+BACKFILL_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_START): cv.date,
+        vol.Optional(ATTR_END): cv.date,
+        vol.Optional(CONF_DEVICESN): cv.string,
+    }
+)
 
 async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     """Set up the FoxESS sensor."""
-    global LastHour, TimeSlice, last_api, RestrictGetVar
     name = config.get(CONF_NAME)
     deviceID = config.get(CONF_DEVICEID)
     deviceSN = config.get(CONF_DEVICESN)
     apiKey = config.get(CONF_APIKEY)
+    apiRate = config.get(CONF_API_RATE)
     ExtPV = config.get(CONF_EXTPV)
-    RestrictGetVar = config.get(CONF_GET_VARIABLES)
+    restricted = config.get(CONF_GET_VARIABLES)
     _LOGGER.debug("API Key:" + apiKey)
     _LOGGER.debug("Device SN:" + deviceSN)
     _LOGGER.debug("Device ID:" + deviceID)
@@ -132,1460 +164,641 @@ async def async_setup_platform(hass, config, async_add_entities, discovery_info=
     else:
         ExtPV = True
         _LOGGER.warn("Extended PV 1-18 strings enabled" )
-    _LOGGER.debug(f"Restrict Variables: {RestrictGetVar}" )
-    if RestrictGetVar != True:
-        RestrictGetVar = False
+    _LOGGER.debug(f"Restrict Variables: {restricted}" )
+    if restricted != True:
+        restricted = False
     else:
-        RestrictGetVar = True
-        _LOGGER.warn("Get Variables is in restricted mode" )
-    TimeSlice = {}
-    TimeSlice[deviceSN] = RETRY_NEXT_SLOT
-    last_api = 0
-    LastHour = 0
-    allData = {
-        "report":{},
-        "reportDailyGeneration": {},
-        "raw":{},
-        "battery":{},
-        "addressbook":{},
-        "online":False
-    }
-    allData['addressbook']['hasBattery'] = False # assume no battery is fitted for now
-    allData['addressbook']['status'] = '3' # assume inverter is off-line for now
-
-    async def async_update_data():
-        _LOGGER.debug("Updating data from https://www.foxesscloud.com/")
-        global token, TimeSlice, LastHour
-        hournow = datetime.now().strftime("%H") # update hour now
-        _LOGGER.debug(f"Time now: {hournow}, last {LastHour}")
-        TSlice = TimeSlice[deviceSN] + 1 # get the time slice for the current device and increment it
-        TimeSlice[deviceSN] = TSlice
-        if (TSlice % 5 == 0):
-            _LOGGER.debug(f"Main Poll, interval: {deviceSN}, {TimeSlice[deviceSN]}")
-            # try the openapi see if we get a response
-            getError=False
-            if (TSlice % 15 == 0):
-                # get device detail at startup, then every 15 minutes to save api calls
-                getError = await getOADeviceDetail(hass, allData, deviceSN, apiKey)
-                await asyncio.sleep(2) # enforced sleep to limit demand on OpenAPI
-            if getError==False:
-                if allData["addressbook"]["status"] is not None:
-                    statetest = int(allData["addressbook"]["status"])
-                else:
-                    statetest = 0
-                _LOGGER.debug(f" Statetest {statetest}")
-                if statetest in [1,2]:
-                    allData["online"] = True
-                    if TSlice==0:
-                        # read in battery settings if fitted at startup, then every 60 mins
-                        addfail = await getOABatterySettings(hass, allData, deviceSN, apiKey)
-                        await asyncio.sleep(2) # enforced sleep to limit demand on OpenAPI
-                    # main real time data fetch, followed by reports
-                    getError = await getRaw(hass, allData, apiKey, deviceSN, deviceID)
-                    if getError==False:
-                        if (TSlice % 15 == 0): # do this at startup, every 15 minutes and on the hour change
-                            await asyncio.sleep(2) # enforced sleep to limit demand on OpenAPI
-                            getError = await getReport(hass, allData, apiKey, deviceSN, deviceID)
-                            if getError==False:
-                                if TSlice==0:
-                                    # get daily generation at startup, then every 60 minutes
-                                    await asyncio.sleep(2) # enforced sleep to limit demand on OpenAPI
-                                    getError = await getReportDailyGeneration(hass, allData, apiKey, deviceSN, deviceID)
-                                    if getError==True:
-                                        _LOGGER.debug("getReportDailyGeneration False")
-                            else:
-                                _LOGGER.debug("getReport False")
-                    else:
-                        _LOGGER.debug("getRaw False")
-                        if statetest==2:
-                            # The inverter is in alarm, don't check every minute
-                            _LOGGER.debug(f" Inverter in alarm, slowing retry response for SN:{deviceSN}")
-                        else:
-                            # The get variables api call failed, leave it 5 minutes
-                            _LOGGER.debug(f" Failed to get device variables, slowing retry response for SN:{deviceSN}")
-                        allData["online"] = False
-                        getError = False
-                        TSlice = 25 # forces a retry on device detail in 5 minutes
-                else:
-                    if statetest==3:
-                        # The inverter is off-line, no raw data polling, don't update entities
-                        # retry device detail call every 5 minutes until it comes back on-line
-                        allData["online"] = False
-                        TSlice = 25 # forces a retry on device detail in 5 minutes
-                        _LOGGER.debug(f" Inverter off-line set online flag false for SN:{deviceSN}")
-
-                if allData["online"] == False:
-                    _LOGGER.warning(f"{name} has Cloud timeout or the Inverter is off-line, connection will be retried in 1 minute")
-            else:
-                _LOGGER.warning(f"{name} has Cloud timeout fetching Device Detail, will retry in 1 minute.")
-
-            if getError != False:
-                allData["online"] = False
-                if TSlice != 0:
-                    TSlice=TSlice-1 # failed to get specific detail so retry slot in 1 minute
-                else:
-                    TSlice=RETRY_NEXT_SLOT # failed to get full data, try again in 1 minute
-
-        # actions here are every minute
-        if TSlice>=59:
-            TSlice=RETRY_NEXT_SLOT # reset timeslot, ready for full data fetch at 0
-        _LOGGER.debug(f"Auxilliary TimeSlice {deviceSN}, {TSlice}")
-
-        if LastHour != hournow:
-            LastHour = hournow # update the hour the last poll was run
-
-        TimeSlice[deviceSN] = TSlice
-
-        _LOGGER.debug(allData)
-
-        return allData
-
-
-    coordinator = DataUpdateCoordinator(
-        hass,
-        _LOGGER,
-        # Name of the data. For logging purposes.
-        name=DEFAULT_NAME,
-        update_method=async_update_data,
-        # Polling interval. Will only be polled if there are subscribers.
-        update_interval=SCAN_INTERVAL,
+        restricted = True
+        _LOGGER.warn(f"Get Variables is in restricted mode for SN:{deviceSN}" )
+
+    modbus = None
+    if config.get(CONF_MODBUS_HOST):
+        # real time data read locally, the cloud is only used for device detail and the reports
+        modbus = FoxESSModbusInverter(
+            ModbusTcpClient(config[CONF_MODBUS_HOST], config[CONF_MODBUS_PORT], config[CONF_MODBUS_UNIT]),
+            REGISTER_MAPS[config[CONF_MODBUS_MODEL]],
+        )
+        _LOGGER.debug(f"Modbus TCP transport {config[CONF_MODBUS_HOST]}:{config[CONF_MODBUS_PORT]}, every {MODBUS_SCAN_INTERVAL}")
+
+    # inverters sharing an apiKey share one hub, its real time poller, scheduler and limiter
+    account = get_account(hass, apiKey, apiRate)
+    if deviceSN in account.inverters:
+        _LOGGER.error(f"FoxESS inverter SN:{deviceSN} is configured more than once, only the first is used")
+        return
+    if config[CONF_CAPTURE]:
+        # every call on the account is captured, for reproducing problems offline
+        account.client.capture = get_capture(hass)
+        _LOGGER.warning(f"Capturing FoxESS OpenAPI traffic to {account.client.capture.path}")
+    inverter = account.add_inverter(
+        name, deviceSN, await async_get_cache(hass), await async_get_reports(hass), modbus=modbus, restricted=restricted
+    )
+    coordinator = inverter.coordinator
+
+    async def async_stop_inverter(event):
+        await inverter.async_shutdown()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, async_stop_inverter)
+    if config.get(CONF_MQTT_TOPIC) or config[CONF_METRICS]:
+        # every fetch that brings new data is handed on locally, the cloud is still asked only once
+        inverter.exporter = get_exporter(hass)
+        inverter.exporter.add_inverter(deviceSN, config.get(CONF_MQTT_TOPIC), config[CONF_METRICS])
+
+    # the inverter's own entity is always there, the sensors appear as their variables are first returned
+    async_add_entities([FoxESSInverter(coordinator, name, deviceID, inverter)])
+    if not account.entitiesAdded:
+        # the account's call metrics, added once for the account and updated by it rather than an inverter
+        account.entitiesAdded = True
+        async_add_entities([FoxESSApiSensor(account, description) for description in API_SENSOR_DESCRIPTIONS])
+    manager = FoxESSSensorManager(
+        coordinator, name, deviceID, async_add_entities, extendedPV=ExtPV, planner=inverter.variables, registry=er.async_get(hass)
     )
+    manager.async_add_new_entities() # anything restored from the cache or registered before the restart
+    coordinator.async_add_listener(manager.async_add_new_entities)
 
-    await coordinator.async_refresh()
-
-    if not coordinator.last_update_success:
-        _LOGGER.error(
-            "FoxESS Cloud initialisation failed, Fatal Error - correct error and restart Home Assistant")
-        return False
-
-
-    async_add_entities([
-        FoxESSCurrent(coordinator, name, deviceID, "PV1 Current", "pv1-current", "pv1Current"),
-        FoxESSPower(coordinator, name, deviceID, "PV1 Power", "pv1-power", "pv1Power"),
-        FoxESSVolt(coordinator, name, deviceID, "PV1 Volt", "pv1-volt", "pv1Volt"),
-        FoxESSCurrent(coordinator, name, deviceID, "PV2 Current", "pv2-current", "pv2Current"),
-        FoxESSPower(coordinator, name, deviceID, "PV2 Power", "pv2-power", "pv2Power"),
-        FoxESSVolt(coordinator, name, deviceID, "PV2 Volt", "pv2-volt", "pv2Volt"),
-        FoxESSCurrent(coordinator, name, deviceID, "PV3 Current", "pv3-current", "pv3Current"),
-        FoxESSPower(coordinator, name, deviceID, "PV3 Power", "pv3-power", "pv3Power"),
-        FoxESSVolt(coordinator, name, deviceID, "PV3 Volt", "pv3-volt", "pv3Volt"),
-        FoxESSCurrent(coordinator, name, deviceID, "PV4 Current", "pv4-current", "pv4Current"),
-        FoxESSPower(coordinator, name, deviceID, "PV4 Power", "pv4-power", "pv4Power"),
-        FoxESSVolt(coordinator, name, deviceID, "PV4 Volt", "pv4-volt", "pv4Volt"),
-        FoxESSCurrent(coordinator, name, deviceID, "PV5 Current", "pv5-current", "pv5Current"),
-        FoxESSPower(coordinator, name, deviceID, "PV5 Power", "pv5-power", "pv5Power"),
-        FoxESSVolt(coordinator, name, deviceID, "PV5 Volt", "pv5-volt", "pv5Volt"),
-        FoxESSCurrent(coordinator, name, deviceID, "PV6 Current", "pv6-current", "pv6Current"),
-        FoxESSPower(coordinator, name, deviceID, "PV6 Power", "pv6-power", "pv6Power"),
-        FoxESSVolt(coordinator, name, deviceID, "PV6 Volt", "pv6-volt", "pv6Volt"),
-        FoxESSPower(coordinator, name, deviceID, "PV Power", "pv-power", "pvPower"),
-        FoxESSCurrent(coordinator, name, deviceID, "R Current", "r-current", "RCurrent"),
-        FoxESSFreq(coordinator, name, deviceID, "R Freq", "r-freq", "RFreq"),
-        FoxESSPower(coordinator, name, deviceID, "R Power", "r-power", "RPower"),
-        FoxESSPowerString(coordinator, name, deviceID, "Meter2 Power", "meter2-power", "meterPower2"),
-        FoxESSVolt(coordinator, name, deviceID, "R Volt", "r-volt", "RVolt"),
-        FoxESSCurrent(coordinator, name, deviceID, "S Current", "s-current", "SCurrent"),
-        FoxESSFreq(coordinator, name, deviceID, "S Freq", "s-freq", "SFreq"),
-        FoxESSPower(coordinator, name, deviceID, "S Power", "s-power", "SPower"),
-        FoxESSVolt(coordinator, name, deviceID, "S Volt", "s-volt", "SVolt"),
-        FoxESSCurrent(coordinator, name, deviceID, "T Current", "t-current", "TCurrent"),
-        FoxESSFreq(coordinator, name, deviceID, "T Freq", "t-freq", "TFreq"),
-        FoxESSPower(coordinator, name, deviceID, "T Power", "t-power", "TPower"),
-        FoxESSVolt(coordinator, name, deviceID, "T Volt", "t-volt", "TVolt"),
-        FoxESSReactivePower(coordinator, name, deviceID),
-        FoxESSPowerFactor(coordinator, name, deviceID),
-        FoxESSTemp(coordinator, name, deviceID, "Bat Temperature", "bat-temperature", "batTemperature"),
-        FoxESSTemp(coordinator, name, deviceID, "Bat Temperature2", "bat-temperature2", "batTemperature_2"),
-        FoxESSTemp(coordinator, name, deviceID, "Ambient Temperature", "ambient-temperature", "ambientTemperation"),
-        FoxESSTemp(coordinator, name, deviceID, "Boost Temperature", "boost-temperature", "boostTemperation"),
-        FoxESSTemp(coordinator, name, deviceID, "Inv Temperature", "inv-temperature", "invTemperation"),
-        FoxESSBatSoC(coordinator, name, deviceID, "Bat SoC", "bat-soc", "SoC"),
-        FoxESSBatSoC(coordinator, name, deviceID, "Bat SoC1", "bat-soc1", "SoC_1"),
-        FoxESSBatSoC(coordinator, name, deviceID, "Bat SoC2", "bat-soc2", "SoC_2"),
-        FoxESSPower(coordinator, name, deviceID, "Inverter Bat Power", "inv-Bat-Power", "invBatPower"),
-        FoxESSPower(coordinator, name, deviceID, "Inverter Bat Power2", "inv-Bat-Power2", "invBatPower_2"),
-        FoxESSBatMinSoC(coordinator, name, deviceID),
-        FoxESSBatMinSoConGrid(coordinator, name, deviceID),
-        FoxESSSolarPower(coordinator, name, deviceID),
-        FoxESSEnergyThroughput(coordinator, name, deviceID),
-        FoxESSEnergySolar(coordinator, name, deviceID),
-        FoxESSInverter(coordinator, name, deviceID),
-        FoxESSPowerString(coordinator, name, deviceID, "Generation Power", "-generation-power", "generationPower"),
-        FoxESSPowerString(coordinator, name, deviceID, "Grid Consumption Power", "grid-consumption-power", "gridConsumptionPower"),
-        FoxESSPowerString(coordinator, name, deviceID, "FeedIn Power", "feedIn-power", "feedinPower"),
-        FoxESSPowerString(coordinator, name, deviceID, "Bat Discharge Power", "bat-discharge-power", "batDischargePower"),
-        FoxESSPowerString(coordinator, name, deviceID, "Bat Charge Power", "bat-charge-power", "batChargePower"),
-        FoxESSPowerString(coordinator, name, deviceID, "Load Power", "load-power", "loadsPower"),
-        FoxESSEnergyGenerated(coordinator, name, deviceID, "Energy Generated", "energy-generated", "value"),
-        FoxESSEnergyGenerated(coordinator, name, deviceID, "Energy Generated Month", "energy-generated-month", "month"),
-        FoxESSEnergyGenerated(coordinator, name, deviceID, "Energy Generated Cumulative", "energy-generated-cumulative", "cumulative"),
-        FoxESSEnergyGridConsumption(coordinator, name, deviceID),
-        FoxESSEnergyFeedin(coordinator, name, deviceID),
-        FoxESSEnergyBatCharge(coordinator, name, deviceID),
-        FoxESSEnergyBatDischarge(coordinator, name, deviceID),
-        FoxESSEnergyLoad(coordinator, name, deviceID),
-        FoxESSResidualEnergy(coordinator, name, deviceID),
-        FoxESSResponseTime(coordinator, name, deviceID),
-        FoxESSRunningState(coordinator, name, deviceID, "Running State", "running-state", "runningState")
-    ])
-
-    if ExtPV:
-        async_add_entities([
-            FoxESSCurrent(coordinator, name, deviceID, "PV7 Current", "pv7-current", "pv7Current"),
-            FoxESSPower(coordinator, name, deviceID, "PV7 Power", "pv7-power", "pv7Power"),
-            FoxESSVolt(coordinator, name, deviceID, "PV7 Volt", "pv7-volt", "pv7Volt"),
-            FoxESSCurrent(coordinator, name, deviceID, "PV8 Current", "pv8-current", "pv8Current"),
-            FoxESSPower(coordinator, name, deviceID, "PV8 Power", "pv8-power", "pv8Power"),
-            FoxESSVolt(coordinator, name, deviceID, "PV8 Volt", "pv8-volt", "pv8Volt"),
-            FoxESSCurrent(coordinator, name, deviceID, "PV9 Current", "pv9-current", "pv9Current"),
-            FoxESSPower(coordinator, name, deviceID, "PV9 Power", "pv9-power", "pv9Power"),
-            FoxESSVolt(coordinator, name, deviceID, "PV9 Volt", "pv9-volt", "pv9Volt"),
-            FoxESSCurrent(coordinator, name, deviceID, "PV10 Current", "pv10-current", "pv10Current"),
-            FoxESSPower(coordinator, name, deviceID, "PV10 Power", "pv10-power", "pv10Power"),
-            FoxESSVolt(coordinator, name, deviceID, "PV10 Volt", "pv10-volt", "pv10Volt"),
-            FoxESSCurrent(coordinator, name, deviceID, "PV11 Current", "pv11-current", "pv11Current"),
-            FoxESSPower(coordinator, name, deviceID, "PV11 Power", "pv11-power", "pv11Power"),
-            FoxESSVolt(coordinator, name, deviceID, "PV11 Volt", "pv11-volt", "pv11Volt"),
-            FoxESSCurrent(coordinator, name, deviceID, "PV12 Current", "pv12-current", "pv12Current"),
-            FoxESSPower(coordinator, name, deviceID, "PV12 Power", "pv12-power", "pv12Power"),
-            FoxESSVolt(coordinator, name, deviceID, "PV12 Volt", "pv12-volt", "pv12Volt"),
-            FoxESSCurrent(coordinator, name, deviceID, "PV13 Current", "pv13-current", "pv13Current"),
-            FoxESSPower(coordinator, name, deviceID, "PV13 Power", "pv13-power", "pv13Power"),
-            FoxESSVolt(coordinator, name, deviceID, "PV13 Volt", "pv13-volt", "pv13Volt"),
-            FoxESSCurrent(coordinator, name, deviceID, "PV14 Current", "pv14-current", "pv14Current"),
-            FoxESSPower(coordinator, name, deviceID, "PV14 Power", "pv14-power", "pv14Power"),
-            FoxESSVolt(coordinator, name, deviceID, "PV14 Volt", "pv14-volt", "pv14Volt"),
-            FoxESSCurrent(coordinator, name, deviceID, "PV15 Current", "pv15-current", "pv15Current"),
-            FoxESSPower(coordinator, name, deviceID, "PV15 Power", "pv15-power", "pv15Power"),
-            FoxESSVolt(coordinator, name, deviceID, "PV15 Volt", "pv15-volt", "pv15Volt"),
-            FoxESSCurrent(coordinator, name, deviceID, "PV16 Current", "pv16-current", "pv16Current"),
-            FoxESSPower(coordinator, name, deviceID, "PV16 Power", "pv16-power", "pv16Power"),
-            FoxESSVolt(coordinator, name, deviceID, "PV16 Volt", "pv16-volt", "pv16Volt"),
-            FoxESSCurrent(coordinator, name, deviceID, "PV17 Current", "pv17-current", "pv17Current"),
-            FoxESSPower(coordinator, name, deviceID, "PV17 Power", "pv17-power", "pv17Power"),
-            FoxESSVolt(coordinator, name, deviceID, "PV17 Volt", "pv17-volt", "pv17Volt"),
-            FoxESSCurrent(coordinator, name, deviceID, "PV18 Current", "pv18-current", "pv18Current"),
-            FoxESSPower(coordinator, name, deviceID, "PV18 Power", "pv18-power", "pv18Power"),
-            FoxESSVolt(coordinator, name, deviceID, "PV18 Volt", "pv18-volt", "pv18Volt")
-        ])
-
-
-class GetAuth:
-
-    def get_signature(self, token, path, lang='en'):
-        """
-        This function is used to generate a signature consisting of URL, token, and timestamp, and return a dictionary containing the signature and other information.
-            :param token: your key
-            :param path:  your request path
-            :param lang: language, default is English.
-            :return: with authentication header
-        """
-        timestamp = round(time.time() * 1000)
-        signature = fr'{path}\r\n{token}\r\n{timestamp}'
-        # or use user_agent_rotator.get_random_user_agent() for user-agent
-        result = {
-            'token': token,
-            'lang': lang,
-            'timestamp': str(timestamp),
-            'Content-Type': 'application/json',
-            'signature': self.md5c(text=signature),
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
-                          'Chrome/117.0.0.0 Safari/537.36',
-            'Connection': 'close'
-        }
-
-        return result
-
-    @staticmethod
-    def md5c(text="", _type="lower"):
-        res = hashlib.md5(text.encode(encoding='UTF-8')).hexdigest()
-        if _type.__eq__("lower"):
-            return res
-        else:
-            return res.upper()
+    backfill = await async_get_backfill(hass)
+    backfill.add_inverter(deviceSN, deviceID, account)
 
 
-async def waitforAPI():
-    global last_api
-    # wait for openAPI, there is a minimum of 1 second allowed between OpenAPI query calls
-    # check if last_api call was less than a second ago and if so delay the balance of 1 second
-    now = time.time()
-    last = last_api
-    diff = now - last if last != 0 else 1
-    diff = round( (diff+0.2) ,2)
-    if diff < 1:
-        await asyncio.sleep(diff)
-        _LOGGER.debug(f"API enforced delay, wait: {diff}")
-    now = time.time()
-    last_api = now
-    return False
+async def async_get_reports(hass):
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if "reports" not in domain_data:
+        domain_data["reports"] = FoxESSReportStore(hass)
+    await domain_data["reports"].async_load()
+    return domain_data["reports"]
 
-async def getOADeviceDetail(hass, allData, deviceSN, apiKey):
 
-    await waitforAPI()
+async def async_get_backfill(hass):
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if "backfill" not in domain_data:
+        domain_data["backfill"] = FoxESSBackfill(hass)
 
-    path = "/op/v0/device/detail"
-    headerData = GetAuth().get_signature(token=apiKey, path=path)
+        async def async_handle_backfill(call):
+            # every inverter unless one is named, the end defaults to yesterday
+            start = call.data[ATTR_START]
+            end = call.data.get(ATTR_END, datetime.now().date() - timedelta(days=1))
+            serials = [call.data[CONF_DEVICESN]] if CONF_DEVICESN in call.data else domain_data["backfill"].inverters
+            for deviceSN in serials:
+                if deviceSN not in domain_data["backfill"].inverters:
+                    raise HomeAssistantError(f"No FoxESS inverter with SN:{deviceSN}")
+                try:
+                    domain_data["backfill"].start(deviceSN, start, end)
+                except ValueError as err:
+                    raise HomeAssistantError(str(err)) from err
 
-    path = _ENDPOINT_OA_DOMAIN + _ENDPOINT_OA_DEVICE_DETAIL
-    _LOGGER.debug("OADevice Detail fetch " + path + deviceSN)
-    timestamp = round(time.time() * 1000)
+        hass.services.async_register(DOMAIN, SERVICE_BACKFILL, async_handle_backfill, schema=BACKFILL_SCHEMA)
+    await domain_data["backfill"].async_load()
+    return domain_data["backfill"]
 
-    restOADeviceDetail = RestData(hass, METHOD_GET, path + deviceSN, DEFAULT_ENCODING,  None, headerData, None, None, DEFAULT_VERIFY_SSL, SSLCipherList.PYTHON_DEFAULT, DEFAULT_TIMEOUT)
-    await restOADeviceDetail.async_update()
 
-    if restOADeviceDetail.data is None or restOADeviceDetail.data == '':
-        _LOGGER.debug("Unable to get OA Device Detail from FoxESS Cloud")
-        return True
-    else:
-        response = json.loads(restOADeviceDetail.data)
-        if response["errno"] == 0 and response["msg"] == 'success' :
-            ResponseTime = round(time.time() * 1000) - timestamp
-            if ResponseTime > 0:
-                allData['raw']['ResponseTime'] = ResponseTime
-            else:
-                allData['raw']['ResponseTime'] = 0
-            _LOGGER.debug(f"OA Device Detail Good Response: {response['result']}")
-            result = response['result']
-            allData['addressbook'] = result
-            # manually poke this in as on the old cloud it was called plantname, need to keep in line with old entity name
-            plantName = result['stationName']
-            allData['addressbook']['plantName'] = plantName
-            testBattery = result['hasBattery']
-            if testBattery:
-                _LOGGER.debug(f"OA Device Detail System has Battery: {testBattery}")
-            else:
-                _LOGGER.debug(f"OA Device Detail System has No Battery: {testBattery}")
-            return False
-        else:
-            _LOGGER.error(f"OA Device Detail Bad Response: {response}")
-            return True
+async def async_get_cache(hass):
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if "cache" not in domain_data:
+        domain_data["cache"] = FoxESSCache(hass)
+    await domain_data["cache"].async_load()
+    return domain_data["cache"]
 
-async def getOABatterySettings(hass, allData, deviceSN, apiKey):
 
-    await waitforAPI() # check for api delay
+def get_capture(hass):
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if "capture" not in domain_data:
+        domain_data["capture"] = CaptureWriter(hass, hass.config.path(CAPTURE_FILE))
 
-    path = "/op/v0/device/battery/soc/get"
-    headerData = GetAuth().get_signature(token=apiKey, path=path)
+        async def async_flush_capture(event):
+            # the calls of the last moments before a stop are often the interesting ones
+            await domain_data["capture"].async_flush()
 
-    path = _ENDPOINT_OA_DOMAIN + _ENDPOINT_OA_BATTERY_SETTINGS
-    if "hasBattery" not in allData["addressbook"]:
-        hasBattery = False
-    else:
-        hasBattery = allData['addressbook']['hasBattery']
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, async_flush_capture)
+    return domain_data["capture"]
 
-    if hasBattery:
-        # only make this call if device detail reports battery fitted
-        _LOGGER.debug("OABattery Settings fetch " + path + deviceSN)
-        restOABatterySettings = RestData(hass, METHOD_GET, path + deviceSN, DEFAULT_ENCODING,  None, headerData, None, None, DEFAULT_VERIFY_SSL, SSLCipherList.PYTHON_DEFAULT, DEFAULT_TIMEOUT)
-        await restOABatterySettings.async_update()
 
-        if restOABatterySettings.data is None:
-            _LOGGER.debug("Unable to get OA Battery Settings from FoxESS Cloud")
-            return True
-        else:
-            response = json.loads(restOABatterySettings.data)
-            if response["errno"] == 0 and response["msg"] == 'success' :
-                _LOGGER.debug(f"OA Battery Settings Good Response: {response['result']}")
-                result = response['result']
-                minSoc = result['minSoc']
-                minSocOnGrid = result['minSocOnGrid']
-                allData["battery"]["minSoc"] = minSoc
-                allData["battery"]["minSocOnGrid"] = minSocOnGrid
-                _LOGGER.debug(f"OA Battery Settings read MinSoc: {minSoc}, MinSocOnGrid: {minSocOnGrid}")
-                return False
-            else:
-                _LOGGER.error(f"OA Battery Settings Bad Response: {response}")
-                return True
-    else:
-        # device detail reports no battery fitted so reset these variables to show unknown
-        allData["battery"]["minSoc"] = None
-        allData["battery"]["minSocOnGrid"] = None
-        return False
-
-
-async def getReport(hass, allData, apiKey, deviceSN, deviceID):
+def get_exporter(hass):
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if "exporter" not in domain_data:
+        domain_data["exporter"] = FoxESSExporter(hass)
+    return domain_data["exporter"]
 
-    await waitforAPI() # check for api delay
 
-    path = _ENDPOINT_OA_REPORT
-    headerData = GetAuth().get_signature(token=apiKey, path=path)
+def get_account(hass, apiKey, apiRate=None):
+    if "accounts" not in hass.data.setdefault(DOMAIN, {}):
 
-    path = _ENDPOINT_OA_DOMAIN + _ENDPOINT_OA_REPORT
-    _LOGGER.debug("OA Report fetch " + path )
+        async def async_handle_diagnostics(call):
+            return {"accounts": [account.diagnostics() for account in hass.data[DOMAIN]["accounts"].values()]}
 
-    now = datetime.now()
-    month = str(datetime.now().month)     # now.strftime("%-m")
-
-    reportData = '{"sn":"'+deviceSN+'","year":'+now.strftime("%Y")+',"month":'+month+',"dimension":"month","variables":["feedin","generation","gridConsumption","chargeEnergyToTal","dischargeEnergyToTal","loads"]}'
-
-    _LOGGER.debug("getReport OA request:" + reportData)
-
-    restOAReport = RestData(
-        hass,
-        METHOD_POST,
-        path,
-        DEFAULT_ENCODING,
-        None,
-        headerData,
-        None,
-        reportData,
-        DEFAULT_VERIFY_SSL,
-        SSLCipherList.PYTHON_DEFAULT,
-        DEFAULT_TIMEOUT
+        hass.services.async_register(
+            DOMAIN, SERVICE_DIAGNOSTICS, async_handle_diagnostics, supports_response=SupportsResponse.ONLY
+        )
+    accounts = hass.data[DOMAIN].setdefault("accounts", {})
+    if apiKey not in accounts:
+        accounts[apiKey] = FoxESSAccount(hass, apiKey, apiRate or DEFAULT_API_RATE)
+    elif apiRate is not None and apiRate < accounts[apiKey].limiter.rate:
+        # entries sharing a key with different rates, the slowest one wins
+        _LOGGER.debug(f"API rate for shared key lowered to {apiRate}")
+        accounts[apiKey].limiter.rate = apiRate
+    return accounts[apiKey]
+
+
+RUNNING_STATES = {
+    "160": "self-test",
+    "161": "waiting",
+    "162": "checking",
+    "163": "on-grid",
+    "164": "off-grid",
+    "165": "fault",
+    "166": "permanent-fault",
+    "167": "standby",
+    "168": "upgrading",
+    "169": "fct",
+    "170": "illegal",
+}
+
+
+def _running_state(values):
+    res = values[0]
+    if res not in RUNNING_STATES:
+        _LOGGER.debug(f"runcode {res}")
+    return f"{res}: {RUNNING_STATES.get(res, 'unknown code')}"
+
+
+def _positive_energy(values):
+    # what was returned (that some time was negative) is <0, so fix it
+    return round(values[0],3) if values[0] > 0 else 0
+
+
+def _balance(values):
+    # loads + charge + feedIn - gridConsumption - discharge, missing values count as 0
+    loads, charge, feedIn, gridConsumption, discharge = (float(value or 0) for value in values)
+    total = round(loads + charge + feedIn - gridConsumption - discharge, 3)
+    return total if total > 0 else 0
+
+
+@dataclass(frozen=True, kw_only=True)
+class FoxESSSensorEntityDescription(SensorEntityDescription):
+    """
+    Describes one FoxESS sensor, key is the unique id suffix (kept from the old per-type classes so
+    entity history carries over) and variables are the snapshot values the state is computed from.
+    """
+
+    group: str = GROUP_RAW
+    variables: tuple[str, ...] = ()
+    value_fn: Callable[[tuple], Any] = lambda values: values[0]
+    attributes_fn: Callable[[tuple], dict | None] | None = None
+    online_only: bool = True # show unknown while the inverter is off-line
+    battery_icon: bool = False
+    extended_pv: bool = False # only with the extendPV option
+
+
+def _raw(name, key, variable, device_class, unit, **kwargs):
+    return FoxESSSensorEntityDescription(
+        key=key, name=name, variables=(variable,), device_class=device_class,
+        native_unit_of_measurement=unit, state_class=SensorStateClass.MEASUREMENT, **kwargs,
     )
 
-    await restOAReport.async_update()
-
-    if restOAReport.data is None or restOAReport.data == '':
-        _LOGGER.debug("Unable to get OA Report from FoxESS Cloud")
-        return True
-    else:
-        # Openapi responded so process data
-        response = json.loads(restOAReport.data)
-        if response["errno"] == 0 and response["msg"] == 'success' :
-            _LOGGER.debug(f"OA Report Data fetched OK: {response} "+ restOAReport.data[:350])
-            result = json.loads(restOAReport.data)['result']
-            today = int(now.strftime("%d")) # need today as an integer to locate in the monthly report index
-            for item in result:
-                variableName = item['variable']
-                # Daily reports break down the data hour by month for each day
-                # so locate the current days index and use that as the sum
-                index = 1
-                cumulative_total = 0
-                for dataItem in item['values']:
-                    if today==index: # we're only interested in the total for today
-                        if dataItem != None:
-                            cumulative_total = dataItem
-                        else:
-                            _LOGGER.warn(f"Report month fetch, None received")
-                        break
-                    index+=1
-                    #cumulative_total += dataItem
-                allData['report'][variableName] = round(cumulative_total,3)
-                _LOGGER.debug(f"OA Report Variable: {variableName}, Total: {cumulative_total}")
-            return False
-        else:
-            _LOGGER.debug(f"OA Report Bad Response: {response} "+ restOAReport.data)
-            return True
-
-
-async def getReportDailyGeneration(hass, allData, apiKey, deviceSN, deviceID):
-
-    await waitforAPI() # check for api delay
-
-    now = datetime.now()
-    path = "/op/v0/device/generation"
-    headerData = GetAuth().get_signature(token=apiKey, path=path)
 
-    path = _ENDPOINT_OA_DOMAIN + _ENDPOINT_OA_DAILY_GENERATION
-    _LOGGER.debug("getReportDailyGeneration fetch " + path )
+def _power(name, key, variable, **kwargs):
+    return _raw(name, key, variable, SensorDeviceClass.POWER, UnitOfPower.KILO_WATT, **kwargs)
 
-    generationData = '{"sn":"'+deviceSN+'","dimension":"day"}'
 
-    _LOGGER.debug("getReportDailyGeneration OA request:" + generationData)
-
-    restOAgen = RestData(
-        hass,
-        METHOD_GET,
-        path + deviceSN,
-        DEFAULT_ENCODING,
-        None,
-        headerData,
-        None,
-        generationData,
-        DEFAULT_VERIFY_SSL,
-        SSLCipherList.PYTHON_DEFAULT,
-        DEFAULT_TIMEOUT
+def _temperature(name, key, variable):
+    return FoxESSSensorEntityDescription(
+        key=key, name=name, variables=(variable,),
+        device_class=SensorDeviceClass.TEMPERATURE, native_unit_of_measurement=UnitOfTemperature.CELSIUS,
     )
 
-    await restOAgen.async_update()
-
-    if restOAgen.data is None or restOAgen.data == '':
-        _LOGGER.debug("Unable to get OA Daily Generation Report from FoxESS Cloud")
-        return True
-    else:
-        response = json.loads(restOAgen.data)
-        if response["errno"] == 0 and response["msg"] == 'success' :
-            _LOGGER.debug("OA Daily Generation Report Data fetched OK Response:"+ restOAgen.data[:500])
-
-            parsed = json.loads(restOAgen.data)["result"]
-            if "today" not in parsed:
-                allData["reportDailyGeneration"]["value"] = 0
-                _LOGGER.debug(f"OA Daily Generation Report data, today has no value: {parsed} set to 0")
-            else:
-                allData["reportDailyGeneration"]["value"] = parsed['today']
-                _LOGGER.debug(f"OA Daily Generation Report data: todays value {parsed['today']} ")
-            if "month" not in parsed:
-                allData["reportDailyGeneration"]["month"] = 0
-                _LOGGER.debug(f"OA Daily Generation Report data, month has no value: {parsed} set to 0")
-            else:
-                allData["reportDailyGeneration"]["month"] = parsed['month']
-                _LOGGER.debug(f"OA Daily Generation Report data: month value {parsed['month']} ")
-            if "cumulative" not in parsed:
-                allData["reportDailyGeneration"]["cumulative"] = 0
-                _LOGGER.debug(f"OA Daily Generation Report data, cumulative has no value: {parsed} set to 0")
-            else:
-                allData["reportDailyGeneration"]["cumulative"] = parsed['cumulative']
-                _LOGGER.debug(f"OA Daily Generation Report data: cumulative value {parsed['cumulative']} ")
-            return False
-        else:
-            _LOGGER.debug(f"OA Daily Generation Report Bad Response: {response} "+ restOAgen.data)
-            return True
-
-
-async def getRaw(hass, allData, apiKey, deviceSN, deviceID):
-
-    await waitforAPI() # check for api delay
-
-    # "deviceSN" used for OpenAPI and it only fetches the real time data
-
-    if RestrictGetVar:
-        _LOGGER.debug("Getting Device Variable in restricted mode" )
-        rawData =  '{"sn":"'+deviceSN+'","variables":["ambientTemperation", \
-                                    "batChargePower","batCurrent","batCurrent_1","batCurrent_2","batDischargePower", \
-                                    "batTemperature","batTemperature_1","batTemperature_2","batVolt", "batVolt_1", "batVolt_2",\
-                                    "boostTemperation", "chargeTemperature", "dspTemperature", \
-                                    "epsCurrentR","epsCurrentS","epsCurrentT","epsPower","epsPowerR","epsPowerS","epsPowerT","epsVoltR","epsVoltS","epsVoltT", \
-                                    "feedinPower", "generationPower","gridConsumptionPower", \
-                                    "input","invBatCurrent","invBatPower","invBatVolt","invTemperation", \
-                                    "loadsPower","loadsPowerR","loadsPowerS","loadsPowerT", \
-                                    "meterPower","meterPower2","meterPowerR","meterPowerS","meterPowerT","PowerFactor", \
-                                    "pv1Current","pv1Power","pv1Volt","pv2Current","pv2Power","pv2Volt", \
-                                    "pv3Current","pv3Power","pv3Volt","pv4Current","pv4Power","pv4Volt","pvPower", \
-                                    "RCurrent","ReactivePower","RFreq","RPower","RVolt", \
-                                    "SCurrent","SFreq","SoC","SPower","SVolt", \
-                                    "TCurrent","TFreq","TPower","TVolt", "SoC_1","Soc_2", \
-                                    "ResidualEnergy","energyThroughput","runningState","currentFaultCount"] }'
-    else:
-        rawData =  '{"sn":"'+deviceSN+'" }'
-
-    _LOGGER.debug("getRaw OA request:" +rawData)
-
-    timestamp = round(time.time() * 1000)
-
-    path = _ENDPOINT_OA_DEVICE_VARIABLES
-    headerData = GetAuth().get_signature(token=apiKey, path=path)
 
-    path = _ENDPOINT_OA_DOMAIN + _ENDPOINT_OA_DEVICE_VARIABLES
-
-    restOADeviceVariables = RestData(
-        hass,
-        METHOD_POST,
-        path,
-        DEFAULT_ENCODING,
-        None,
-        headerData,
-        None,
-        rawData,
-        DEFAULT_VERIFY_SSL,
-        SSLCipherList.PYTHON_DEFAULT,
-        DEFAULT_TIMEOUT
+def _battery(name, key, variable, group=GROUP_RAW):
+    return FoxESSSensorEntityDescription(
+        key=key, name=name, group=group, variables=(variable,), battery_icon=True,
+        device_class=SensorDeviceClass.BATTERY, native_unit_of_measurement="%",
     )
 
-    await restOADeviceVariables.async_update()
-
-    if restOADeviceVariables.data is None or restOADeviceVariables.data == '':
-        _LOGGER.debug("Unable to get OA Variables from FoxESS Cloud")
-        return True
-    else:
-        # Openapi responded correctly
-        response = json.loads(restOADeviceVariables.data)
-        if response["errno"] == 0 and response["msg"] == 'success' :
-            ResponseTime = round(time.time() * 1000) - timestamp
-            if ResponseTime > 0:
-                allData['raw']['ResponseTime'] = ResponseTime
-            else:
-                allData['raw']['ResponseTime'] = 0
-
-            test = json.loads(restOADeviceVariables.data)['result']
-            result = test[0].get('datas')
-            _LOGGER.debug(f"OA Variables Good Response: {result}")
-            # allData['raw'] = {}
-            for item in result: # json.loads(result): # restOADeviceVariables.data)['result']:
-                variableName = item['variable']
-                # If value exists
-                if item.get('value') is not None:
-                    variableValue = item['value']
-                else:
-                    variableValue = 0
-                    _LOGGER.debug( f"Variable {variableName} no value, set to zero" )
-                # fix for second battery items
-                if variableName == 'SoC_1':
-                    variableName = 'SoC_1' # do nothing for the moment, future release might align this correctly to use SoC
-                elif variableName == 'batTemperature_1':
-                    variableName = 'batTemperature' # use same entity as for single battery systems
-                elif variableName == 'invBatPower_1':
-                    variableName = 'invBatPower' # use same entity as for single battery systems
-
-                allData['raw'][variableName] = variableValue
-                _LOGGER.debug( f"Var: {variableName}, SN: {deviceSN} set to {allData['raw'][variableName]}" )
-            return False
-        else:
-            _LOGGER.debug(f"OA Device Variables Bad Response: {response}")
-            return True
-
-class FoxESSPowerString(CoordinatorEntity, SensorEntity):
-    _attr_state_class: SensorStateClass = SensorStateClass.MEASUREMENT
-    _attr_device_class = SensorDeviceClass.POWER
-    _attr_native_unit_of_measurement = UnitOfPower.KILO_WATT
-
-    def __init__(self, coordinator, name, deviceID, nameValue, uniqueValue, keyValue):
-        super().__init__(coordinator=coordinator)
-        self._nameValue = nameValue
-        self._uniqueValue = uniqueValue
-        self._keyValue = keyValue
-        _LOGGER.debug(f"Initiating Entity - {self._nameValue}")
-        self._attr_name = f"{name} - {self._nameValue}"
-        self._attr_unique_id = f"{deviceID}{self._uniqueValue}"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
-
-    @property
-    def native_value(self) -> str | None:
-        if self.coordinator.data["online"] and self.coordinator.data["raw"]:
-            if self._keyValue not in self.coordinator.data["raw"]:
-                _LOGGER.debug(f"{self._keyValue} None")
-            else:
-                return self.coordinator.data["raw"][self._keyValue]
-        return None
-
-class FoxESSCurrent(CoordinatorEntity, SensorEntity):
-
-    _attr_state_class: SensorStateClass = SensorStateClass.MEASUREMENT
-    _attr_device_class = SensorDeviceClass.CURRENT
-    _attr_native_unit_of_measurement = UnitOfElectricCurrent.AMPERE
-
-    def __init__(self, coordinator, name, deviceID, nameValue, uniqueValue, keyValue):
-        super().__init__(coordinator=coordinator)
-        self._nameValue = nameValue
-        self._uniqueValue = uniqueValue
-        self._keyValue = keyValue
-        _LOGGER.debug(f"Initiating Entity - {self._nameValue}")
-        self._attr_name = f"{name} - {self._nameValue}"
-        self._attr_unique_id = f"{deviceID}{self._uniqueValue}"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
-
-    @property
-    def native_value(self) -> float | None:
-        if self.coordinator.data["online"] and self.coordinator.data["raw"]:
-            if self._keyValue not in self.coordinator.data["raw"]:
-                _LOGGER.debug(f"{self._keyValue} None")
-            else:
-                return self.coordinator.data["raw"][self._keyValue]
-        return None
-
 
-class FoxESSFreq(CoordinatorEntity, SensorEntity):
-
-    _attr_state_class: SensorStateClass = SensorStateClass.MEASUREMENT
-    _attr_device_class = SensorDeviceClass.FREQUENCY
-    _attr_native_unit_of_measurement = UnitOfFrequency.HERTZ
-
-    def __init__(self, coordinator, name, deviceID, nameValue, uniqueValue, keyValue):
-        super().__init__(coordinator=coordinator)
-        self._nameValue = nameValue
-        self._uniqueValue = uniqueValue
-        self._keyValue = keyValue
-        _LOGGER.debug(f"Initiating Entity - {self._nameValue}")
-        self._attr_name = f"{name} - {self._nameValue}"
-        self._attr_unique_id = f"{deviceID}{self._uniqueValue}"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
-
-    @property
-    def native_value(self) -> float | None:
-        if self.coordinator.data["online"] and self.coordinator.data["raw"]:
-            if self._keyValue not in self.coordinator.data["raw"]:
-                _LOGGER.debug(f"{self._keyValue} None")
-            else:
-                return self.coordinator.data["raw"][self._keyValue]
-        return None
-
-
-class FoxESSPower(CoordinatorEntity, SensorEntity):
-
-    _attr_state_class: SensorStateClass = SensorStateClass.MEASUREMENT
-    _attr_device_class = SensorDeviceClass.POWER
-    _attr_native_unit_of_measurement = UnitOfPower.KILO_WATT
-
-    def __init__(self, coordinator, name, deviceID, nameValue, uniqueValue, keyValue):
-        super().__init__(coordinator=coordinator)
-        self._nameValue = nameValue
-        self._uniqueValue = uniqueValue
-        self._keyValue = keyValue
-        _LOGGER.debug(f"Initiating Entity - {self._nameValue}")
-        self._attr_name = f"{name} - {self._nameValue}"
-        self._attr_unique_id = f"{deviceID}{self._uniqueValue}"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
-
-    @property
-    def native_value(self) -> float | None:
-        if self.coordinator.data["online"] and self.coordinator.data["raw"]:
-            if self._keyValue not in self.coordinator.data["raw"]:
-                _LOGGER.debug(f"{self._keyValue} None")
-            else:
-                return self.coordinator.data["raw"][self._keyValue]
-        return None
-
-
-class FoxESSVolt(CoordinatorEntity, SensorEntity):
-
-    _attr_state_class: SensorStateClass = SensorStateClass.MEASUREMENT
-    _attr_device_class = SensorDeviceClass.VOLTAGE
-    _attr_native_unit_of_measurement = UnitOfElectricPotential.VOLT
-
-    def __init__(self, coordinator, name, deviceID, nameValue, uniqueValue, keyValue):
-        super().__init__(coordinator=coordinator)
-        self._nameValue = nameValue
-        self._uniqueValue = uniqueValue
-        self._keyValue = keyValue
-        _LOGGER.debug(f"Initiating Entity - {self._nameValue}")
-        self._attr_name = f"{name} - {self._nameValue}"
-        self._attr_unique_id = f"{deviceID}{self._uniqueValue}"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
-
-    @property
-    def native_value(self) -> float | None:
-        if self.coordinator.data["online"] and self.coordinator.data["raw"]:
-            if self._keyValue not in self.coordinator.data["raw"]:
-                _LOGGER.debug(f"{self._keyValue} None")
-            else:
-                return self.coordinator.data["raw"][self._keyValue]
-        return None
-
-
-class FoxESSReactivePower(CoordinatorEntity, SensorEntity):
-
-    _attr_state_class: SensorStateClass = SensorStateClass.MEASUREMENT
-    _attr_device_class = SensorDeviceClass.REACTIVE_POWER
-    _attr_native_unit_of_measurement = UnitOfReactivePower.VOLT_AMPERE_REACTIVE
-
-    def __init__(self, coordinator, name, deviceID):
-        super().__init__(coordinator=coordinator)
-        _LOGGER.debug("Initiating Entity - Reactive Power")
-        self._attr_name = name+" - Reactive Power"
-        self._attr_unique_id = deviceID+"reactive-power"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
-
-    @property
-    def native_value(self) -> float | None:
-        if self.coordinator.data["online"] and self.coordinator.data["raw"]:
-            if "ReactivePower" not in self.coordinator.data["raw"]:
-                _LOGGER.debug("ReactivePower None")
-            else:
-                return self.coordinator.data["raw"]["ReactivePower"] * 1000
-        return None
-
-
-class FoxESSPowerFactor(CoordinatorEntity, SensorEntity):
-
-    _attr_state_class: SensorStateClass = SensorStateClass.MEASUREMENT
-    _attr_device_class = SensorDeviceClass.POWER_FACTOR
-    _attr_native_unit_of_measurement = PERCENTAGE
-
-    def __init__(self, coordinator, name, deviceID):
-        super().__init__(coordinator=coordinator)
-        _LOGGER.debug("Initiating Entity - Power Factor")
-        self._attr_name = name+" - Power Factor"
-        self._attr_unique_id = deviceID+"power-factor"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
-
-    @property
-    def native_value(self) -> float | None:
-        if self.coordinator.data["online"] and self.coordinator.data["raw"]:
-            if "PowerFactor" not in self.coordinator.data["raw"]:
-                _LOGGER.debug("PowerFactor None")
-            else:
-                return self.coordinator.data["raw"]["PowerFactor"]
-        return None
-
-class FoxESSEnergyGenerated(CoordinatorEntity, SensorEntity):
-
-    _attr_state_class: SensorStateClass = SensorStateClass.TOTAL_INCREASING
-    _attr_device_class = SensorDeviceClass.ENERGY
-    _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
-
-    def __init__(self, coordinator, name, deviceID, nameValue, uniqueValue, keyValue):
-        super().__init__(coordinator=coordinator)
-        self._nameValue = nameValue
-        self._uniqueValue = uniqueValue
-        self._keyValue = keyValue
-        _LOGGER.debug(f"Initiating Entity - {self._nameValue}")
-        self._attr_name = f"{name} - {self._nameValue}"
-        self._attr_unique_id = f"{deviceID}{self._uniqueValue}"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
-
-    @property
-    def native_value(self) -> float | None:
-        if self._keyValue not in self.coordinator.data["reportDailyGeneration"]:
-            _LOGGER.debug(f"{self._keyValue} None")
-        else:
-            if self.coordinator.data["reportDailyGeneration"][self._keyValue] == 0:
-                energygenerated = 0
-            else:
-                energygenerated = self.coordinator.data["reportDailyGeneration"][self._keyValue]
-                if energygenerated > 0:
-                    energygenerated = round(energygenerated,3)
-                else:
-                    energygenerated = 0
-            return energygenerated
-        return None
-
-class FoxESSEnergyThroughput(CoordinatorEntity, SensorEntity):
-
-    _attr_state_class: SensorStateClass = SensorStateClass.TOTAL_INCREASING
-    _attr_device_class = SensorDeviceClass.ENERGY
-    _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
-
-    def __init__(self, coordinator, name, deviceID):
-        super().__init__(coordinator=coordinator)
-        _LOGGER.debug("Initiating Entity - Energy Throughput")
-        self._attr_name = name+" - Energy Throughput"
-        self._attr_unique_id = deviceID+"energy-throughput"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
+def _energy(name, key, variable, group=GROUP_REPORT, value_fn=lambda values: values[0]):
+    return FoxESSSensorEntityDescription(
+        key=key, name=name, group=group, variables=(variable,), value_fn=value_fn, online_only=False,
+        device_class=SensorDeviceClass.ENERGY, native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    )
 
-    @property
-    def native_value(self) -> str | None:
-        if "energyThroughput" not in self.coordinator.data["raw"]:
-            _LOGGER.debug("raw Energy Throughput None")
-        else:
-            if self.coordinator.data["raw"]["energyThroughput"] == 0:
-                energygenerated = 0
-            else:
-                energygenerated = self.coordinator.data["raw"]["energyThroughput"]
-                if energygenerated > 0:
-                    energygenerated = round(energygenerated,3)
-                else:
-                    energygenerated = 0
-            return energygenerated
-        return None
 
+def _live_energy(name, key, variable):
+    return FoxESSSensorEntityDescription(
+        key=key, name=name, group=GROUP_LIVE, variables=(variable, f"{variable}Drift"), online_only=False,
+        attributes_fn=lambda values: {"drift": values[1]},
+        device_class=SensorDeviceClass.ENERGY, native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    )
 
-class FoxESSEnergyGridConsumption(CoordinatorEntity, SensorEntity):
 
-    _attr_state_class: SensorStateClass = SensorStateClass.TOTAL_INCREASING
-    _attr_device_class = SensorDeviceClass.ENERGY
-    _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
+def _pv_string(pv):
+    return (
+        _raw(f"PV{pv} Current", f"pv{pv}-current", f"pv{pv}Current", SensorDeviceClass.CURRENT, UnitOfElectricCurrent.AMPERE, extended_pv=pv > 6),
+        _power(f"PV{pv} Power", f"pv{pv}-power", f"pv{pv}Power", extended_pv=pv > 6),
+        _raw(f"PV{pv} Volt", f"pv{pv}-volt", f"pv{pv}Volt", SensorDeviceClass.VOLTAGE, UnitOfElectricPotential.VOLT, extended_pv=pv > 6),
+    )
 
-    def __init__(self, coordinator, name, deviceID):
-        super().__init__(coordinator=coordinator)
-        _LOGGER.debug("Initiating Entity - Grid Consumption")
-        self._attr_name = name+" - Grid Consumption"
-        self._attr_unique_id = deviceID+"grid-consumption"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
 
-    @property
-    def native_value(self) -> str | None:
-        if "gridConsumption" not in self.coordinator.data["report"]:
-            _LOGGER.debug("report gridConsumption None")
-        else:
-            if self.coordinator.data["report"]["gridConsumption"] == 0:
-                energygrid = 0
-            else:
-                energygrid = self.coordinator.data["report"]["gridConsumption"]
-            return energygrid
-        return None
+def _phase(phase):
+    return (
+        _raw(f"{phase} Current", f"{phase.lower()}-current", f"{phase}Current", SensorDeviceClass.CURRENT, UnitOfElectricCurrent.AMPERE),
+        _raw(f"{phase} Freq", f"{phase.lower()}-freq", f"{phase}Freq", SensorDeviceClass.FREQUENCY, UnitOfFrequency.HERTZ),
+        _power(f"{phase} Power", f"{phase.lower()}-power", f"{phase}Power"),
+        _raw(f"{phase} Volt", f"{phase.lower()}-volt", f"{phase}Volt", SensorDeviceClass.VOLTAGE, UnitOfElectricPotential.VOLT),
+    )
 
 
-class FoxESSEnergyFeedin(CoordinatorEntity, SensorEntity):
+SENSOR_DESCRIPTIONS: tuple[FoxESSSensorEntityDescription, ...] = (
+    *(description for pv in range(1, 19) for description in _pv_string(pv)),
+    _power("PV Power", "pv-power", "pvPower"),
+    *_phase("R"),
+    *_phase("S"),
+    *_phase("T"),
+    _power("Meter2 Power", "meter2-power", "meterPower2"),
+    _power("Generation Power", "-generation-power", "generationPower"),
+    _power("Grid Consumption Power", "grid-consumption-power", "gridConsumptionPower"),
+    _power("FeedIn Power", "feedIn-power", "feedinPower"),
+    _power("Bat Discharge Power", "bat-discharge-power", "batDischargePower"),
+    _power("Bat Charge Power", "bat-charge-power", "batChargePower"),
+    _power("Load Power", "load-power", "loadsPower"),
+    _power("Inverter Bat Power", "inv-Bat-Power", "invBatPower"),
+    _power("Inverter Bat Power2", "inv-Bat-Power2", "invBatPower_2"),
+    _raw("Reactive Power", "reactive-power", "ReactivePower", SensorDeviceClass.REACTIVE_POWER,
+         UnitOfReactivePower.VOLT_AMPERE_REACTIVE, value_fn=lambda values: values[0] * 1000),
+    _raw("Power Factor", "power-factor", "PowerFactor", SensorDeviceClass.POWER_FACTOR, PERCENTAGE),
+    FoxESSSensorEntityDescription(
+        key="solar-power", name="Solar Power", online_only=False,
+        variables=("loadsPower", "batChargePower", "feedinPower", "gridConsumptionPower", "batDischargePower"),
+        value_fn=_balance, device_class=SensorDeviceClass.POWER, native_unit_of_measurement=UnitOfPower.KILO_WATT,
+        state_class=SensorStateClass.MEASUREMENT,
+    ),
+    _temperature("Bat Temperature", "bat-temperature", "batTemperature"),
+    _temperature("Bat Temperature2", "bat-temperature2", "batTemperature_2"),
+    _temperature("Ambient Temperature", "ambient-temperature", "ambientTemperation"),
+    _temperature("Boost Temperature", "boost-temperature", "boostTemperation"),
+    _temperature("Inv Temperature", "inv-temperature", "invTemperation"),
+    _battery("Bat SoC", "bat-soc", "SoC"),
+    _battery("Bat SoC1", "bat-soc1", "SoC_1"),
+    _battery("Bat SoC2", "bat-soc2", "SoC_2"),
+    _battery("Bat MinSoC", "bat-minsoc", "minSoc", group=GROUP_BATTERY),
+    _battery("Bat minSocOnGrid", "bat-minSocOnGrid", "minSocOnGrid", group=GROUP_BATTERY),
+    # rolling statistics of the real time samples, no extra calls
+    _power("PV Power Peak Today", "pv-power-peak-today", "pvPowerMaxToday", group=GROUP_STATS, online_only=False),
+    _power("Load Power Mean 1h", "load-power-mean-1h", "loadsPowerMean1h", group=GROUP_STATS, online_only=False),
+    FoxESSSensorEntityDescription(
+        key="bat-soc-min-24h", name="Bat SoC Min 24h", group=GROUP_STATS, variables=("SoCMin24h",),
+        online_only=False, battery_icon=True, device_class=SensorDeviceClass.BATTERY, native_unit_of_measurement="%",
+    ),
+    FoxESSSensorEntityDescription(
+        key="residual-energy", name="Residual Energy", variables=("ResidualEnergy",),
+        value_fn=lambda values: values[0] / 100 if values[0] > 0 else 0,
+        device_class=SensorDeviceClass.ENERGY, native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+    ),
+    _energy("Energy Throughput", "energy-throughput", "energyThroughput", group=GROUP_RAW, value_fn=_positive_energy),
+    _energy("Energy Generated", "energy-generated", "value", group=GROUP_GENERATION, value_fn=_positive_energy),
+    _energy("Energy Generated Month", "energy-generated-month", "month", group=GROUP_GENERATION, value_fn=_positive_energy),
+    _energy("Energy Generated Cumulative", "energy-generated-cumulative", "cumulative", group=GROUP_GENERATION, value_fn=_positive_energy),
+    # today's totals, the last report plus the power integrated since
+    _live_energy("Grid Consumption", "grid-consumption", "gridConsumption"),
+    _live_energy("FeedIn", "feedIn", "feedin"),
+    _live_energy("Bat Charge", "bat-charge", "chargeEnergyToTal"),
+    _live_energy("Bat Discharge", "bat-discharge", "dischargeEnergyToTal"),
+    _live_energy("Load", "load", "loads"),
+    # month and year to date, worked out from the report store so they cost no extra calls
+    _energy("Grid Consumption Month", "grid-consumption-month", "gridConsumption", group=GROUP_REPORT_MONTH),
+    _energy("Grid Consumption Year", "grid-consumption-year", "gridConsumption", group=GROUP_REPORT_YEAR),
+    _energy("FeedIn Month", "feedIn-month", "feedin", group=GROUP_REPORT_MONTH),
+    _energy("FeedIn Year", "feedIn-year", "feedin", group=GROUP_REPORT_YEAR),
+    _energy("Bat Charge Month", "bat-charge-month", "chargeEnergyToTal", group=GROUP_REPORT_MONTH),
+    _energy("Bat Charge Year", "bat-charge-year", "chargeEnergyToTal", group=GROUP_REPORT_YEAR),
+    _energy("Bat Discharge Month", "bat-discharge-month", "dischargeEnergyToTal", group=GROUP_REPORT_MONTH),
+    _energy("Bat Discharge Year", "bat-discharge-year", "dischargeEnergyToTal", group=GROUP_REPORT_YEAR),
+    _energy("Load Month", "load-month", "loads", group=GROUP_REPORT_MONTH),
+    _energy("Load Year", "load-year", "loads", group=GROUP_REPORT_YEAR),
+    _energy("Energy Generated Year", "energy-generated-year", "generation", group=GROUP_REPORT_YEAR),
+    FoxESSSensorEntityDescription(
+        key="solar", name="Solar", group=GROUP_LIVE, online_only=False,
+        variables=("loads", "chargeEnergyToTal", "feedin", "gridConsumption", "dischargeEnergyToTal"),
+        value_fn=_balance, device_class=SensorDeviceClass.ENERGY, native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    FoxESSSensorEntityDescription(
+        key="running-state", name="Running State", variables=("runningState",), value_fn=_running_state,
+        icon="mdi:state-machine",
+    ),
+    FoxESSSensorEntityDescription(
+        key="response-time", name="Response Time", variables=("ResponseTime",), online_only=False,
+        native_unit_of_measurement="mS",
+    ),
+    FoxESSSensorEntityDescription(
+        key="api-projected-calls", name="API Projected Calls", group=GROUP_SCHEDULER, online_only=False,
+        variables=("projectedCalls", "callsToday"), icon="mdi:api", native_unit_of_measurement="calls/d",
+        attributes_fn=lambda values: None if values[1] is None else {"calls_today": values[1]},
+    ),
+)
 
-    _attr_state_class: SensorStateClass = SensorStateClass.TOTAL_INCREASING
-    _attr_device_class = SensorDeviceClass.ENERGY
-    _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
 
-    def __init__(self, coordinator, name, deviceID):
-        super().__init__(coordinator=coordinator)
-        _LOGGER.debug("Initiating Entity - FeedIn")
-        self._attr_name = name+" - FeedIn"
-        self._attr_unique_id = deviceID+"feedIn"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
+class FoxESSSensorManager:
+    """
+    Adds a FoxESSSensor for each description the first time the inverter returns one of its variables,
+    so variables the model doesn't have never become permanently unknown entities. Registered entities
+    that had a value before the restart are added straight away, they show it until the data comes in.
+    """
+
+    def __init__(self, coordinator, name, deviceID, async_add_entities, extendedPV=False, planner=None, registry=None):
+        self._coordinator = coordinator
+        self._name = name
+        self._deviceID = deviceID
+        self._planner = planner
+        self._async_add_entities = async_add_entities
+        layout = coordinator.data.layout
+        self._waiting = [
+            (description, tuple(layout.slot(description.group, variable) for variable in description.variables))
+            for description in SENSOR_DESCRIPTIONS
+            if extendedPV or not description.extended_pv
+        ]
+        self._registered = set()
+        if registry is not None:
+            # only those that had a value before the restart, the never valued ones from before sensors
+            # were added on first data wait for their variables like any other
+            lastStates = restore_state.async_get(coordinator.hass).last_states
+            for description, _ in self._waiting:
+                entityID = registry.async_get_entity_id("sensor", DOMAIN, f"{deviceID}{description.key}")
+                stored = lastStates.get(entityID) if entityID is not None else None
+                if stored is not None and stored.state.state not in (STATE_UNKNOWN, STATE_UNAVAILABLE):
+                    self._registered.add(description.key)
+
+    @callback
+    def async_add_new_entities(self) -> None:
+        data = self._coordinator.data
+        if not self._waiting or data is None:
+            return
+        new, waiting = [], []
+        for description, slots in self._waiting:
+            if description.key in self._registered or any(data.get(slot) is not None for slot in slots):
+                new.append(FoxESSSensor(self._coordinator, self._name, self._deviceID, description, slots, self._planner))
+            else:
+                waiting.append((description, slots))
+        self._waiting = waiting
+        self._registered = set()
+        if new:
+            _LOGGER.debug(f"Adding {len(new)} entities for {self._name}, {len(waiting)} variables not seen yet")
+            self._async_add_entities(new)
+
+
+class FoxESSRestoreSensor(RestoreSensor):
+    """
+    Shows the value it had before a restart, marked stale with the time it was last updated, until
+    it has a fresh one. Automations see a value straight away instead of unknown.
+    """
+
+    _restored = None # (native value, when it was last updated)
+    _updated = False # new data has arrived since start up
+
+    def _fresh(self) -> bool:
+        return self._updated
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        if self._fresh():
+            return
+        lastData = await self.async_get_last_sensor_data()
+        lastState = await self.async_get_last_state()
+        if lastData is not None and lastData.native_value is not None and lastState is not None:
+            self._restored = (lastData.native_value, lastState.last_updated)
+
+    @callback
+    def _data_arrived(self) -> None:
+        self._updated = True
+        if self._restored is not None and self._fresh():
+            self._restored = None
+
+    def _restored_attributes(self, attributes):
+        if self._restored is None:
+            return attributes
+        return {**(attributes or {}), ATTR_STALE: True, ATTR_RESTORED: self._restored[1].isoformat()}
+
+
+class FoxESSRestoreEntity(CoordinatorEntity, FoxESSRestoreSensor):
+    """A FoxESSRestoreSensor whose fresh data comes from the inverter's coordinator."""
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        self._data_arrived()
+        super()._handle_coordinator_update()
+
+
+class FoxESSSensor(FoxESSRestoreEntity):
+    """Any FoxESS sensor whose state is computed from snapshot values, what it shows comes from its description."""
+
+    entity_description: FoxESSSensorEntityDescription
+
+    def __init__(self, coordinator, name, deviceID, description, slots, planner=None):
+        # only woken by the coordinator when one of its slots, or the online / stale status, changes
+        super().__init__(coordinator=coordinator, context=set(slots) | {STATUS_SLOT})
+        _LOGGER.debug(f"Initiating Entity - {description.name}")
+        self.entity_description = description
+        self._attr_name = f"{name} - {description.name}"
+        self._attr_unique_id = f"{deviceID}{description.key}"
+        self._slots = slots
+        self._planner = planner if description.group == GROUP_RAW else None
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        if self._planner is not None:
+            # only entities enabled in the registry get here, their variables are what the cloud is asked for
+            self._planner.want(self.entity_description.key, self.entity_description.variables)
+
+    async def async_will_remove_from_hass(self) -> None:
+        if self._planner is not None:
+            self._planner.unwant(self.entity_description.key)
+        await super().async_will_remove_from_hass()
+
+    def _values(self) -> tuple | None:
+        data = self.coordinator.data
+        if self.entity_description.online_only and not data.online:
+            return None
+        values = tuple(data.get(slot) for slot in self._slots)
+        if all(value is None for value in values):
+            return None
+        return values
+
+    def _fresh(self) -> bool:
+        return self._values() is not None
 
     @property
-    def native_value(self) -> str | None:
-        if "feedin" not in self.coordinator.data["report"]:
-            _LOGGER.debug("report feedin None")
-        else:
-            if self.coordinator.data["report"]["feedin"] == 0:
-                energyfeedin = 0
-            else:
-                energyfeedin = self.coordinator.data["report"]["feedin"]
-            return energyfeedin
-        return None
-
-
-class FoxESSEnergyBatCharge(CoordinatorEntity, SensorEntity):
-
-    _attr_state_class: SensorStateClass = SensorStateClass.TOTAL_INCREASING
-    _attr_device_class = SensorDeviceClass.ENERGY
-    _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
-
-    def __init__(self, coordinator, name, deviceID):
-        super().__init__(coordinator=coordinator)
-        _LOGGER.debug("Initiating Entity - Bat Charge")
-        self._attr_name = name+" - Bat Charge"
-        self._attr_unique_id = deviceID+"bat-charge"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
+    def native_value(self):
+        values = self._values()
+        if values is None:
+            return None if self._restored is None else self._restored[0]
+        return self.entity_description.value_fn(values)
 
     @property
-    def native_value(self) -> str | None:
-        if "chargeEnergyToTal" not in self.coordinator.data["report"]:
-            _LOGGER.debug("report chargeEnergyToTal None")
-        else:
-            if self.coordinator.data["report"]["chargeEnergyToTal"] == 0:
-                energycharge = 0
-            else:
-                energycharge = self.coordinator.data["report"]["chargeEnergyToTal"]
-            return energycharge
-        return None
-
-
-class FoxESSEnergyBatDischarge(CoordinatorEntity, SensorEntity):
-
-    _attr_state_class: SensorStateClass = SensorStateClass.TOTAL_INCREASING
-    _attr_device_class = SensorDeviceClass.ENERGY
-    _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
-
-    def __init__(self, coordinator, name, deviceID):
-        super().__init__(coordinator=coordinator)
-        _LOGGER.debug("Initiating Entity - Bat Discharge")
-        self._attr_name = name+" - Bat Discharge"
-        self._attr_unique_id = deviceID+"bat-discharge"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
-
-    @property
-    def native_value(self) -> str | None:
-        if "dischargeEnergyToTal" not in self.coordinator.data["report"]:
-            _LOGGER.debug("report dischargeEnergyToTal None")
-        else:
-            if self.coordinator.data["report"]["dischargeEnergyToTal"] == 0:
-                energydischarge = 0
-            else:
-                energydischarge = self.coordinator.data["report"]["dischargeEnergyToTal"]
-            return energydischarge
-        return None
-
-
-class FoxESSEnergyLoad(CoordinatorEntity, SensorEntity):
-
-    _attr_state_class: SensorStateClass = SensorStateClass.TOTAL_INCREASING
-    _attr_device_class = SensorDeviceClass.ENERGY
-    _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
-
-    def __init__(self, coordinator, name, deviceID):
-        super().__init__(coordinator=coordinator)
-        _LOGGER.debug("Initiating Entity - Load")
-        self._attr_name = name+" - Load"
-        self._attr_unique_id = deviceID+"load"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
+    def extra_state_attributes(self):
+        attributes = None
+        if self.entity_description.attributes_fn is not None:
+            values = self._values()
+            if values is not None:
+                attributes = self.entity_description.attributes_fn(values)
+        if self.coordinator.data.stale:
+            # the last good values while the cloud can't be asked
+            attributes = {**(attributes or {}), ATTR_STALE: True}
+        return self._restored_attributes(attributes)
 
     @property
-    def native_value(self) -> str | None:
-        if "loads" not in self.coordinator.data["report"]:
-            _LOGGER.debug("report loads None")
-        else:
-            if self.coordinator.data["report"]["loads"] == 0:
-                energyload = 0
-            else:
-                energyload = self.coordinator.data["report"]["loads"]
-            #round
-            return round(energyload,3)
-        return None
+    def icon(self):
+        if self.entity_description.battery_icon:
+            return icon_for_battery_level(battery_level=self.native_value, charging=None)
+        return super().icon
 
 
-class FoxESSInverter(CoordinatorEntity, SensorEntity):
+class FoxESSInverter(FoxESSRestoreEntity):
 
-    def __init__(self, coordinator, name, deviceID):
-        super().__init__(coordinator=coordinator)
+    def __init__(self, coordinator, name, deviceID, poller=None):
+        self._syncSlot = coordinator.data.layout.slot(GROUP_SCHEDULER, "lastCloudSync")
+        super().__init__(coordinator=coordinator, context={STATUS_SLOT, self._syncSlot})
         _LOGGER.debug("Initiating Entity - Inverter")
         self._attr_name = name+" - Inverter"
         self._attr_unique_id = deviceID+"Inverter"
         self._attr_icon = "mdi:solar-power"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-                ATTR_DEVICE_SN,
-                ATTR_PLANTNAME,
-                ATTR_MODULESN,
-                ATTR_DEVICE_TYPE,
-                ATTR_STATUS,
-                ATTR_COUNTRY,
-                ATTR_COUNTRYCODE,
-                ATTR_CITY,
-                ATTR_ADDRESS,
-                ATTR_FEEDINDATE,
-                ATTR_LASTCLOUDSYNC
-            ],
-        )
+        self._poller = poller
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        lastSync = None
+        if self._restored is not None and self._poller is not None:
+            lastState = await self.async_get_last_state()
+            lastSync = lastState.attributes.get(ATTR_LASTCLOUDSYNC)
+        if lastSync is not None:
+            # the real time query was made just before the restart, its schedule carries on from then and
+            # the coordinator's first tick does what is due, so a restart loop doesn't repeat the calls
+            self._poller.restore_sync(datetime.fromisoformat(str(lastSync)))
+        else:
+            # first fetch runs in the background so a slow cloud doesn't hold up HA's startup, if it fails
+            # the coordinator simply tries again on its next tick
+            self.hass.async_create_background_task(
+                self.coordinator.async_refresh(), f"{DOMAIN} {self._attr_unique_id} first refresh"
+            )
+
+    async def async_will_remove_from_hass(self) -> None:
+        if self._poller is not None:
+            # the platform is going away, nothing the poller holds is left behind
+            await self._poller.async_shutdown()
+        await super().async_will_remove_from_hass()
 
     @property
     def native_value(self) -> str | None:
-        if self.coordinator.data["online"] or (self.coordinator.data["online"]==False and int(self.coordinator.data["addressbook"]["status"]) == 3 ):
-            if "status" not in self.coordinator.data["addressbook"]:
-                _LOGGER.debug("addressbook status None")
-            else:
-                if int(self.coordinator.data["addressbook"]["status"]) == 1:
-                    return "on-line"
-                else:
-                    if int(self.coordinator.data["addressbook"]["status"]) == 2:
-                        return "in-alarm"
-                    else:
-                        return "off-line"
+        if self._restored is not None:
+            return self._restored[0]
+        addressbook = self.coordinator.data.addressbook
+        if "status" not in addressbook:
+            _LOGGER.debug("addressbook status None")
+            return None
+        status = int(addressbook["status"])
+        if self.coordinator.data.online or status == 3:
+            if status == 1:
+                return "on-line"
+            if status == 2:
+                return "in-alarm"
+            return "off-line"
         return None
 
     @property
     def extra_state_attributes(self):
-        if self.coordinator.data["online"]:
-            if "status" not in self.coordinator.data["addressbook"]:
+        if self._restored is not None:
+            return self._restored_attributes(None)
+        if self.coordinator.data.online:
+            addressbook = self.coordinator.data.addressbook
+            if "status" not in addressbook:
                 _LOGGER.debug("addressbook status attributes None")
             else:
                 return {
-                    ATTR_DEVICE_SN: self.coordinator.data["addressbook"][ATTR_DEVICE_SN],
-                    ATTR_PLANTNAME: self.coordinator.data["addressbook"][ATTR_PLANTNAME],
-                    ATTR_MODULESN: self.coordinator.data["addressbook"][ATTR_MODULESN],
-                    ATTR_DEVICE_TYPE: self.coordinator.data["addressbook"][ATTR_DEVICE_TYPE],
+                    ATTR_DEVICE_SN: addressbook[ATTR_DEVICE_SN],
+                    ATTR_PLANTNAME: addressbook[ATTR_PLANTNAME],
+                    ATTR_MODULESN: addressbook[ATTR_MODULESN],
+                    ATTR_DEVICE_TYPE: addressbook[ATTR_DEVICE_TYPE],
                     #ATTR_COUNTRY: self.coordinator.data["addressbook"]["result"][ATTR_COUNTRY],
                     #ATTR_COUNTRYCODE: self.coordinator.data["addressbook"]["result"][ATTR_COUNTRYCODE],
                     #ATTR_CITY: self.coordinator.data["addressbook"]["result"][ATTR_CITY],
                     #ATTR_ADDRESS: self.coordinator.data["addressbook"]["result"][ATTR_ADDRESS],
                     #ATTR_FEEDINDATE: self.coordinator.data["addressbook"]["result"][ATTR_FEEDINDATE],
-                    ATTR_LASTCLOUDSYNC: datetime.now()
+                    ATTR_LASTCLOUDSYNC: self.coordinator.data.get(self._syncSlot),
+                    ATTR_STALE: self.coordinator.data.stale,
                 }
         return None
 
 
-class FoxESSRunningState(CoordinatorEntity, SensorEntity):
-
-    def __init__(self, coordinator, name, deviceID, nameValue, uniqueValue, keyValue):
-        super().__init__(coordinator=coordinator)
-        self._nameValue = nameValue
-        self._uniqueValue = uniqueValue
-        self._keyValue = keyValue
-        _LOGGER.debug(f"Initiating Entity - {self._nameValue}")
-        self._attr_name = f"{name} - {self._nameValue}"
-        self._attr_unique_id = f"{deviceID}{self._uniqueValue}"
-        self._attr_icon = "mdi:state-machine"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
+@dataclass(frozen=True, kw_only=True)
+class FoxESSApiSensorEntityDescription(SensorEntityDescription):
+    """Describes one sensor of an account's call metrics, computed from the FoxESSAccount itself."""
 
-    @property
-    def native_value(self) -> str | None:
-        if self.coordinator.data["online"] and self.coordinator.data["raw"]:
-            if self._keyValue not in self.coordinator.data["raw"]:
-                _LOGGER.debug(f"{self._keyValue} None")
-            else:
-                res = self.coordinator.data["raw"][self._keyValue]
-                if res == "160":
-                    resText = f"{res}: self-test"
-                elif res == "161":
-                    resText = f"{res}: waiting"
-                elif res == "162":
-                    resText = f"{res}: checking"
-                elif res == "163":
-                    resText = f"{res}: on-grid"
-                elif res == "164":
-                    resText = f"{res}: off-grid"
-                elif res == "165":
-                    resText = f"{res}: fault"
-                elif res == "166":
-                    resText = f"{res}: permanent-fault"
-                elif res == "167":
-                    resText = f"{res}: standby"
-                elif res == "168":
-                    resText = f"{res}: upgrading"
-                elif res == "169":
-                    resText = f"{res}: fct"
-                elif res == "170":
-                    resText = f"{res}: illegal"
-                else:
-                    _LOGGER.debug(f"runcode {res}")
-                    resText = f"{res}: unknown code"
-                #return self.coordinator.data["raw"][self._keyValue]
-                return resText
-        return  None
-
-
-class FoxESSEnergySolar(CoordinatorEntity, SensorEntity):
-
-    _attr_state_class: SensorStateClass = SensorStateClass.TOTAL_INCREASING
-    _attr_device_class = SensorDeviceClass.ENERGY
-    _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
-
-    def __init__(self, coordinator, name, deviceID):
-        super().__init__(coordinator=coordinator)
-        _LOGGER.debug("Initiating Entity - Solar")
-        self._attr_name = name+" - Solar"
-        self._attr_unique_id = deviceID+"solar"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
-
-    @property
-    def native_value(self) -> float | None:
-        if "loads" not in self.coordinator.data["report"]:
-            loads = 0
-        else:
-            loads = float(self.coordinator.data["report"]["loads"])
-
-        if "chargeEnergyToTal" not in self.coordinator.data["report"]:
-            charge = 0
-        else:
-            charge = float(self.coordinator.data["report"]["chargeEnergyToTal"])
-
-        if "feedin" not in self.coordinator.data["report"]:
-            feedIn = 0
-        else:
-            feedIn = float(self.coordinator.data["report"]["feedin"])
-
-        if "gridConsumption" not in self.coordinator.data["report"]:
-            gridConsumption = 0
-        else:
-            gridConsumption = float(self.coordinator.data["report"]["gridConsumption"])
-
-        if "dischargeEnergyToTal" not in self.coordinator.data["report"]:
-            discharge = 0
-        else:
-            discharge = float(self.coordinator.data["report"]["dischargeEnergyToTal"])
-
-        energysolar = round((loads + charge + feedIn - gridConsumption - discharge),3)
-        if energysolar<0:
-            energysolar=0
-        return round(energysolar,3)
-
-
-class FoxESSSolarPower(CoordinatorEntity, SensorEntity):
-
-    _attr_state_class: SensorStateClass = SensorStateClass.MEASUREMENT
-    _attr_device_class = SensorDeviceClass.POWER
-    _attr_native_unit_of_measurement = UnitOfPower.KILO_WATT
-
-    def __init__(self, coordinator, name, deviceID):
-        super().__init__(coordinator=coordinator)
-        _LOGGER.debug("Initiating Entity - Solar Power")
-        self._attr_name = name+" - Solar Power"
-        self._attr_unique_id = deviceID+"solar-power"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
-
-    @property
-    def native_value(self) -> float | None:
-        if "loadsPower" not in self.coordinator.data["raw"]:
-            loads = 0
-        else:
-            loads = float(self.coordinator.data["raw"]["loadsPower"])
-
-        if "batChargePower" not in self.coordinator.data["raw"]:
-            charge = 0
-        else:
-            if self.coordinator.data["raw"]["batChargePower"] is None:
-                charge = 0
-            else:
-                charge = float(self.coordinator.data["raw"]["batChargePower"])
-
-        if "feedinPower" not in self.coordinator.data["raw"]:
-            feedIn = 0
-        else:
-            feedIn = float(self.coordinator.data["raw"]["feedinPower"])
-
-        if "gridConsumptionPower" not in self.coordinator.data["raw"]:
-            gridConsumption = 0
-        else:
-            gridConsumption = float(self.coordinator.data["raw"]["gridConsumptionPower"])
-
-        if "batDischargePower" not in self.coordinator.data["raw"]:
-            discharge = 0
-        else:
-            if self.coordinator.data["raw"]["batDischargePower"] is None:
-                discharge = 0
-            else:
-                discharge = float(self.coordinator.data["raw"]["batDischargePower"])
-
-        #check if what was returned (that some time was negative) is <0, so fix it
-        total = (loads + charge + feedIn - gridConsumption - discharge)
-        if total<0:
-            total=0
-        return round(total,3)
-
-
-class FoxESSBatSoC(CoordinatorEntity, SensorEntity):
-
-    _attr_device_class = SensorDeviceClass.BATTERY
-    _attr_native_unit_of_measurement = "%"
-
-    def __init__(self, coordinator, name, deviceID, nameValue, uniqueValue, keyValue):
-        super().__init__(coordinator=coordinator)
-        self._nameValue = nameValue
-        self._uniqueValue = uniqueValue
-        self._keyValue = keyValue
-        _LOGGER.debug(f"Initiating Entity - {self._nameValue}")
-        self._attr_name = f"{name} - {self._nameValue}"
-        self._attr_unique_id = f"{deviceID}{self._uniqueValue}"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
+    value_fn: Callable[[FoxESSAccount], Any]
+    attributes_fn: Callable[[FoxESSAccount], dict | None] | None = None
 
-    @property
-    def native_value(self) -> float | None:
-        if self.coordinator.data["online"] and self.coordinator.data["raw"]:
-            if self._keyValue not in self.coordinator.data["raw"]:
-                _LOGGER.debug(f"{self._keyValue} None")
-            else:
-                return self.coordinator.data["raw"][self._keyValue]
-        return  None
 
-    @property
-    def icon(self):
-        return icon_for_battery_level(battery_level=self.native_value, charging=None)
-
-class FoxESSBatMinSoC(CoordinatorEntity, SensorEntity):
-
-    _attr_device_class = SensorDeviceClass.BATTERY
-    _attr_native_unit_of_measurement = "%"
-
-    def __init__(self, coordinator, name, deviceID):
-        super().__init__(coordinator=coordinator)
-        _LOGGER.debug("Initiating Entity - Bat MinSoC")
-        self._attr_name = name+" - Bat MinSoC"
-        self._attr_unique_id = deviceID+"bat-minsoc"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
+def _api_latency(endpoint, name):
+    return FoxESSApiSensorEntityDescription(
+        key=f"api-{endpoint}-latency", name=f"API {name} Latency", icon="mdi:timer-outline",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS, state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        # p95 of the recent calls, the rest of the endpoint's figures go in the attributes
+        value_fn=lambda account: account.client.metrics.summary().get(endpoint, {}).get("latencyP95"),
+        attributes_fn=lambda account: account.client.metrics.summary().get(endpoint),
+    )
 
-    @property
-    def native_value(self) -> float | None:
-        if self.coordinator.data["online"] and self.coordinator.data["battery"]:
-            if "minSoc" not in self.coordinator.data["battery"]:
-                _LOGGER.debug("minSoc None")
-            else:
-                return self.coordinator.data["battery"]["minSoc"]
-        return  None
 
-    @property
-    def icon(self):
-        return icon_for_battery_level(battery_level=self.native_value, charging=None)
-
-class FoxESSBatMinSoConGrid(CoordinatorEntity, SensorEntity):
-
-    _attr_device_class = SensorDeviceClass.BATTERY
-    _attr_native_unit_of_measurement = "%"
-
-    def __init__(self, coordinator, name, deviceID):
-        super().__init__(coordinator=coordinator)
-        _LOGGER.debug("Initiating Entity - Bat minSocOnGrid")
-        self._attr_name = name+" - Bat minSocOnGrid"
-        self._attr_unique_id = deviceID+"bat-minSocOnGrid"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
+API_SENSOR_DESCRIPTIONS = (
+    FoxESSApiSensorEntityDescription(
+        key="api-calls-today", name="API Calls Today", icon="mdi:api", native_unit_of_measurement="calls",
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda account: account.scheduler.calls_today,
+        attributes_fn=lambda account: {
+            "daily_limit": account.scheduler.daily_budget,
+            "projected": account.scheduler.projected_calls_per_day(),
+        },
+    ),
+    FoxESSApiSensorEntityDescription(
+        key="api-limiter-wait", name="API Limiter Wait", icon="mdi:timer-sand",
+        native_unit_of_measurement=UnitOfTime.SECONDS, state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda account: round(account.limiter.wait_time, 1),
+        attributes_fn=lambda account: {"calls": account.limiter.calls},
+    ),
+    _api_latency(ENDPOINT_RAW, "Real Time"),
+    _api_latency(ENDPOINT_DETAIL, "Device Detail"),
+    _api_latency(ENDPOINT_REPORT, "Report"),
+    _api_latency(ENDPOINT_GENERATION, "Generation"),
+    _api_latency(ENDPOINT_BATTERY, "Battery Settings"),
+)
 
-    @property
-    def native_value(self) -> float | None:
-        if self.coordinator.data["online"] and self.coordinator.data["battery"]:
-            if "minSocOnGrid" not in self.coordinator.data["battery"]:
-                _LOGGER.debug("minSocOnGrid None")
-            else:
-                return self.coordinator.data["battery"]["minSocOnGrid"]
-        return  None
 
-    @property
-    def icon(self):
-        return icon_for_battery_level(battery_level=self.native_value, charging=None)
-
-
-class FoxESSTemp(CoordinatorEntity, SensorEntity):
-
-    _attr_device_class = SensorDeviceClass.TEMPERATURE
-    _attr_native_unit_of_measurement = UnitOfTemperature.CELSIUS
-
-    def __init__(self, coordinator, name, deviceID, nameValue, uniqueValue, keyValue):
-        super().__init__(coordinator=coordinator)
-        self._nameValue = nameValue
-        self._uniqueValue = uniqueValue
-        self._keyValue = keyValue
-        _LOGGER.debug(f"Initiating Entity - {self._nameValue}")
-        self._attr_name = f"{name} - {self._nameValue}"
-        self._attr_unique_id = f"{deviceID}{self._uniqueValue}"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
-
-    @property
-    def native_value(self) -> float | None:
-        if self.coordinator.data["online"] and self.coordinator.data["raw"]:
-            if self._keyValue not in self.coordinator.data["raw"]:
-                _LOGGER.debug(f"{self._keyValue} None")
-            else:
-                return self.coordinator.data["raw"][self._keyValue]
-        return None
+class FoxESSApiSensor(FoxESSRestoreSensor):
+    """One figure of an account's OpenAPI usage, refreshed whenever the account counts calls, whichever inverter made them."""
 
+    entity_description: FoxESSApiSensorEntityDescription
+    _attr_should_poll = False
 
-class FoxESSResidualEnergy(CoordinatorEntity, SensorEntity):
+    def __init__(self, account, description):
+        self.entity_description = description
+        self._account = account
+        self._attr_name = f"{DEFAULT_NAME} - {description.name}"
+        self._attr_unique_id = f"{DOMAIN}{account.key}{description.key}"
 
-    _attr_device_class = SensorDeviceClass.ENERGY
-    _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(self._account.async_add_listener(self._handle_account_update))
 
-    def __init__(self, coordinator, name, deviceID):
-        super().__init__(coordinator=coordinator)
-        _LOGGER.debug("Initiating Entity - Residual Energy")
-        self._attr_name = name+" - Residual Energy"
-        self._attr_unique_id = deviceID+"residual-energy"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
+    @callback
+    def _handle_account_update(self) -> None:
+        self._data_arrived()
+        self.async_write_ha_state()
 
     @property
-    def native_value(self) -> float | None:
-        if self.coordinator.data["online"] and self.coordinator.data["raw"]:
-            if "ResidualEnergy" not in self.coordinator.data["raw"]:
-                _LOGGER.debug("ResidualEnergy None")
-            else:
-                re = self.coordinator.data["raw"]["ResidualEnergy"]
-                if re > 0:
-                    re = re / 100
-                else:
-                    re = 0
-                return re
-        return None
-
-class FoxESSResponseTime(CoordinatorEntity, SensorEntity):
-
-    _attr_native_unit_of_measurement = 'mS'
-
-    def __init__(self, coordinator, name, deviceID):
-        super().__init__(coordinator=coordinator)
-        _LOGGER.debug("Initiating Entity - Response Time")
-        self._attr_name = name+" - Response Time"
-        self._attr_unique_id = deviceID+"response-time"
-        self.status = namedtuple(
-            "status",
-            [
-                ATTR_DATE,
-                ATTR_TIME,
-            ],
-        )
+    def native_value(self):
+        if self._restored is not None:
+            return self._restored[0]
+        return self.entity_description.value_fn(self._account)
 
     @property
-    def native_value(self) -> float | None:
-        if "ResponseTime" not in self.coordinator.data["raw"]:
-            _LOGGER.debug("ResponseTime None")
-        else:
-            return self.coordinator.data["raw"]["ResponseTime"]
-        return None
+    def extra_state_attributes(self):
+        if self._restored is not None or self.entity_description.attributes_fn is None:
+            return self._restored_attributes(None)
+        return self.entity_description.attributes_fn(self._account)
@@ -0,0 +1,190 @@
+"""Compact per cycle snapshot of an inverter's data, read by the entities through fixed slot indexes."""
+from __future__ import annotations
+
+GROUP_RAW = "raw"
+GROUP_REPORT = "report"
+GROUP_REPORT_MONTH = "reportMonth"
+GROUP_REPORT_YEAR = "reportYear"
+GROUP_STATS = "stats"
+GROUP_LIVE = "live"
+GROUP_GENERATION = "reportDailyGeneration"
+GROUP_BATTERY = "battery"
+GROUP_SCHEDULER = "scheduler"
+GROUP_ADDRESSBOOK = "addressbook" # held as a dict, it is descriptive text for the inverter entity's attributes
+
+STATUS_SLOT = -1 # pseudo slot that changes whenever online or the addressbook does
+
+
+class SnapshotLayout:
+    """
+    Gives every (group, variable) of one inverter a fixed slot index.
+    Slots are only ever added, so an index resolved by an entity at construction stays valid for
+    every snapshot that follows.
+    """
+
+    __slots__ = ("_groups", "_size")
+
+    def __init__(self) -> None:
+        self._groups: dict[str, dict[str, int]] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def slot(self, group: str, name: str) -> int:
+        """Slot index for a variable, allocating one the first time it is asked for."""
+        slots = self._groups.setdefault(group, {})
+        index = slots.get(name)
+        if index is None:
+            index = slots[name] = self._size
+            self._size += 1
+        return index
+
+    def group(self, group: str) -> dict[str, int]:
+        """{name: slot} for every variable allocated in a group."""
+        return self._groups.get(group, {})
+
+    def groups(self) -> list[str]:
+        return list(self._groups)
+
+
+class Snapshot:
+    """Immutable view of an inverter at the end of a poll cycle."""
+
+    __slots__ = ("layout", "values", "online", "stale", "addressbook")
+
+    def __init__(self, layout: SnapshotLayout, values: tuple, online: bool, addressbook: dict, stale: bool = False) -> None:
+        self.layout = layout
+        self.values = values
+        self.online = online
+        self.stale = stale # the cloud can't be asked at the moment, the values are the last good ones
+        self.addressbook = addressbook
+
+    def get(self, slot: int):
+        """Value in a slot, None if the variable hasn't been seen (or was allocated after this snapshot)."""
+        try:
+            return self.values[slot]
+        except IndexError:
+            return None
+
+    def changed(self, previous: Snapshot | None) -> set[int] | None:
+        """
+        Slots whose value differs from the previous snapshot, STATUS_SLOT included if online, stale or
+        the addressbook changed. None means everything should be treated as changed.
+        """
+        if previous is None or previous.layout is not self.layout:
+            return None
+        if previous is self:
+            return set()
+        old = previous.values
+        changed = {
+            slot for slot, value in enumerate(self.values)
+            if (old[slot] if slot < len(old) else None) != value
+        }
+        if previous.online != self.online or previous.stale != self.stale or previous.addressbook is not self.addressbook:
+            changed.add(STATUS_SLOT)
+        return changed
+
+    def as_dict(self) -> dict[str, dict]:
+        """{group: {name: value}} of every variable with a value, for exporting the whole snapshot at once."""
+        values = self.values
+        result = {}
+        for group in self.layout.groups():
+            section = {
+                name: values[slot] for name, slot in self.layout.group(group).items()
+                if slot < len(values) and values[slot] is not None
+            }
+            if section:
+                result[group] = section
+        return result
+
+    def has_group(self, group: str) -> bool:
+        """True if any variable in the group has a value."""
+        values = self.values
+        return any(slot < len(values) and values[slot] is not None for slot in self.layout.group(group).values())
+
+
+class InverterState:
+    """
+    Working copy of an inverter's data that the fetches write into during a cycle.
+    freeze() turns it into an immutable Snapshot, handing back the previous one if nothing changed.
+    """
+
+    __slots__ = ("layout", "_values", "_addressbook", "_online", "_stale", "_snapshot")
+
+    def __init__(self, layout: SnapshotLayout | None = None) -> None:
+        self.layout = layout or SnapshotLayout()
+        self._values: list = []
+        self._addressbook: dict = {}
+        self._online = False
+        self._stale = False
+        self._snapshot: Snapshot | None = None
+
+    @property
+    def addressbook(self) -> dict:
+        return self._addressbook
+
+    @addressbook.setter
+    def addressbook(self, addressbook: dict) -> None:
+        self._addressbook = addressbook
+        self._snapshot = None
+
+    @property
+    def online(self) -> bool:
+        return self._online
+
+    @online.setter
+    def online(self, online: bool) -> None:
+        if online != self._online:
+            self._online = online
+            self._snapshot = None
+
+    @property
+    def stale(self) -> bool:
+        return self._stale
+
+    @stale.setter
+    def stale(self, stale: bool) -> None:
+        if stale != self._stale:
+            self._stale = stale
+            self._snapshot = None
+
+    def set(self, group: str, name: str, value) -> None:
+        slot = self.layout.slot(group, name)
+        values = self._values
+        if slot >= len(values):
+            values.extend([None] * (len(self.layout) - len(values)))
+        if values[slot] != value:
+            values[slot] = value
+            self._snapshot = None
+
+    def update(self, group: str, mapping: dict) -> None:
+        for name, value in mapping.items():
+            self.set(group, name, value)
+
+    def get(self, group: str, name: str, default=None):
+        slot = self.layout.group(group).get(name)
+        if slot is None or slot >= len(self._values) or self._values[slot] is None:
+            return default
+        return self._values[slot]
+
+    def section(self, group: str) -> dict:
+        """The group as a plain {name: value} dict, eg. for the persistent cache."""
+        if group == GROUP_ADDRESSBOOK:
+            return dict(self.addressbook)
+        values = self._values
+        return {name: values[slot] for name, slot in self.layout.group(group).items() if slot < len(values) and values[slot] is not None}
+
+    def restore_section(self, group: str, data: dict) -> None:
+        if group == GROUP_ADDRESSBOOK:
+            self.addressbook = dict(data)
+        else:
+            self.update(group, data)
+
+    def freeze(self) -> Snapshot:
+        if self._snapshot is None or len(self._snapshot.values) != len(self.layout):
+            values = self._values
+            if len(values) < len(self.layout):
+                values.extend([None] * (len(self.layout) - len(values)))
+            self._snapshot = Snapshot(self.layout, tuple(values), self._online, self._addressbook, self._stale)
+        return self._snapshot
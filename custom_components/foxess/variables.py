@@ -0,0 +1,122 @@
+"""Which real time variables to ask the cloud for, worked out from what the inverter's entities show."""
+from __future__ import annotations
+
+from collections import Counter
+from datetime import datetime, timedelta
+import logging
+import re
+
+from .decode import VARIABLE_ALIASES
+from .history import STATISTICS
+from .integration import POWER_ENERGY
+from .snapshot import GROUP_RAW
+
+_LOGGER = logging.getLogger(__name__)
+
+DISCOVERY_INTERVAL = timedelta(hours=24) # everything is asked for this often, new variables only show up then
+SLOW_INTERVAL = timedelta(minutes=10) # temperatures and the extended PV strings aren't asked for more often
+NULL_PRUNE_COUNT = 30 # answers in a row without a value before a variable that never had one is dropped
+
+# used by the account hub itself, to pace the real time query to the power flowing
+REQUIRED_VARIABLES = frozenset({"pvPower", "loadsPower"})
+# what the live statistics and energy totals are computed from, whichever of their sensors are enabled
+DERIVED_VARIABLES = frozenset({variable for variable, _, _ in STATISTICS.values()} | set(POWER_ENERGY))
+SLOW_VARIABLES = re.compile(r"emperat|^pv([7-9]|1[0-8])(Current|Power|Volt)$")
+
+RESTRICTED_VARIABLES = (
+    "ambientTemperation",
+    "batChargePower","batCurrent","batCurrent_1","batCurrent_2","batDischargePower",
+    "batTemperature","batTemperature_1","batTemperature_2","batVolt", "batVolt_1", "batVolt_2",
+    "boostTemperation", "chargeTemperature", "dspTemperature",
+    "epsCurrentR","epsCurrentS","epsCurrentT","epsPower","epsPowerR","epsPowerS","epsPowerT","epsVoltR","epsVoltS","epsVoltT",
+    "feedinPower", "generationPower","gridConsumptionPower",
+    "input","invBatCurrent","invBatPower","invBatVolt","invTemperation",
+    "loadsPower","loadsPowerR","loadsPowerS","loadsPowerT",
+    "meterPower","meterPower2","meterPowerR","meterPowerS","meterPowerT","PowerFactor",
+    "pv1Current","pv1Power","pv1Volt","pv2Current","pv2Power","pv2Volt",
+    "pv3Current","pv3Power","pv3Volt","pv4Current","pv4Power","pv4Volt","pvPower",
+    "RCurrent","ReactivePower","RFreq","RPower","RVolt",
+    "SCurrent","SFreq","SoC","SPower","SVolt",
+    "TCurrent","TFreq","TPower","TVolt", "SoC_1","Soc_2",
+    "ResidualEnergy","energyThroughput","runningState","currentFaultCount",
+)
+
+# stored name -> the names the cloud may return it under
+_REQUEST_NAMES: dict[str, tuple[str, ...]] = {}
+for _name, _stored in VARIABLE_ALIASES.items():
+    _REQUEST_NAMES[_stored] = _REQUEST_NAMES.get(_stored, (_stored,)) + (_name,)
+
+
+class VariablePlanner:
+    """
+    The real time variables one inverter is asked for. A discovery query asks for everything, so the
+    entities for what the inverter has get added, after that only the variables of the entities in
+    HA (disabled ones never are) and those the derived values need are asked for. Slow changing
+    variables are left out of most queries and ones that never have a value are dropped until the
+    next discovery.
+    """
+
+    def __init__(self, restricted: bool = False) -> None:
+        self.everything = RESTRICTED_VARIABLES if restricted else None # what a discovery query asks for
+        self._allowed = frozenset(RESTRICTED_VARIABLES) if restricted else None
+        self._wanted: dict[str, tuple[str, ...]] = {} # entity -> the variables it shows
+        self._discovered: datetime | None = None
+        self._slowAsked: datetime | None = None
+        self._nulls: Counter[str] = Counter()
+        self._valued: set[str] = set() # had a value since the last discovery
+        self.pruned: set[str] = set()
+
+    def want(self, key: str, variables) -> None:
+        self._wanted[key] = tuple(variables)
+
+    def unwant(self, key: str) -> None:
+        self._wanted.pop(key, None)
+
+    def request(self, now: datetime) -> frozenset[str] | None:
+        """The variables to ask for now, None when a discovery query (self.everything) is due."""
+        if self._discovered is None or now - self._discovered >= DISCOVERY_INTERVAL:
+            return None
+        variables = set(REQUIRED_VARIABLES | DERIVED_VARIABLES)
+        for wanted in self._wanted.values():
+            variables.update(wanted)
+        names = set()
+        for variable in variables:
+            names.update(_REQUEST_NAMES.get(variable, (variable,)))
+        names -= self.pruned
+        if self._allowed is not None:
+            names &= self._allowed
+        if self._slowAsked is not None and now - self._slowAsked < SLOW_INTERVAL:
+            names = {name for name in names if not SLOW_VARIABLES.search(name)}
+        else:
+            self._slowAsked = now
+        return frozenset(names)
+
+    def observe(self, asked, nulls, state, now: datetime) -> None:
+        """
+        Account for one answer, asked is what was asked for (None for everything) and nulls the
+        variables the answer had without a value.
+        """
+        if asked is None:
+            # a fresh start, whatever was dropped gets another chance
+            self._discovered = self._slowAsked = now
+            self._nulls.clear()
+            self._valued.clear()
+            self.pruned.clear()
+            asked = nulls # only what came back empty can be told apart in an answer with everything
+        for name in asked:
+            if name not in nulls and state.get(GROUP_RAW, VARIABLE_ALIASES.get(name, name)) is not None:
+                self._valued.add(name)
+                self._nulls.pop(name, None)
+            elif name not in self._valued:
+                self._nulls[name] += 1
+                if self._nulls[name] >= NULL_PRUNE_COUNT:
+                    self.pruned.add(name)
+                    del self._nulls[name]
+                    _LOGGER.debug("Real time variable %s never has a value, no longer asked for", name)
+
+    def summary(self) -> dict:
+        return {
+            "discovered": self._discovered and self._discovered.isoformat(),
+            "entities": len(self._wanted),
+            "pruned": sorted(self.pruned),
+        }